@@ -0,0 +1,144 @@
+# benchmarks/fixtures.py
+"""
+Servidor web local con páginas sintéticas de tamaño y complejidad
+controlados, para medir sin depender de sitios reales.
+
+    GET /page?links=200&headings=30&depth=6&resources=10&images=5&size_kb=0&delay_ms=0&seed=1
+    GET /asset/{kind}/{n}?delay_ms=0&size_kb=1      (kind: css, js, img)
+
+La misma combinación de parámetros siempre produce la misma página; 'seed'
+sirve para tener URLs distintas (y evitar la caché del Servidor A) sin
+cambiar su costo.
+"""
+
+import argparse
+import asyncio
+from typing import Dict, Any
+from urllib.parse import urlencode
+
+from aiohttp import web
+
+# Perfiles de página usados por los benchmarks
+PAGE_PROFILES: Dict[str, Dict[str, int]] = {
+    # Página típica y liviana
+    "small": {"links": 50, "headings": 10, "depth": 3, "resources": 5, "images": 5},
+    # Muchísimos enlaces (lo que más trabaja el extractor de contenido)
+    "links": {"links": 5000, "headings": 10, "depth": 3, "resources": 5, "images": 5},
+    # Encabezados anidados en profundidad
+    "deep": {"links": 50, "headings": 500, "depth": 6, "resources": 5, "images": 5},
+    # Muchos sub-recursos (lo que más trabaja el navegador y las métricas de red)
+    "resources": {"links": 50, "headings": 10, "depth": 3, "resources": 100, "images": 50},
+    # HTML grande (~2 MB de texto de relleno)
+    "large": {"links": 500, "headings": 50, "depth": 4, "resources": 10, "images": 10, "size_kb": 2048},
+    # Respuesta lenta del servidor de origen
+    "slow": {"links": 50, "headings": 10, "depth": 3, "resources": 5, "images": 5, "delay_ms": 500},
+}
+
+PAGE_PARAMS = ("links", "headings", "depth", "resources", "images", "size_kb", "delay_ms", "seed")
+# Tope de cada parámetro, para que un pedido mal armado no tumbe el fixture
+MAX_PARAM = 1_000_000
+
+ASSET_CONTENT_TYPES = {"css": "text/css", "js": "application/javascript", "img": "image/svg+xml"}
+_FILLER = "Lorem ipsum dolor sit amet, consectetur adipiscing elit, sed do eiusmod tempor. "
+
+
+def page_path(profile: str, seed: int = 0) -> str:
+    """Ruta (con query) de una página del perfil dado."""
+    params = dict(PAGE_PROFILES[profile], seed=seed)
+    return f"/page?{urlencode(params)}"
+
+
+def build_page(links: int = 50, headings: int = 10, depth: int = 3, resources: int = 5,
+               images: int = 5, size_kb: int = 0, seed: int = 0, **_ignored: Any) -> str:
+    """Arma el HTML de una página sintética (función pura, sin red)."""
+    depth = max(1, min(depth, 6))
+    parts = [
+        "<!DOCTYPE html><html><head><meta charset='utf-8'>",
+        f"<title>Fixture {seed}: {links} enlaces, {headings} encabezados</title>",
+        f"<meta name='description' content='Página sintética número {seed} para benchmarks'>",
+        "<meta name='keywords' content='benchmark, fixture, tp2'>",
+        f"<meta property='og:title' content='Fixture {seed}'>",
+        "<meta property='og:type' content='website'>",
+    ]
+    # Los sub-recursos se reparten entre hojas de estilo, scripts e imágenes
+    for i in range(resources):
+        if i % 2 == 0:
+            parts.append(f"<link rel='stylesheet' href='/asset/css/{i}'>")
+        else:
+            parts.append(f"<script src='/asset/js/{i}' defer></script>")
+    parts.append("</head><body>")
+
+    for i in range(headings):
+        level = i % depth + 1
+        parts.append(f"<h{level}>Sección {i}</h{level}><p>{_FILLER}</p>")
+    for i in range(images):
+        parts.append(f"<img src='/asset/img/{i}' alt='imagen {i}' width='32' height='32'>")
+    parts.append("<ul>")
+    for i in range(links):
+        parts.append(f"<li><a href='/page?seed={seed}&amp;link={i}'>Enlace {i}</a></li>")
+    parts.append("</ul>")
+
+    if size_kb:
+        repeat = size_kb * 1024 // len(_FILLER) + 1
+        parts.append(f"<div class='filler'><p>{_FILLER * repeat}</p></div>")
+    parts.append("</body></html>")
+    return "".join(parts)
+
+
+def _int_params(query, names) -> Dict[str, int]:
+    params = {}
+    for name in names:
+        if name in query:
+            value = int(query[name])
+            if not 0 <= value <= MAX_PARAM:
+                raise ValueError(f"'{name}' fuera de rango")
+            params[name] = value
+    return params
+
+
+async def handle_page(request):
+    try:
+        params = _int_params(request.query, PAGE_PARAMS)
+    except ValueError as e:
+        return web.Response(text=f"Parámetro inválido: {e}", status=400)
+    if params.get("delay_ms"):
+        await asyncio.sleep(params["delay_ms"] / 1000)
+    return web.Response(text=build_page(**params), content_type="text/html")
+
+
+async def handle_asset(request):
+    kind = request.match_info["kind"]
+    if kind not in ASSET_CONTENT_TYPES:
+        raise web.HTTPNotFound()
+    try:
+        params = _int_params(request.query, ("delay_ms", "size_kb"))
+    except ValueError as e:
+        return web.Response(text=f"Parámetro inválido: {e}", status=400)
+    if params.get("delay_ms"):
+        await asyncio.sleep(params["delay_ms"] / 1000)
+
+    padding = "x" * (params.get("size_kb", 1) * 1024)
+    if kind == "css":
+        body = f"/* {padding} */ body {{ margin: 0; }}"
+    elif kind == "js":
+        body = f"/* {padding} */ void 0;"
+    else:
+        body = f"<svg xmlns='http://www.w3.org/2000/svg' width='32' height='32'><!-- {padding} --></svg>"
+    return web.Response(text=body, headers={"Content-Type": ASSET_CONTENT_TYPES[kind]})
+
+
+def create_app() -> web.Application:
+    app = web.Application()
+    app.router.add_get('/page', handle_page)
+    app.router.add_get('/asset/{kind}/{n}', handle_asset)
+    return app
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Servidor de páginas sintéticas para benchmarks")
+    parser.add_argument("-i", "--ip", default="localhost", help="Dirección de escucha")
+    parser.add_argument("-p", "--port", type=int, default=8090, help="Puerto de escucha")
+    args = parser.parse_args()
+
+    print(f"🧪 Fixtures en http://{args.ip}:{args.port}/page (perfiles: {', '.join(PAGE_PROFILES)})")
+    web.run_app(create_app(), host=args.ip, port=args.port, print=None)
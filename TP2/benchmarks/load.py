@@ -0,0 +1,104 @@
+# benchmarks/load.py
+"""
+Generador de carga: 'total' pedidos con 'concurrency' en vuelo a la vez,
+contra /scrape del Servidor A o directo al protocolo del Servidor B.
+"""
+
+import asyncio
+import itertools
+import time
+from typing import Dict, Any, Awaitable, Callable, List, Optional, Tuple
+
+import aiohttp
+
+from common.protocol import ProcessorClient
+from benchmarks.stats import summarize_latencies, timing_stats
+
+# Un pedido devuelve (ok, mensaje de error o None, tiempos por etapa o None)
+RequestResult = Tuple[bool, Optional[str], Optional[Dict[str, float]]]
+MAX_ERROR_SAMPLES = 5
+
+
+async def run_load(send: Callable[[int], Awaitable[RequestResult]], total: int,
+                   concurrency: int) -> Dict[str, Any]:
+    """Corre send(0..total-1) con 'concurrency' trabajadores y resume latencias y errores."""
+    indexes = itertools.count()
+    latencies: List[float] = []
+    timings: List[Dict[str, float]] = []
+    errors: List[str] = []
+
+    async def worker() -> None:
+        for index in indexes:
+            if index >= total:
+                return
+            start = time.perf_counter()
+            try:
+                ok, error, stage_timings = await send(index)
+            except Exception as e:
+                ok, error, stage_timings = False, f"{type(e).__name__}: {e}", None
+            elapsed = time.perf_counter() - start
+            if ok:
+                latencies.append(elapsed)
+                if stage_timings:
+                    timings.append(stage_timings)
+            else:
+                errors.append(error or "error")
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(max(1, concurrency))))
+    duration = time.perf_counter() - start
+
+    return {
+        "requests": total,
+        "concurrency": concurrency,
+        "ok": len(latencies),
+        "errors": len(errors),
+        "error_samples": sorted(set(errors))[:MAX_ERROR_SAMPLES],
+        "duration_s": round(duration, 3),
+        "rps": round(len(latencies) / duration, 2) if duration else 0.0,
+        "latency_ms": summarize_latencies(latencies),
+        "stages_ms": timing_stats(timings),
+    }
+
+
+async def scrape_load(base_url: str, page_url: Callable[[int], str], total: int, concurrency: int,
+                      params: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+    """Carga sobre GET /scrape del Servidor A (con ?debug=timings para el desglose)."""
+    timeout = aiohttp.ClientTimeout(total=300)
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    async with aiohttp.ClientSession(timeout=timeout, connector=connector) as session:
+
+        async def send(index: int) -> RequestResult:
+            query = dict(params or {}, url=page_url(index), debug="timings")
+            async with session.get(f"{base_url}/scrape", params=query) as response:
+                if response.status != 200:
+                    return False, f"HTTP {response.status}", None
+                report = await response.json()
+            if report.get("status") != "success":
+                return False, f"status={report.get('status')}", None
+            timings_ms = report.get("debug", {}).get("timings_ms", {})
+            return True, None, {stage: value / 1000 for stage, value in timings_ms.items()}
+
+        return await run_load(send, total, concurrency)
+
+
+async def protocol_load(host: str, port: int, task: str, page_url: Callable[[int], str], total: int,
+                        concurrency: int, options: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Carga directa sobre el protocolo del Servidor B, sin pasar por el Servidor A."""
+    client = ProcessorClient(host, port, pool_size=max(1, concurrency // 8))
+    try:
+        async def send(index: int) -> RequestResult:
+            message = {"task": task, "url": page_url(index)}
+            if options:
+                message["options"] = options
+            response = await client.request(message, timeout=300)
+            if response.get("status") != "success":
+                return False, f"{response.get('status')}: {response.get('message')}", None
+            if response.get("data") is None:
+                # Las tareas informan sus fallos (timeout, error de navegación) devolviendo None
+                return False, f"la tarea '{task}' no devolvió resultado", None
+            return True, None, response.get("timings")
+
+        return await run_load(send, total, concurrency)
+    finally:
+        await client.close()
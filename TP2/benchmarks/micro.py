@@ -0,0 +1,113 @@
+# benchmarks/micro.py
+"""
+Micro-benchmarks de cada componente por separado, sin los servidores:
+
+- Extractores del scraper sobre HTML sintético ya en memoria (sin red),
+  con los dos motores ('bs4' y 'stream').
+- Tareas del processor ejecutadas en este mismo proceso contra el
+  servidor de fixtures (necesita Playwright y Chromium).
+"""
+
+import time
+from typing import Dict, Any, Iterable, List
+
+from scraper.document import parse_html, run_extractors
+from scraper.pipeline import EXTRACTOR_REGISTRY, PARSER_ENGINES
+from scraper.stream_parser import StreamingExtraction, CHUNK_SIZE
+from benchmarks.fixtures import PAGE_PROFILES, build_page, page_path
+from benchmarks.stats import summarize_latencies, timing_stats
+
+
+def _extract_bs4(html: str, names: List[str]) -> Dict[str, float]:
+    timings = {}
+    start = time.perf_counter()
+    soup = parse_html(html)
+    parsed = time.perf_counter()
+    run_extractors(soup, [EXTRACTOR_REGISTRY[name]() for name in names])
+    timings["parse"] = parsed - start
+    timings["extract"] = time.perf_counter() - parsed
+    return timings
+
+
+def _extract_stream(data: bytes, names: List[str]) -> Dict[str, float]:
+    start = time.perf_counter()
+    extraction = StreamingExtraction([EXTRACTOR_REGISTRY[name]() for name in names], encoding="utf-8")
+    for offset in range(0, len(data), CHUNK_SIZE):
+        extraction.feed(data[offset:offset + CHUNK_SIZE])
+        if extraction.finished:
+            break
+    extraction.close()
+    return {"stream_extract": time.perf_counter() - start}
+
+
+def bench_extractors(profiles: Iterable[str], iterations: int = 20,
+                     extractor_sets: Iterable[Iterable[str]] = (("content", "metadata"), ("title", "metadata")),
+                     engines: Iterable[str] = PARSER_ENGINES) -> List[Dict[str, Any]]:
+    """Un resultado por (perfil, motor, extractores), con latencia total y por etapa."""
+    results = []
+    for profile in profiles:
+        html = build_page(**PAGE_PROFILES[profile])
+        data = html.encode("utf-8")
+        for names in extractor_sets:
+            names = list(names)
+            for engine in engines:
+                runs = []
+                # Una vuelta de calentamiento para que no cuente la primera importación/caché
+                for i in range(iterations + 1):
+                    timings = _extract_bs4(html, names) if engine == "bs4" else _extract_stream(data, names)
+                    if i:
+                        runs.append(timings)
+                total = [sum(timings.values()) for timings in runs]
+                results.append({
+                    "profile": profile,
+                    "engine": engine,
+                    "extractors": names,
+                    "html_kb": round(len(data) / 1024, 1),
+                    "latency_ms": summarize_latencies(total),
+                    "stages_ms": timing_stats(runs),
+                })
+                print(f"  🔬 {profile:<10} {engine:<7} {'+'.join(names):<17} "
+                      f"p50={results[-1]['latency_ms']['p50']} ms")
+    return results
+
+
+def bench_processor(base_url: str, tasks: Iterable[str], profiles: Iterable[str],
+                    iterations: int = 5) -> List[Dict[str, Any]]:
+    """
+    Corre cada tarea del Servidor B en este proceso, con el navegador
+    persistente de processor.browser. La primera ejecución (que lanza el
+    navegador) se descarta como calentamiento.
+    """
+    # Import diferido: los benchmarks del scraper no necesitan Playwright
+    from server_processing import TASK_REGISTRY
+
+    results = []
+    for task in tasks:
+        function = TASK_REGISTRY[task]
+        for profile in profiles:
+            latencies = []
+            runs = []
+            failures = 0
+            for i in range(iterations + 1):
+                url = f"{base_url}{page_path(profile, seed=i)}"
+                start = time.perf_counter()
+                result = function(url)
+                elapsed = time.perf_counter() - start
+                if not i:
+                    continue
+                if result is None:
+                    failures += 1
+                    continue
+                latencies.append(elapsed)
+                if isinstance(result, dict) and "_timings" in result:
+                    runs.append(result["_timings"])
+            results.append({
+                "task": task,
+                "profile": profile,
+                "failures": failures,
+                "latency_ms": summarize_latencies(latencies),
+                "stages_ms": timing_stats(runs),
+            })
+            print(f"  🔬 {task:<12} {profile:<10} p50={results[-1]['latency_ms'].get('p50')} ms "
+                  f"({failures} fallos)")
+    return results
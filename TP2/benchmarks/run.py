@@ -0,0 +1,339 @@
+# benchmarks/run.py
+"""
+Punto de entrada de los benchmarks (ejecutar desde la carpeta TP2):
+
+    python -m benchmarks.run e2e --profiles small,links --concurrency 1,4,16 --requests 40
+    python -m benchmarks.run micro --iterations 20
+    python -m benchmarks.run compare benchmarks/results/antes.json benchmarks/results/despues.json
+
+'e2e' levanta el servidor de fixtures, el Servidor B y el Servidor A como
+procesos aparte, mide /scrape y el protocolo de B a distintas
+concurrencias y registra CPU y pico de RSS de cada componente.
+Cada corrida se guarda como JSON en benchmarks/results/.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Dict, Any, List, Optional, Tuple
+
+import aiohttp
+
+from common.protocol import ProcessorClient
+from processor.profiles import RENDER_PROFILES, DEFAULT_PROFILE
+from benchmarks.fixtures import PAGE_PROFILES, page_path
+from benchmarks.load import scrape_load, protocol_load
+from benchmarks.micro import bench_extractors, bench_processor
+from benchmarks.stats import ProcessSampler
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(PROJECT_DIR, "benchmarks", "results")
+TARGETS = ("scrape", "protocol")
+STARTUP_TIMEOUT = 60
+
+
+# --- Procesos auxiliares ---
+
+def free_port(host: str) -> int:
+    with socket.socket() as sock:
+        sock.bind((host, 0))
+        return sock.getsockname()[1]
+
+
+def start_process(name: str, args: List[str], log_dir: Optional[str]) -> subprocess.Popen:
+    """Lanza un script del proyecto con el mismo intérprete; su salida va a un log o se descarta."""
+    output = subprocess.DEVNULL
+    if log_dir:
+        os.makedirs(log_dir, exist_ok=True)
+        output = open(os.path.join(log_dir, f"{name}.log"), "w")
+    print(f"🚀 Iniciando {name}: {' '.join(args)}")
+    return subprocess.Popen([sys.executable] + args, cwd=PROJECT_DIR, stdout=output, stderr=subprocess.STDOUT)
+
+
+def stop_process(process: subprocess.Popen) -> None:
+    if process.poll() is None:
+        process.terminate()
+        try:
+            process.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+
+
+async def wait_for_http(url: str, process: subprocess.Popen) -> None:
+    deadline = time.monotonic() + STARTUP_TIMEOUT
+    async with aiohttp.ClientSession() as session:
+        while time.monotonic() < deadline:
+            if process.poll() is not None:
+                raise RuntimeError(f"El proceso terminó al arrancar (código {process.returncode}); ver su salida con --log-dir")
+            try:
+                async with session.get(url) as response:
+                    if response.status < 500:
+                        return
+            except aiohttp.ClientError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError(f"{url} no respondió en {STARTUP_TIMEOUT} s")
+
+
+async def wait_for_processor(host: str, port: int, process: subprocess.Popen) -> None:
+    deadline = time.monotonic() + STARTUP_TIMEOUT
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"El Servidor B terminó al arrancar (código {process.returncode}); ver su salida con --log-dir")
+        client = ProcessorClient(host, port, pool_size=1)
+        try:
+            await client.request({"control": "ping"}, timeout=2)
+            return
+        except (OSError, asyncio.TimeoutError):
+            await asyncio.sleep(0.2)
+        finally:
+            await client.close()
+    raise RuntimeError(f"El Servidor B ({host}:{port}) no respondió en {STARTUP_TIMEOUT} s")
+
+
+def run_metadata(args: argparse.Namespace) -> Dict[str, Any]:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=PROJECT_DIR,
+                                capture_output=True, text=True, timeout=10).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        commit = ""
+    options = {key: value for key, value in vars(args).items() if key != "func"}
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "commit": commit or None,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "options": options,
+    }
+
+
+def save_results(results: Dict[str, Any], output: Optional[str]) -> str:
+    if not output:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+        output = os.path.join(RESULTS_DIR, f"{results['kind']}-{stamp}.json")
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2, ensure_ascii=False)
+    print(f"💾 Resultados guardados en {output}")
+    return output
+
+
+def _csv(value: str) -> List[str]:
+    return [item.strip() for item in value.split(",") if item.strip()]
+
+
+def _int_csv(value: str) -> List[int]:
+    try:
+        return [int(item) for item in _csv(value)]
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Se esperaba una lista de enteros separados por coma: {value!r}")
+
+
+def _profiles(value: str) -> List[str]:
+    profiles = _csv(value)
+    unknown = [profile for profile in profiles if profile not in PAGE_PROFILES]
+    if unknown:
+        raise argparse.ArgumentTypeError(f"Perfiles desconocidos: {unknown} (opciones: {', '.join(PAGE_PROFILES)})")
+    return profiles
+
+
+# --- e2e ---
+
+async def run_e2e(args: argparse.Namespace) -> Dict[str, Any]:
+    host = args.host
+    fixture_port, processor_port, metrics_port, scraping_port = (free_port(host) for _ in range(4))
+    fixture_url = f"http://{host}:{fixture_port}"
+    scraping_url = f"http://{host}:{scraping_port}"
+
+    processes: Dict[str, subprocess.Popen] = {}
+    try:
+        processes["fixtures"] = start_process(
+            "fixtures", ["-m", "benchmarks.fixtures", "--ip", host, "--port", str(fixture_port)], args.log_dir)
+        processes["processing"] = start_process(
+            "processing", ["server_processing.py", "--ip", host, "--port", str(processor_port),
+                           "--metrics-port", str(metrics_port)] + args.processing_arg, args.log_dir)
+        await wait_for_http(f"{fixture_url}{page_path('small')}", processes["fixtures"])
+        await wait_for_processor(host, processor_port, processes["processing"])
+        if "scrape" in args.targets:
+            processes["scraping"] = start_process(
+                "scraping", ["server_scraping.py", "--ip", host, "--port", str(scraping_port),
+                             "--processor", f"{host}:{processor_port}",
+                             "--screenshot-dir", os.path.join(args.work_dir, "screenshots")]
+                + args.scraping_arg, args.log_dir)
+            await wait_for_http(f"{scraping_url}/cache/stats", processes["scraping"])
+
+        pids = {name: process.pid for name, process in processes.items()}
+        pids["load_generator"] = os.getpid()
+        # Cada pedido usa una 'seed' distinta: URLs nuevas, sin aciertos de caché en el Servidor A
+        seeds = iter(range(1, 10 ** 9))
+
+        def urls(profile: str):
+            base = next(seeds) * 1_000_000
+            return lambda index: f"{fixture_url}{page_path(profile, seed=base + index)}"
+
+        async def load(target: str, profile: str, total: int, concurrency: int) -> Dict[str, Any]:
+            if target == "scrape":
+                return await scrape_load(scraping_url, urls(profile), total, concurrency,
+                                         params={"profile": args.render_profile})
+            return await protocol_load(host, processor_port, args.task, urls(profile), total, concurrency,
+                                       options={"profile": args.render_profile})
+
+        if args.warmup:
+            # Arranca los trabajadores del pool y sus navegadores antes de medir
+            print(f"🔥 Calentamiento: {args.warmup} pedidos")
+            target = "scrape" if "scrape" in args.targets else "protocol"
+            await load(target, "small", args.warmup, min(args.warmup, max(args.concurrency)))
+
+        scenarios = []
+        for target in args.targets:
+            for profile in args.profiles:
+                for concurrency in args.concurrency:
+                    print(f"⏱️  {target} / {profile} / concurrencia {concurrency} ({args.requests} pedidos)")
+                    with ProcessSampler(pids) as sampler:
+                        result = await load(target, profile, args.requests, concurrency)
+                    scenario = {"target": target, "profile": profile}
+                    scenario.update(result)
+                    scenario["components"] = sampler.results()
+                    scenarios.append(scenario)
+                    latency = result["latency_ms"]
+                    print(f"   ✅ {result['ok']} ok, {result['errors']} errores, {result['rps']} req/s, "
+                          f"p50={latency.get('p50')} p95={latency.get('p95')} p99={latency.get('p99')} ms")
+                    for error in result["error_samples"]:
+                        print(f"   ⚠️ {error}")
+
+        return {"kind": "e2e", "meta": run_metadata(args), "scenarios": scenarios}
+    finally:
+        for process in reversed(list(processes.values())):
+            stop_process(process)
+
+
+def command_e2e(args: argparse.Namespace) -> None:
+    os.makedirs(args.work_dir, exist_ok=True)
+    results = asyncio.run(run_e2e(args))
+    save_results(results, args.output)
+
+
+# --- micro ---
+
+def command_micro(args: argparse.Namespace) -> None:
+    results: Dict[str, Any] = {"kind": "micro", "meta": run_metadata(args)}
+    print("🔬 Extractores del scraper")
+    results["extractors"] = bench_extractors(args.profiles, args.iterations)
+
+    if args.tasks:
+        host = args.host
+        port = free_port(host)
+        fixtures = start_process("fixtures", ["-m", "benchmarks.fixtures", "--ip", host, "--port", str(port)],
+                                 args.log_dir)
+        try:
+            base_url = f"http://{host}:{port}"
+            asyncio.run(wait_for_http(f"{base_url}{page_path('small')}", fixtures))
+            print("🔬 Tareas del processor")
+            results["processor"] = bench_processor(base_url, args.tasks, args.profiles, args.processor_iterations)
+        finally:
+            stop_process(fixtures)
+
+    save_results(results, args.output)
+
+
+# --- compare ---
+
+def _scenario_key(kind: str, entry: Dict[str, Any]) -> Tuple:
+    if kind == "scenarios":
+        return entry["target"], entry["profile"], entry["concurrency"]
+    if kind == "extractors":
+        return entry["profile"], entry["engine"], "+".join(entry["extractors"])
+    return entry["task"], entry["profile"]
+
+
+def _delta(before: Optional[float], after: Optional[float]) -> str:
+    if not before or after is None:
+        return ""
+    return f"({(after - before) / before * 100:+.1f}%)"
+
+
+def command_compare(args: argparse.Namespace) -> None:
+    with open(args.before, encoding="utf-8") as f:
+        before = json.load(f)
+    with open(args.after, encoding="utf-8") as f:
+        after = json.load(f)
+
+    for kind in ("scenarios", "extractors", "processor"):
+        old = {_scenario_key(kind, entry): entry for entry in before.get(kind, [])}
+        new = {_scenario_key(kind, entry): entry for entry in after.get(kind, [])}
+        common = [key for key in new if key in old]
+        if not common:
+            continue
+        print(f"\n📊 {kind}")
+        for key in common:
+            old_latency, new_latency = old[key]["latency_ms"], new[key]["latency_ms"]
+            columns = []
+            for metric in ("p50", "p95", "p99"):
+                value = new_latency.get(metric)
+                columns.append(f"{metric}={value} {_delta(old_latency.get(metric), value)}")
+            if "rps" in new[key]:
+                columns.append(f"rps={new[key]['rps']} {_delta(old[key].get('rps'), new[key]['rps'])}")
+            print(f"  {' / '.join(str(part) for part in key):<40} " + "  ".join(columns))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks reproducibles sin depender de sitios reales")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    def common_options(sub: argparse.ArgumentParser) -> None:
+        sub.add_argument("--host", default="127.0.0.1", help="Dirección donde escuchan los procesos lanzados")
+        sub.add_argument("--profiles", type=_profiles, default=["small", "links", "resources"],
+                         help=f"Perfiles de página separados por coma ({', '.join(PAGE_PROFILES)})")
+        sub.add_argument("--output", default=None, help="Archivo JSON de resultados (por defecto en benchmarks/results/)")
+        sub.add_argument("--log-dir", default=None, help="Guardar la salida de cada proceso en este directorio")
+
+    e2e = subparsers.add_parser("e2e", help="Carga sobre los servidores completos")
+    common_options(e2e)
+    e2e.add_argument("--targets", type=_csv, default=list(TARGETS),
+                     help="'scrape' (GET /scrape del Servidor A) y/o 'protocol' (directo al Servidor B)")
+    e2e.add_argument("--task", default="render", help="Tarea enviada al Servidor B con --targets protocol")
+    e2e.add_argument("--render-profile", choices=list(RENDER_PROFILES), default=DEFAULT_PROFILE,
+                     help="Perfil de render de los pedidos (qué recursos carga el navegador)")
+    e2e.add_argument("--concurrency", type=_int_csv, default=[1, 4, 16], help="Niveles de concurrencia")
+    e2e.add_argument("--requests", type=int, default=40, help="Pedidos por escenario")
+    e2e.add_argument("--warmup", type=int, default=4, help="Pedidos de calentamiento (no se miden)")
+    e2e.add_argument("--work-dir", default=os.path.join(RESULTS_DIR, "work"),
+                     help="Directorio de trabajo de los servidores (screenshots)")
+    e2e.add_argument("--processing-arg", action="append", default=[], metavar="ARG",
+                     help="Argumento extra para server_processing.py, repetible (ej. --processing-arg=--max-queue=10)")
+    e2e.add_argument("--scraping-arg", action="append", default=[], metavar="ARG",
+                     help="Argumento extra para server_scraping.py, repetible (ej. --scraping-arg=--html-parser=stream)")
+    e2e.set_defaults(func=command_e2e)
+
+    micro = subparsers.add_parser("micro", help="Componentes por separado, sin servidores")
+    common_options(micro)
+    micro.add_argument("--iterations", type=int, default=20, help="Repeticiones por extractor")
+    micro.add_argument("--tasks", type=_csv, default=[],
+                       help="Tareas del processor a medir (ej. render,screenshot); requiere Playwright")
+    micro.add_argument("--processor-iterations", type=int, default=5, help="Repeticiones por tarea")
+    micro.set_defaults(func=command_micro)
+
+    compare = subparsers.add_parser("compare", help="Compara dos archivos de resultados")
+    compare.add_argument("before", help="Resultados de referencia")
+    compare.add_argument("after", help="Resultados nuevos")
+    compare.set_defaults(func=command_compare)
+
+    args = parser.parse_args()
+    if getattr(args, "targets", None):
+        unknown = [target for target in args.targets if target not in TARGETS]
+        if unknown:
+            parser.error(f"Destinos desconocidos: {unknown} (opciones: {', '.join(TARGETS)})")
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+# benchmarks/stats.py
+
+import math
+import threading
+import time
+from typing import Dict, Any, List, Optional, Sequence
+
+from common.procstats import process_tree_cpu_seconds, process_tree_rss_mb
+
+
+def percentile(sorted_values: Sequence[float], pct: float) -> float:
+    """Percentil por interpolación lineal sobre valores ya ordenados."""
+    if not sorted_values:
+        return 0.0
+    position = (len(sorted_values) - 1) * pct / 100
+    low = math.floor(position)
+    high = math.ceil(position)
+    if low == high:
+        return sorted_values[int(position)]
+    return sorted_values[low] + (sorted_values[high] - sorted_values[low]) * (position - low)
+
+
+def summarize_latencies(seconds: Sequence[float]) -> Dict[str, float]:
+    """p50/p95/p99, media, mínimo y máximo en milisegundos."""
+    values = sorted(seconds)
+    if not values:
+        return {"count": 0}
+    ms = lambda value: round(value * 1000, 2)
+    return {
+        "count": len(values),
+        "mean": ms(sum(values) / len(values)),
+        "min": ms(values[0]),
+        "p50": ms(percentile(values, 50)),
+        "p95": ms(percentile(values, 95)),
+        "p99": ms(percentile(values, 99)),
+        "max": ms(values[-1]),
+    }
+
+
+class ProcessSampler:
+    """
+    Mide CPU y memoria de varios procesos (cada uno con sus descendientes)
+    mientras dura un escenario: la CPU como diferencia entre el inicio y el
+    fin, la memoria como el pico de RSS visto en muestreos periódicos.
+
+        with ProcessSampler({"scraping": pid_a, "processing": pid_b}) as sampler:
+            ...
+        sampler.results()
+    """
+
+    def __init__(self, pids: Dict[str, int], interval: float = 0.2):
+        self.pids = pids
+        self.interval = interval
+        self._cpu_start: Dict[str, float] = {}
+        self._cpu_end: Dict[str, float] = {}
+        self._peak_rss: Dict[str, float] = {name: 0.0 for name in pids}
+        self._started = 0.0
+        self._elapsed = 0.0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _sample(self) -> None:
+        for name, pid in self.pids.items():
+            self._peak_rss[name] = max(self._peak_rss[name], process_tree_rss_mb(pid))
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def __enter__(self) -> "ProcessSampler":
+        self._cpu_start = {name: process_tree_cpu_seconds(pid) for name, pid in self.pids.items()}
+        self._started = time.perf_counter()
+        self._sample()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self._stop.set()
+        self._thread.join()
+        self._sample()
+        self._elapsed = time.perf_counter() - self._started
+        self._cpu_end = {name: process_tree_cpu_seconds(pid) for name, pid in self.pids.items()}
+
+    def results(self) -> Dict[str, Dict[str, Any]]:
+        results = {}
+        for name in self.pids:
+            cpu = max(0.0, self._cpu_end.get(name, 0.0) - self._cpu_start.get(name, 0.0))
+            results[name] = {
+                "cpu_seconds": round(cpu, 3),
+                # 100% = un núcleo ocupado todo el escenario
+                "cpu_percent": round(100 * cpu / self._elapsed, 1) if self._elapsed else 0.0,
+                "peak_rss_mb": round(self._peak_rss[name], 1),
+            }
+        return results
+
+
+def timing_stats(runs: List[Dict[str, float]]) -> Dict[str, Dict[str, float]]:
+    """Resumen por etapa de varias trazas ({etapa: segundos})."""
+    stages: Dict[str, List[float]] = {}
+    for timings in runs:
+        for stage, seconds in timings.items():
+            stages.setdefault(stage, []).append(seconds)
+    return {stage: summarize_latencies(values) for stage, values in stages.items()}
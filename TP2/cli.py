@@ -1,31 +1,327 @@
-# client.py
-import requests
+# cli.py
+"""
+Cliente del Servidor de Scraping.
+
+- Una URL:      python cli.py https://www.python.org [--metadata] [--links] ...
+- Muchas URLs:  python cli.py --input urls.txt --output resultados.ndjson
+
+En modo masivo las URLs se leen de un archivo (o de stdin con '-') y se
+envían a /scrape con concurrencia acotada, reintentando con espera
+exponencial los errores transitorios. Cada resultado se agrega como una
+línea al NDJSON de salida apenas llega, y la URL se anota en el archivo de
+checkpoint: si la corrida se corta, el mismo comando retoma donde quedó.
+El progreso (URLs/s, tasa de error) se muestra en stderr.
+"""
+
+import argparse
+import asyncio
 import json
+import random
+import sys
+import time
+from typing import Dict, Any, Optional, Set, TextIO, Tuple
+from urllib.parse import urljoin
+
+import aiohttp
+
+DEFAULT_SERVER = "http://localhost:8080"
+DEFAULT_CONCURRENCY = 16
+DEFAULT_RETRIES = 4
+# Espera antes del reintento n: BACKOFF_BASE * 2^n (con jitter), como mucho BACKOFF_MAX
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 30.0
+# Plazo que se le da al servidor por URL (?timeout=) y margen extra del lado del cliente
+DEFAULT_TIMEOUT = 90.0
+CLIENT_TIMEOUT_MARGIN = 10.0
+PROGRESS_INTERVAL = 1.0
+# Líneas leídas de la entrada por vez
+INPUT_BATCH_BYTES = 64 * 1024
+
+# Estados HTTP que vale la pena reintentar
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# Flag de la línea de comandos -> sección del informe (ver ?sections= en el servidor)
+SECTION_FLAGS = ("metadata", "links", "performance", "screenshot")
+
+
+class TransientError(Exception):
+    """Fallo que puede resolverse reintentando (red, timeout, 5xx, 429)."""
+
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def build_params(args: argparse.Namespace) -> Dict[str, str]:
+    """Parámetros de /scrape comunes a todas las URLs."""
+    params = {"timeout": str(args.timeout)}
+    sections = [name for name in SECTION_FLAGS if getattr(args, name)]
+    if sections:
+        params["sections"] = ",".join(sections)
+    if args.full_links:
+        params["full_links"] = "true"
+    if args.profile:
+        params["profile"] = args.profile
+    if args.refresh:
+        params["cache"] = "refresh"
+    return params
+
+
+def backoff_delay(attempt: int, retry_after: Optional[float] = None) -> float:
+    if retry_after is not None:
+        return min(retry_after, BACKOFF_MAX)
+    # Jitter completo: los clientes que fallaron juntos no reintentan juntos
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+
+
+async def scrape_once(session: aiohttp.ClientSession, server: str, url: str,
+                      params: Dict[str, str], timeout: float) -> Dict[str, Any]:
+    """
+    Un pedido a /scrape. Devuelve el informe (o un registro de error si el
+    servidor rechazó la URL) y lanza TransientError si conviene reintentar.
+    """
+    try:
+        async with session.get(urljoin(server, "/scrape"), params=dict(params, url=url),
+                               timeout=aiohttp.ClientTimeout(total=timeout)) as response:
+            if response.status in RETRY_STATUSES:
+                retry_after = response.headers.get("Retry-After")
+                raise TransientError(f"HTTP {response.status}",
+                                     float(retry_after) if retry_after and retry_after.isdigit() else None)
+            if response.status != 200:
+                # Error definitivo (ej. 400): reintentar daría lo mismo
+                message = (await response.text()).strip()
+                return {"url": url, "status": "error", "message": f"HTTP {response.status}: {message}"}
+            try:
+                return await response.json(content_type=None)
+            except ValueError as e:
+                return {"url": url, "status": "error", "message": f"Respuesta inválida del servidor: {e}"}
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        raise TransientError(f"{type(e).__name__}: {e}" if str(e) else type(e).__name__)
+
+
+class BulkRunner:
+    """
+    Corrida masiva: un lector de la entrada alimenta una cola acotada y
+    'concurrency' corrutinas la consumen, así la memoria no depende del
+    largo de la lista. Las sesiones HTTP comparten un pool de conexiones.
+    """
+
+    def __init__(self, args: argparse.Namespace, output: TextIO, checkpoint: TextIO, done: Set[str]):
+        self.args = args
+        self.output = output
+        self.checkpoint = checkpoint
+        self.done = done
+        self.params = build_params(args)
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=args.concurrency * 2)
+        self.stats = {"ok": 0, "partial": 0, "errors": 0, "failed": 0, "retries": 0, "skipped": 0, "in_flight": 0}
+        self.started = time.monotonic()
+        self._window = (self.started, 0)
+
+    @property
+    def finished(self) -> int:
+        return self.stats["ok"] + self.stats["partial"] + self.stats["errors"] + self.stats["failed"]
+
+    async def read_input(self, source: TextIO) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            # La lectura bloquea (stdin puede ser un pipe lento): va en un hilo
+            lines = await loop.run_in_executor(None, source.readlines, INPUT_BATCH_BYTES)
+            if not lines:
+                break
+            for line in lines:
+                url = line.strip()
+                if not url or url.startswith("#"):
+                    continue
+                if url in self.done:
+                    self.stats["skipped"] += 1
+                    continue
+                # También evita repetir URLs duplicadas dentro de la entrada
+                self.done.add(url)
+                await self.queue.put(url)
+        for _ in range(self.args.concurrency):
+            await self.queue.put(None)
 
-# URL del servidor de scraping
-SERVER_URL = "http://localhost:8080/scrape"
+    async def process(self, session: aiohttp.ClientSession, url: str) -> None:
+        client_timeout = self.args.timeout + CLIENT_TIMEOUT_MARGIN
+        for attempt in range(self.args.retries + 1):
+            try:
+                report = await scrape_once(session, self.args.server, url, self.params, client_timeout)
+                break
+            except TransientError as e:
+                if attempt == self.args.retries:
+                    # Sin respuesta del servidor: no se anota en el checkpoint, se reintenta al reanudar
+                    self.stats["failed"] += 1
+                    self.done.discard(url)
+                    self.write_result({"url": url, "status": "error", "message": str(e), "retryable": True})
+                    return
+                self.stats["retries"] += 1
+                await asyncio.sleep(backoff_delay(attempt, e.retry_after))
 
-# URL que quieres analizar
-TARGET_URL = "https://www.wikipedia.org"
+        status = report.get("status")
+        key = {"success": "ok", "partial_failure": "partial"}.get(status, "errors")
+        self.stats[key] += 1
+        self.write_result(report)
+        # Primero el resultado, después el checkpoint: si se corta en el medio,
+        # al reanudar la URL se repite (nunca se pierde)
+        self.checkpoint.write(url + "\n")
+        self.checkpoint.flush()
 
-print(f"Solicitando análisis para: {TARGET_URL}")
+    def write_result(self, record: Dict[str, Any]) -> None:
+        self.output.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self.output.flush()
 
-try:
-    # Hacemos la petición GET al servidor A
-    response = requests.get(SERVER_URL, params={"url": TARGET_URL}, timeout=100)
-    
-    # Nos aseguramos de que la petición fue exitosa
-    response.raise_for_status()
-    
-    # Imprimimos la respuesta JSON de forma legible
-    data = response.json()
+    async def worker(self, session: aiohttp.ClientSession) -> None:
+        while True:
+            url = await self.queue.get()
+            if url is None:
+                return
+            self.stats["in_flight"] += 1
+            try:
+                await self.process(session, url)
+            finally:
+                self.stats["in_flight"] -= 1
+
+    def progress_line(self) -> str:
+        now = time.monotonic()
+        finished = self.finished
+        window_start, window_count = self._window
+        rate = (finished - window_count) / max(now - window_start, 1e-6)
+        self._window = (now, finished)
+        errors = self.stats["errors"] + self.stats["failed"]
+        error_rate = 100 * errors / finished if finished else 0.0
+        return (f"⏱️ {finished} listas ({self.stats['skipped']} ya hechas) | {rate:.1f} URLs/s | "
+                f"errores {error_rate:.1f}% | reintentos {self.stats['retries']} | en vuelo {self.stats['in_flight']}")
+
+    async def report_progress(self) -> None:
+        interactive = sys.stderr.isatty()
+        while True:
+            await asyncio.sleep(PROGRESS_INTERVAL)
+            line = self.progress_line()
+            if interactive:
+                sys.stderr.write("\r\033[K" + line)
+            else:
+                sys.stderr.write(line + "\n")
+            sys.stderr.flush()
+
+    async def run(self, source: TextIO) -> None:
+        connector = aiohttp.TCPConnector(limit=self.args.concurrency)
+        async with aiohttp.ClientSession(connector=connector) as session:
+            progress = asyncio.ensure_future(self.report_progress())
+            try:
+                workers = [asyncio.ensure_future(self.worker(session)) for _ in range(self.args.concurrency)]
+                await asyncio.gather(self.read_input(source), *workers)
+            finally:
+                progress.cancel()
+                if sys.stderr.isatty():
+                    sys.stderr.write("\n")
+
+    def summary(self) -> str:
+        elapsed = time.monotonic() - self.started
+        return (f"✅ {self.stats['ok']} ok, {self.stats['partial']} parciales, {self.stats['errors']} con error, "
+                f"{self.stats['failed']} sin respuesta, {self.stats['skipped']} ya hechas | "
+                f"{self.finished} en {elapsed:.1f} s ({self.finished / max(elapsed, 1e-6):.1f} URLs/s)")
+
+
+def load_checkpoint(path: str) -> Set[str]:
+    try:
+        with open(path, encoding="utf-8") as f:
+            return {line.strip() for line in f if line.strip()}
+    except FileNotFoundError:
+        return set()
+
+
+def run_bulk(args: argparse.Namespace) -> int:
+    checkpoint_path = args.checkpoint or f"{args.output}.checkpoint"
+    done = load_checkpoint(checkpoint_path)
+    if done:
+        print(f"↩️ Reanudando: {len(done)} URLs ya procesadas según {checkpoint_path}", file=sys.stderr)
+
+    source = sys.stdin if args.input == "-" else open(args.input, encoding="utf-8")
+    # Modo 'a': al reanudar se agregan resultados a los que ya había
+    with source, open(args.output, "a", encoding="utf-8") as output, \
+            open(checkpoint_path, "a", encoding="utf-8") as checkpoint:
+        runner = BulkRunner(args, output, checkpoint, done)
+        try:
+            asyncio.run(runner.run(source))
+        except KeyboardInterrupt:
+            print("\n⏹️ Interrumpido. Se retoma con el mismo comando.", file=sys.stderr)
+            print(runner.summary(), file=sys.stderr)
+            return 130
+    print(runner.summary(), file=sys.stderr)
+    return 1 if runner.stats["failed"] else 0
+
+
+async def scrape_single(args: argparse.Namespace) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+    async with aiohttp.ClientSession() as session:
+        for attempt in range(args.retries + 1):
+            try:
+                return await scrape_once(session, args.server, args.url, build_params(args),
+                                         args.timeout + CLIENT_TIMEOUT_MARGIN), None
+            except TransientError as e:
+                if attempt == args.retries:
+                    return None, str(e)
+                await asyncio.sleep(backoff_delay(attempt, e.retry_after))
+
+
+def run_single(args: argparse.Namespace) -> int:
+    if not args.json:
+        print(f"Solicitando análisis para: {args.url}")
+    report, error = asyncio.run(scrape_single(args))
+    if report is None:
+        print(f"\n❌ Error al conectar con el servidor: {error}", file=sys.stderr)
+        return 1
+
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False))
+        return 0
     print("\n✅ ¡Respuesta recibida exitosamente!")
-    
-    # Para no imprimir la imagen larguísima en base64, la omitimos
-    if data.get("processing_data", {}).get("screenshot"):
-        data["processing_data"]["screenshot"] = "¡Imagen recibida! (omitida por brevedad)"
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+
+    # El screenshot no viene en el JSON: el informe trae su referencia para descargarlo
+    screenshot = report.get("processing_data", {}).get("screenshot")
+    if isinstance(screenshot, dict):
+        print(f"\n📸 Screenshot disponible en: {urljoin(args.server, screenshot['url'])}")
+    return 0 if report.get("status") != "error" else 1
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Cliente del Servidor de Scraping (una URL o muchas)")
+    parser.add_argument("url", nargs="?", help="URL a analizar (modo de una sola URL)")
+    parser.add_argument("--server", default=DEFAULT_SERVER, help="Dirección del Servidor de Scraping")
+
+    # Qué partes del informe pedir (por defecto, todas)
+    for name in SECTION_FLAGS:
+        parser.add_argument(f"--{name}", action="store_true", help=f"Pedir la sección '{name}'")
+    parser.add_argument("--full-links", action="store_true", help="Todos los enlaces, no solo los primeros 20")
+    parser.add_argument("--profile", default=None, help="Perfil de render: full, fast o text-only")
+    parser.add_argument("--refresh", action="store_true", help="Ignorar la caché del servidor")
+    parser.add_argument("--timeout", type=float, default=DEFAULT_TIMEOUT, help="Plazo por URL, en segundos")
+    parser.add_argument("--retries", type=int, default=DEFAULT_RETRIES,
+                        help="Reintentos ante errores transitorios (red, 5xx, 429)")
+    parser.add_argument("--json", action="store_true", help="Solo el JSON del informe (modo de una URL)")
+
+    # Modo masivo
+    parser.add_argument("-i", "--input", help="Archivo con una URL por línea ('-' para stdin)")
+    parser.add_argument("-o", "--output", help="Archivo NDJSON donde se agregan los resultados")
+    parser.add_argument("--checkpoint", help="Archivo de URLs terminadas (por defecto, <output>.checkpoint)")
+    parser.add_argument("-c", "--concurrency", type=int, default=DEFAULT_CONCURRENCY,
+                        help="Pedidos simultáneos al servidor")
+
+    args = parser.parse_args()
+    if args.retries < 0:
+        parser.error("--retries no puede ser negativo")
+    if args.input:
+        if args.url:
+            parser.error("Usar una URL o --input, no ambos")
+        if not args.output:
+            parser.error("--input requiere --output")
+        if args.concurrency < 1:
+            parser.error("--concurrency debe ser al menos 1")
+        return run_bulk(args)
+    if not args.url:
+        parser.error("Indicar una URL o --input")
+    return run_single(args)
 
-    print(json.dumps(data, indent=2, ensure_ascii=False))
 
-except requests.exceptions.RequestException as e:
-    print(f"\n❌ Error al conectar con el servidor: {e}")
\ No newline at end of file
+if __name__ == "__main__":
+    sys.exit(main())
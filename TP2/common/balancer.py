@@ -0,0 +1,199 @@
+# common/balancer.py
+
+import asyncio
+import time
+from typing import Dict, Any, List, Optional, Tuple
+
+from common.protocol import ProcessorClient, ProtocolError, DEFAULT_BUSY_RETRIES, MAX_RETRY_AFTER
+from common.metrics import REGISTRY
+
+DEFAULT_HEALTH_INTERVAL = 5.0
+HEALTH_TIMEOUT = 3.0
+
+NODE_REQUESTS = REGISTRY.counter(
+    "processor_node_requests_total", "Envíos a cada nodo de procesamiento por resultado", ["node", "status"])
+
+
+def parse_node(value: str) -> Tuple[str, int]:
+    """'host:puerto' -> (host, puerto). Acepta IPv6 entre corchetes: '[::1]:8081'."""
+    host, sep, port = value.rpartition(":")
+    if not sep or not port.isdigit():
+        raise ValueError(f"Nodo inválido: {value!r} (usar HOST:PUERTO)")
+    return host.strip("[]"), int(port)
+
+
+class ProcessorNode:
+    """Un Servidor B con su cliente, su estado de salud y la última carga que informó."""
+
+    def __init__(self, host: str, port: int):
+        self.client = ProcessorClient(host, port)
+        self.name = f"{host}:{port}"
+        self.healthy = True
+        self.backlog = 0
+        self.capacity = 1
+        self.failures = 0
+        self.last_seen = 0.0
+
+    def update_load(self, load: Optional[Dict[str, int]]) -> None:
+        if load:
+            self.backlog = load.get("backlog", self.backlog)
+            self.capacity = max(1, load.get("capacity", self.capacity))
+        self.last_seen = time.monotonic()
+
+    @property
+    def score(self) -> float:
+        """
+        Trabajo pendiente por trabajador. La carga informada incluye las
+        tareas de todos los Servidores A; las nuestras en vuelo pueden ser
+        más nuevas que el último informe, así que tomamos el mayor.
+        """
+        return max(self.backlog, self.client.in_flight) / self.capacity
+
+    def mark_failed(self, error: Exception) -> None:
+        self.failures += 1
+        if self.healthy:
+            print(f"🚫 Nodo {self.name} fuera de servicio: {error}")
+        self.healthy = False
+
+    def mark_healthy(self) -> None:
+        if not self.healthy:
+            print(f"✅ Nodo {self.name} vuelve al servicio.")
+        self.healthy = True
+        self.failures = 0
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "node": self.name,
+            "healthy": self.healthy,
+            "backlog": self.backlog,
+            "capacity": self.capacity,
+            "in_flight": self.client.in_flight,
+            "failures": self.failures,
+        }
+
+
+class ProcessorCluster:
+    """
+    Reparte tareas entre varios Servidores B:
+
+    - Elige el nodo sano con menos trabajo pendiente por trabajador
+      (según la carga que cada nodo informa en sus respuestas).
+    - Un chequeo periódico (ping) saca de servicio a los nodos caídos y
+      vuelve a admitirlos cuando responden.
+    - Si la conexión con un nodo falla, lo marca caído y reintenta la
+      tarea en otro. Si un nodo responde "busy", prueba con otro; si todos
+      están ocupados, espera 'retry_after' y vuelve a intentar.
+
+    Tiene la misma interfaz send_task()/close() que ProcessorClient.
+    """
+
+    def __init__(self, nodes: List[Tuple[str, int]], health_interval: float = DEFAULT_HEALTH_INTERVAL,
+                 busy_retries: int = DEFAULT_BUSY_RETRIES):
+        if not nodes:
+            raise ValueError("Se necesita al menos un nodo de procesamiento")
+        self.nodes = [ProcessorNode(host, port) for host, port in nodes]
+        self.health_interval = health_interval
+        self.busy_retries = busy_retries
+        self._health_task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        self._health_task = asyncio.ensure_future(self._health_loop())
+
+    async def close(self) -> None:
+        if self._health_task is not None:
+            self._health_task.cancel()
+            try:
+                await self._health_task
+            except asyncio.CancelledError:
+                pass
+        for node in self.nodes:
+            await node.client.close()
+
+    # --- Salud ---
+
+    async def _check(self, node: ProcessorNode) -> None:
+        try:
+            response = await node.client.request({"control": "ping"}, timeout=HEALTH_TIMEOUT)
+        except Exception as e:
+            node.mark_failed(e)
+            return
+        if response.get("status") == "draining":
+            # El nodo se está cerrando: deja de recibir tareas nuevas
+            node.mark_failed(ConnectionError(response.get("message", "el nodo se está cerrando")))
+            return
+        node.update_load(response.get("load"))
+        node.mark_healthy()
+
+    async def _health_loop(self) -> None:
+        while True:
+            await asyncio.gather(*(self._check(node) for node in self.nodes))
+            await asyncio.sleep(self.health_interval)
+
+    # --- Envío ---
+
+    def _candidates(self) -> List[ProcessorNode]:
+        """Nodos sanos, del menos al más cargado. Si todos figuran caídos, probamos igual con todos."""
+        healthy = [node for node in self.nodes if node.healthy] or list(self.nodes)
+        return sorted(healthy, key=lambda node: node.score)
+
+    async def send_task(self, task: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Envía la tarea al mejor nodo disponible. Nunca lanza excepciones:
+        los errores vuelven como {"status": "error", "message": ...}.
+        """
+        last_error = "No hay nodos de procesamiento disponibles."
+        for attempt in range(self.busy_retries + 1):
+            retry_after = None
+
+            for node in self._candidates():
+                print(f"▶️  Enviando tarea '{task.get('task')}' al nodo {node.name}...")
+                try:
+                    response = await node.client.request(task)
+                except asyncio.TimeoutError:
+                    NODE_REQUESTS.inc(node=node.name, status="timeout")
+                    # El nodo está vivo pero la tarea tardó demasiado: no se reintenta
+                    if task.get("deadline") is not None and time.time() >= task["deadline"]:
+                        error_msg = f"Error: Se venció el plazo de la tarea esperando al nodo {node.name}."
+                    else:
+                        error_msg = f"Error: El nodo {node.name} no respondió en {node.client.timeout} segundos."
+                    print(f"❌ {error_msg}")
+                    return {"status": "error", "message": error_msg}
+                except (OSError, ProtocolError) as e:
+                    NODE_REQUESTS.inc(node=node.name, status="connection_error")
+                    node.mark_failed(e)
+                    last_error = f"Error en la comunicación con el nodo {node.name}: {e}"
+                    continue
+
+                node.update_load(response.get("load"))
+                node.mark_healthy()
+                NODE_REQUESTS.inc(node=node.name, status=response.get("status", "unknown"))
+                if response.get("status") == "busy":
+                    retry_after = min(retry_after or MAX_RETRY_AFTER, float(response.get("retry_after", 1)))
+                    last_error = f"Servidor de procesamiento ocupado: {response.get('message')}"
+                    continue
+
+                print(f"◀️  Respuesta recibida del nodo {node.name}.")
+                return response
+
+            if retry_after is None or attempt == self.busy_retries:
+                break
+            delay = min(retry_after, MAX_RETRY_AFTER)
+            if task.get("deadline") is not None and time.time() + delay >= task["deadline"]:
+                # Reintentar sería trabajo que ya no llega a tiempo
+                break
+            print(f"⏳ Todos los nodos ocupados; reintentando en {delay} s...")
+            await asyncio.sleep(delay)
+
+        print(f"❌ {last_error}")
+        return {"status": "error", "message": last_error}
+
+    @property
+    def in_flight(self) -> int:
+        return sum(node.client.in_flight for node in self.nodes)
+
+    @property
+    def healthy_nodes(self) -> int:
+        return sum(1 for node in self.nodes if node.healthy)
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        return [node.snapshot() for node in self.nodes]
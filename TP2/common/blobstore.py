@@ -0,0 +1,63 @@
+# common/blobstore.py
+
+import hashlib
+import os
+import re
+import tempfile
+from typing import Optional
+
+# Nombre de un blob: sha256 en hexadecimal + extensión (ej. "ab12...ef.png")
+BLOB_NAME_RE = re.compile(r"^[0-9a-f]{64}\.[a-z0-9]{1,5}$")
+
+CONTENT_TYPES = {
+    "png": "image/png",
+    "jpeg": "image/jpeg",
+    "webp": "image/webp",
+}
+
+
+class BlobStore:
+    """
+    Almacén de archivos direccionado por contenido en disco local.
+    El nombre de cada blob es el hash de sus bytes, así que guardar dos veces
+    la misma imagen no ocupa el doble y una referencia nunca queda desactualizada.
+    Los métodos son bloqueantes: desde asyncio hay que llamarlos en un executor.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, name: str) -> str:
+        # Subdirectorio por los dos primeros caracteres para no llenar uno solo
+        return os.path.join(self.root, name[:2], name)
+
+    def put(self, data: bytes, extension: str) -> str:
+        """Guarda los bytes y devuelve el nombre del blob."""
+        name = f"{hashlib.sha256(data).hexdigest()}.{extension}"
+        path = self._path(name)
+        if os.path.exists(path):
+            return name
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Temporal con nombre único: varios hilos pueden guardar el mismo blob a la vez
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            # Reemplazo atómico: nunca se sirve un archivo a medio escribir
+            os.replace(tmp_path, path)
+        except OSError:
+            # Si otro ya lo guardó son los mismos bytes (el nombre es el hash)
+            if not os.path.exists(path):
+                raise
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        return name
+
+    def path_for(self, name: str) -> Optional[str]:
+        """Ruta del blob, o None si el nombre es inválido o no existe."""
+        if not BLOB_NAME_RE.match(name):
+            return None
+        path = self._path(name)
+        return path if os.path.isfile(path) else None
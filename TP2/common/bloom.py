@@ -0,0 +1,56 @@
+# common/bloom.py
+
+import hashlib
+import math
+
+
+class BloomFilter:
+    """
+    Conjunto aproximado de memoria fija: 'x in filtro' puede dar un falso
+    positivo (con probabilidad ~error_rate mientras no se superen
+    'capacity' elementos), pero nunca un falso negativo.
+
+    Para un crawl eso significa, en el peor caso, saltear alguna URL nueva;
+    a cambio, un millón de URLs (con error_rate=0.001) ocupa ~1.8 MB en vez
+    de cientos de MB.
+    """
+
+    def __init__(self, capacity: int, error_rate: float = 0.001):
+        if capacity <= 0 or not 0 < error_rate < 1:
+            raise ValueError("capacity debe ser > 0 y error_rate estar entre 0 y 1")
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.size = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item: str):
+        # Doble hashing (Kirsch-Mitzenmacher): k posiciones a partir de dos hashes de 64 bits
+        digest = hashlib.blake2b(item.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        for i in range(self.hashes):
+            yield (h1 + i * h2) % self.size
+
+    def add(self, item: str) -> bool:
+        """Agrega 'item'. Devuelve False si (probablemente) ya estaba."""
+        added = False
+        for position in self._positions(item):
+            byte, bit = divmod(position, 8)
+            if not self.bits[byte] & (1 << bit):
+                self.bits[byte] |= 1 << bit
+                added = True
+        if added:
+            self.count += 1
+        return added
+
+    def __contains__(self, item: str) -> bool:
+        return all(self.bits[position // 8] & (1 << (position % 8)) for position in self._positions(item))
+
+    def __len__(self) -> int:
+        return self.count
+
+    @property
+    def memory_bytes(self) -> int:
+        return len(self.bits)
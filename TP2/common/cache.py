@@ -0,0 +1,209 @@
+# common/cache.py
+
+import asyncio
+import hashlib
+import json
+import os
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Awaitable, Callable, Optional, Tuple
+
+from common.urls import normalize_url
+
+DEFAULT_MAX_ENTRIES = 256
+DEFAULT_TTL = 300
+DEFAULT_DISK_MAX_ENTRIES = 10000
+
+
+def make_cache_key(url: str, options: Dict[str, Any]) -> str:
+    """Clave = URL normalizada + opciones pedidas (en orden estable)."""
+    return f"{normalize_url(url)}|{json.dumps(options, sort_keys=True)}"
+
+
+class ResultCache:
+    """
+    Caché de resultados de análisis con dos niveles:
+
+    - Memoria: LRU acotada por cantidad de entradas y por TTL.
+    - Disco (opcional): un JSON por clave, con su propio TTL; sobrevive a
+      reinicios y a lo que la LRU expulsa.
+
+    Además hace "single-flight": si llegan varios pedidos de la misma clave
+    mientras se está calculando, todos esperan ese único cálculo.
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES, ttl: float = DEFAULT_TTL,
+                 disk_dir: Optional[str] = None, disk_ttl: Optional[float] = None,
+                 disk_max_entries: int = DEFAULT_DISK_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.disk_dir = disk_dir
+        self.disk_ttl = disk_ttl if disk_ttl is not None else ttl
+        self.disk_max_entries = disk_max_entries
+        self._memory: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._in_flight: Dict[str, asyncio.Future] = {}
+        # Pedidos esperando cada cálculo en curso
+        self._waiters: Dict[str, int] = {}
+        self._disk_writes = 0
+        self.stats = {"hits": 0, "disk_hits": 0, "misses": 0, "coalesced": 0, "refreshes": 0, "abandoned": 0}
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    # --- Memoria ---
+
+    def _memory_get(self, key: str) -> Optional[Dict[str, Any]]:
+        entry = self._memory.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.time():
+            del self._memory[key]
+            return None
+        self._memory.move_to_end(key)
+        return value
+
+    def _memory_set(self, key: str, value: Dict[str, Any], expires_at: float) -> None:
+        self._memory[key] = (expires_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    # --- Disco (se usa desde un hilo para no bloquear el event loop) ---
+
+    def _disk_path(self, key: str) -> str:
+        digest = hashlib.sha256(key.encode('utf-8')).hexdigest()
+        return os.path.join(self.disk_dir, f"{digest}.json")
+
+    def _disk_get(self, key: str) -> Optional[Tuple[float, Dict[str, Any]]]:
+        path = self._disk_path(key)
+        try:
+            with open(path, encoding='utf-8') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if entry.get("key") != key or entry.get("expires_at", 0) < time.time():
+            return None
+        return entry["expires_at"], entry["value"]
+
+    def _disk_set(self, key: str, value: Dict[str, Any]) -> None:
+        path = self._disk_path(key)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        entry = {"key": key, "expires_at": time.time() + self.disk_ttl, "value": value}
+        try:
+            with open(tmp_path, "w", encoding='utf-8') as f:
+                json.dump(entry, f)
+            # Reemplazo atómico: un lector nunca ve un archivo a medio escribir
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"⚠️ No se pudo guardar en la caché de disco: {e}")
+
+    def _disk_prune(self) -> None:
+        """Borra los archivos más viejos si el directorio supera el máximo."""
+        try:
+            entries = [entry for entry in os.scandir(self.disk_dir) if entry.name.endswith(".json")]
+        except OSError:
+            return
+        excess = len(entries) - self.disk_max_entries
+        if excess <= 0:
+            return
+        entries.sort(key=lambda entry: entry.stat().st_mtime)
+        for entry in entries[:excess]:
+            try:
+                os.remove(entry.path)
+            except OSError:
+                pass
+
+    # --- API ---
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        value = self._memory_get(key)
+        if value is not None:
+            self.stats["hits"] += 1
+            return value
+        if self.disk_dir:
+            loop = asyncio.get_running_loop()
+            entry = await loop.run_in_executor(None, self._disk_get, key)
+            if entry is not None:
+                expires_at, value = entry
+                # Lo subimos a memoria, sin estirarle la vida más allá del TTL de memoria
+                self._memory_set(key, value, min(expires_at, time.time() + self.ttl))
+                self.stats["disk_hits"] += 1
+                return value
+        return None
+
+    async def set(self, key: str, value: Dict[str, Any]) -> None:
+        self._memory_set(key, value, time.time() + self.ttl)
+        if self.disk_dir:
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(None, self._disk_set, key, value)
+            self._disk_writes += 1
+            if self._disk_writes % 100 == 0:
+                await loop.run_in_executor(None, self._disk_prune)
+
+    async def get_or_compute(self, key: str, compute: Callable[[], Awaitable[Dict[str, Any]]],
+                             refresh: bool = False,
+                             cacheable: Callable[[Dict[str, Any]], bool] = lambda value: True
+                             ) -> Tuple[Dict[str, Any], str]:
+        """
+        Devuelve (valor, origen) con origen en "hit", "disk", "coalesced" o "miss".
+        Con refresh=True se ignora lo guardado y se recalcula (aunque, si ya hay
+        un cálculo en curso, se comparte: su resultado es tan nuevo como uno propio).
+        Solo se guardan los valores para los que cacheable(valor) es True.
+        """
+        if not refresh:
+            hits_before = self.stats["hits"]
+            value = await self.get(key)
+            if value is not None:
+                return value, "hit" if self.stats["hits"] > hits_before else "disk"
+        else:
+            self.stats["refreshes"] += 1
+
+        future = self._in_flight.get(key)
+        if future is not None:
+            self.stats["coalesced"] += 1
+            return await self._wait(key, future), "coalesced"
+
+        self.stats["misses"] += 1
+
+        async def run() -> Dict[str, Any]:
+            try:
+                value = await compute()
+                if cacheable(value):
+                    await self.set(key, value)
+                return value
+            finally:
+                self._in_flight.pop(key, None)
+                self._waiters.pop(key, None)
+
+        future = asyncio.ensure_future(run())
+        self._in_flight[key] = future
+        return await self._wait(key, future), "miss"
+
+    async def _wait(self, key: str, future: asyncio.Future) -> Dict[str, Any]:
+        """
+        Espera un cálculo compartido. shield: si este cliente se va, el
+        cálculo sigue para los demás; si se va el último, se cancela (y con
+        él las tareas que tenga en el Servidor B).
+        """
+        self._waiters[key] = self._waiters.get(key, 0) + 1
+        try:
+            return await asyncio.shield(future)
+        except asyncio.CancelledError:
+            if not future.done() and self._waiters.get(key) == 1:
+                self.stats["abandoned"] += 1
+                future.cancel()
+            raise
+        finally:
+            if self._in_flight.get(key) is future:
+                self._waiters[key] -= 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Contadores y tamaño actual, para exponer por HTTP."""
+        lookups = self.stats["hits"] + self.stats["disk_hits"] + self.stats["misses"] + self.stats["coalesced"]
+        served = lookups - self.stats["misses"]
+        return dict(
+            self.stats,
+            entries=len(self._memory),
+            in_flight=len(self._in_flight),
+            hit_ratio=round(served / lookups, 4) if lookups else 0.0,
+        )
@@ -0,0 +1,76 @@
+# common/encoding.py
+"""
+Serialización y compresión de las respuestas HTTP.
+
+- JSON con orjson si está instalado (varias veces más rápido); si no, el
+  json estándar sin espacios. En ambos casos UTF-8 sin escapar acentos.
+- Compresión negociada con Accept-Encoding: zstd (si está 'zstandard') o
+  gzip. Las respuestas chicas se mandan tal cual: comprimirlas no ahorra.
+"""
+
+import gzip
+import json
+from typing import Any, Optional, Tuple
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Por debajo de este tamaño no se comprime
+MIN_COMPRESS_BYTES = 1024
+# Niveles elegidos por velocidad: el cuerpo se comprime en cada respuesta
+GZIP_LEVEL = 5
+ZSTD_LEVEL = 3
+
+
+def dumps_json(value: Any) -> bytes:
+    """JSON compacto en UTF-8."""
+    if orjson is not None:
+        return orjson.dumps(value)
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode('utf-8')
+
+
+def available_encodings() -> Tuple[str, ...]:
+    """Codificaciones que puede producir este proceso, de la preferida a la menos preferida."""
+    return ("zstd", "gzip") if zstandard is not None else ("gzip",)
+
+
+def negotiate_encoding(accept_encoding: str) -> Optional[str]:
+    """
+    Elige la codificación para el encabezado Accept-Encoding del cliente, o
+    None para mandar el cuerpo sin comprimir. Respeta 'q=0' y el comodín '*'.
+    """
+    weights = {}
+    for part in accept_encoding.lower().split(","):
+        name, _, params = part.strip().partition(";")
+        if not name:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        weights[name.strip()] = q
+
+    best, best_q = None, 0.0
+    for encoding in available_encodings():
+        q = weights.get(encoding, weights.get("*", 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "zstd":
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(body)
+    if encoding == "gzip":
+        return gzip.compress(body, compresslevel=GZIP_LEVEL)
+    raise ValueError(f"Codificación no soportada: {encoding}")
@@ -0,0 +1,70 @@
+# common/procstats.py
+"""
+Consumo de CPU y memoria de un proceso y todos sus descendientes, leído
+de /proc. Solo Linux; en otros sistemas las funciones devuelven 0.
+"""
+
+import os
+from typing import Dict, List
+
+_CLOCK_TICKS = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+
+
+def _read_stat(pid: int) -> List[str]:
+    with open(f"/proc/{pid}/stat") as f:
+        # El nombre del proceso va entre paréntesis y puede tener espacios;
+        # devolvemos los campos que siguen a partir del estado (campo 3)
+        return f.read().rsplit(")", 1)[1].split()
+
+
+def process_tree_pids(root_pid: int) -> List[int]:
+    """El proceso y todos sus descendientes (hijos, nietos, ...)."""
+    if not os.path.isdir("/proc"):
+        return []
+
+    children: Dict[int, list] = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            ppid = int(_read_stat(int(entry))[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        children.setdefault(ppid, []).append(int(entry))
+
+    pids = []
+    pending = [root_pid]
+    while pending:
+        pid = pending.pop()
+        pids.append(pid)
+        pending.extend(children.get(pid, []))
+    return pids
+
+
+def process_tree_rss_mb(root_pid: int) -> float:
+    """Memoria residente (MB) del proceso y todos sus descendientes."""
+    page_size = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+    total_pages = 0
+    for pid in process_tree_pids(root_pid):
+        try:
+            with open(f"/proc/{pid}/statm") as f:
+                total_pages += int(f.read().split()[1])
+        except (OSError, IndexError, ValueError):
+            pass
+    return total_pages * page_size / (1024 * 1024)
+
+
+def process_tree_cpu_seconds(root_pid: int) -> float:
+    """
+    Segundos de CPU (usuario + sistema) consumidos por el proceso y sus
+    descendientes vivos, más lo que ya acumularon los hijos terminados.
+    """
+    ticks = 0
+    for pid in process_tree_pids(root_pid):
+        try:
+            # utime, stime, cutime, cstime son los campos 14 a 17 de /proc/<pid>/stat
+            fields = _read_stat(pid)
+            ticks += sum(int(value) for value in fields[11:15])
+        except (OSError, IndexError, ValueError):
+            pass
+    return ticks / _CLOCK_TICKS
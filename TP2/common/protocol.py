@@ -1,41 +1,323 @@
 # common/protocol.py
+"""
+Protocolo entre el Servidor A (scraping) y el Servidor B (procesamiento).
+
+Cada mensaje es un frame:
+
+    [4 bytes: largo del encabezado][4 bytes: largo del cuerpo][encabezado JSON][cuerpo binario]
+
+El encabezado lleva un 'id' que empareja la respuesta con su pedido, así
+que por una misma conexión pueden viajar muchas tareas a la vez y las
+respuestas pueden volver en cualquier orden. El cuerpo binario transporta
+los valores 'bytes' de la respuesta (ej. el PNG del screenshot) sin pasar
+por base64: el encabezado indica en 'attachments' dónde está cada uno.
+"""
 
 import asyncio
+import itertools
 import json
-from typing import Dict, Any
+import struct
+import time
+from typing import Dict, Any, List, Optional, Tuple
+
+FRAME_HEADER = struct.Struct("!II")
+# Límite de seguridad para no reservar memoria por un largo corrupto
+MAX_HEADER_SIZE = 16 * 1024 * 1024
+MAX_BODY_SIZE = 256 * 1024 * 1024
+
+DEFAULT_POOL_SIZE = 2
+DEFAULT_TASK_TIMEOUT = 90
+# Tope para conectarse al Servidor B (o esperar a que otra corrutina lo haga)
+DEFAULT_CONNECT_TIMEOUT = 5.0
+# Respuesta "busy" del Servidor B: cuántas veces reintentar y espera máxima entre intentos
+DEFAULT_BUSY_RETRIES = 3
+MAX_RETRY_AFTER = 10.0
+
+
+class ProtocolError(Exception):
+    """El otro extremo envió un frame inválido."""
+
+
+# --- Codificación de frames ---
+
+def encode_frame(header: Dict[str, Any], body: bytes = b"") -> bytes:
+    header_bytes = json.dumps(header).encode('utf-8')
+    return FRAME_HEADER.pack(len(header_bytes), len(body)) + header_bytes + body
+
+
+def _check_sizes(header_len: int, body_len: int) -> None:
+    if header_len > MAX_HEADER_SIZE or body_len > MAX_BODY_SIZE:
+        raise ProtocolError(f"Frame demasiado grande ({header_len} + {body_len} bytes)")
+
+
+def _decode_header(header_bytes: bytes) -> Dict[str, Any]:
+    try:
+        header = json.loads(header_bytes.decode('utf-8'))
+    except (UnicodeDecodeError, json.JSONDecodeError) as e:
+        raise ProtocolError(f"Encabezado inválido: {e}")
+    if not isinstance(header, dict):
+        raise ProtocolError("El encabezado debe ser un objeto JSON")
+    return header
+
+
+def pack_data(data: Any) -> Tuple[Any, Dict[str, List[int]], bytes]:
+    """
+    Separa los valores binarios de 'data' para mandarlos en el cuerpo.
+    Soporta 'data' como bytes o como dict con valores bytes en el primer nivel.
+    Devuelve (data_sin_binarios, attachments, cuerpo).
+    """
+    if isinstance(data, (bytes, bytearray)):
+        return None, {"": [0, len(data)]}, bytes(data)
+    if not isinstance(data, dict):
+        return data, {}, b""
+
+    attachments: Dict[str, List[int]] = {}
+    chunks = []
+    offset = 0
+    clean = {}
+    for key, value in data.items():
+        if isinstance(value, (bytes, bytearray)):
+            attachments[key] = [offset, len(value)]
+            chunks.append(bytes(value))
+            offset += len(value)
+        else:
+            clean[key] = value
+    return clean, attachments, b"".join(chunks)
+
+
+def unpack_data(data: Any, attachments: Dict[str, List[int]], body: bytes) -> Any:
+    """Inversa de pack_data: vuelve a poner los binarios en su lugar."""
+    if not attachments:
+        return data
+    if "" in attachments:
+        offset, length = attachments[""]
+        return body[offset:offset + length]
+    data = dict(data or {})
+    for key, (offset, length) in attachments.items():
+        data[key] = body[offset:offset + length]
+    return data
+
+
+def encode_response(request_id: Any, response: Dict[str, Any]) -> bytes:
+    """Frame de respuesta; los bytes dentro de response['data'] viajan en el cuerpo."""
+    header = dict(response)
+    header["id"] = request_id
+    body = b""
+    if "data" in response:
+        header["data"], attachments, body = pack_data(response["data"])
+        if attachments:
+            header["attachments"] = attachments
+    return encode_frame(header, body)
+
+
+def decode_response(header: Dict[str, Any], body: bytes) -> Dict[str, Any]:
+    response = dict(header)
+    response.pop("id", None)
+    attachments = response.pop("attachments", None)
+    if attachments:
+        response["data"] = unpack_data(response.get("data"), attachments, body)
+    return response
+
+
+# --- Lectura de frames (asyncio, en ambos servidores) ---
+
+async def read_frame(reader: asyncio.StreamReader) -> Tuple[Dict[str, Any], bytes]:
+    """Lee un frame completo. Si el otro extremo cierra, sale asyncio.IncompleteReadError."""
+    prefix = await reader.readexactly(FRAME_HEADER.size)
+    header_len, body_len = FRAME_HEADER.unpack(prefix)
+    _check_sizes(header_len, body_len)
+    payload = await reader.readexactly(header_len + body_len)
+    return _decode_header(payload[:header_len]), payload[header_len:]
+
+
+# --- Lado cliente ---
+
+class _Connection:
+    """Una conexión persistente con sus pedidos en vuelo."""
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.reader = reader
+        self.writer = writer
+        self.pending: Dict[int, asyncio.Future] = {}
+        self.write_lock = asyncio.Lock()
+        self.closed = False
+        self.reader_task = asyncio.ensure_future(self._read_loop())
+
+    async def _read_loop(self) -> None:
+        error: Exception = ConnectionError("El Servidor B cerró la conexión")
+        try:
+            while True:
+                header, body = await read_frame(self.reader)
+                future = self.pending.pop(header.get("id"), None)
+                if future is not None and not future.done():
+                    future.set_result(decode_response(header, body))
+        except asyncio.IncompleteReadError:
+            pass
+        except asyncio.CancelledError:
+            error = ConnectionError("Conexión cerrada")
+        except Exception as e:
+            error = e
+        finally:
+            self.closed = True
+            for future in self.pending.values():
+                if not future.done():
+                    future.set_exception(error)
+            self.pending.clear()
+            self.writer.close()
+
+    def cancel_remote(self, request_id: int) -> None:
+        """
+        Avisa al Servidor B que ya nadie espera la respuesta de 'request_id',
+        para que la saque de la cola o aborte el trabajador. Sin respuesta.
+        """
+        if self.closed or self.writer.is_closing():
+            return
+        # write() agrega el frame entero al buffer: no se intercala con otros envíos
+        self.writer.write(encode_frame({"control": "cancel", "target": request_id}))
+
+    async def send(self, request_id: int, task: Dict[str, Any]) -> None:
+        frame = encode_frame(dict(task, id=request_id))
+        async with self.write_lock:
+            self.writer.write(frame)
+            await self.writer.drain()
+
+    async def close(self) -> None:
+        self.reader_task.cancel()
+        try:
+            await self.reader_task
+        except asyncio.CancelledError:
+            pass
+        try:
+            await self.writer.wait_closed()
+        except Exception:
+            pass
+
+
+class ProcessorClient:
+    """
+    Cliente del Servidor B: mantiene un pequeño pool de conexiones
+    persistentes y multiplexa muchas tareas en vuelo sobre ellas.
+    """
+
+    def __init__(self, host: str, port: int, pool_size: int = DEFAULT_POOL_SIZE,
+                 timeout: float = DEFAULT_TASK_TIMEOUT, busy_retries: int = DEFAULT_BUSY_RETRIES,
+                 connect_timeout: float = DEFAULT_CONNECT_TIMEOUT):
+        self.host = host
+        self.port = port
+        self.pool_size = max(1, pool_size)
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+        self.busy_retries = busy_retries
+        self._connections: List[_Connection] = []
+        self._connect_lock = asyncio.Lock()
+        self._ids = itertools.count(1)
+
+    @property
+    def in_flight(self) -> int:
+        return sum(len(conn.pending) for conn in self._connections)
+
+    async def _get_connection(self) -> _Connection:
+        self._connections = [conn for conn in self._connections if not conn.closed]
+        idle = [conn for conn in self._connections if not conn.pending]
+        if idle or len(self._connections) >= self.pool_size:
+            return min(self._connections, key=lambda conn: len(conn.pending))
+
+        async with self._connect_lock:
+            # Otra corrutina pudo haber abierto la conexión mientras esperábamos
+            self._connections = [conn for conn in self._connections if not conn.closed]
+            if len(self._connections) < self.pool_size:
+                reader, writer = await asyncio.open_connection(self.host, self.port)
+                self._connections.append(_Connection(reader, writer))
+            return min(self._connections, key=lambda conn: len(conn.pending))
+
+    async def request(self, task: Dict[str, Any], timeout: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Envía una tarea y espera su respuesta. Las excepciones de red se
+        propagan; send_task() las convierte en {"status": "error"}.
+        Si la tarea trae 'deadline' (epoch en segundos), no se espera más allá
+        de ese momento. Si se deja de esperar (timeout o cancelación de quien
+        llamó), se le pide al Servidor B que cancele la tarea.
+        Conectarse tiene su propio tope (el menor entre 'connect_timeout' y
+        el plazo del pedido); si se supera se lanza ConnectionError, así un
+        nodo que no contesta se marca caído como uno que rechaza.
+        """
+        timeout = timeout or self.timeout
+        deadline = task.get("deadline")
+        if deadline is not None:
+            timeout = min(timeout, deadline - time.time())
+            if timeout <= 0:
+                raise asyncio.TimeoutError()
+
+        loop = asyncio.get_running_loop()
+        give_up = loop.time() + timeout
+        connect_timeout = min(self.connect_timeout, timeout)
+        try:
+            conn = await asyncio.wait_for(self._get_connection(), connect_timeout)
+        except asyncio.TimeoutError:
+            raise ConnectionError(f"No se pudo conectar a {self.host}:{self.port} en {connect_timeout:.1f} s")
+        request_id = next(self._ids)
+        future = loop.create_future()
+        conn.pending[request_id] = future
+        try:
+            await conn.send(request_id, task)
+            return await asyncio.wait_for(future, max(0.0, give_up - loop.time()))
+        except (asyncio.CancelledError, asyncio.TimeoutError):
+            if "control" not in task:
+                conn.cancel_remote(request_id)
+            raise
+        finally:
+            conn.pending.pop(request_id, None)
+
+    async def send_task(self, task: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Se conecta al servidor de procesamiento, envía una tarea y espera la respuesta.
+        Si el Servidor B responde "busy", espera lo que indica 'retry_after'
+        (con un tope) y reintenta hasta 'busy_retries' veces.
+        """
+        try:
+            print(f"▶️  Enviando tarea '{task.get('task')}' al Servidor B...")
+            response = await self.request(task)
+            for _ in range(self.busy_retries):
+                if response.get("status") != "busy":
+                    break
+                delay = min(float(response.get("retry_after", 1)), MAX_RETRY_AFTER)
+                print(f"⏳ Servidor B ocupado; reintentando en {delay} s...")
+                await asyncio.sleep(delay)
+                response = await self.request(task)
+            if response.get("status") == "busy":
+                return {"status": "error", "message": f"Servidor de procesamiento ocupado: {response.get('message')}"}
+            print(f"◀️  Respuesta recibida del Servidor B.")
+            return response
+
+        except ConnectionRefusedError:
+            error_msg = f"Error: La conexión con el servidor de procesamiento {self.host}:{self.port} fue rechazada."
+            print(f"❌ {error_msg}")
+            return {"status": "error", "message": error_msg}
+        except asyncio.TimeoutError:
+            if task.get("deadline") is not None and time.time() >= task["deadline"]:
+                error_msg = "Error: Se venció el plazo de la tarea esperando al servidor de procesamiento."
+            else:
+                error_msg = f"Error: El servidor de procesamiento no respondió en {self.timeout} segundos."
+            print(f"❌ {error_msg}")
+            return {"status": "error", "message": error_msg}
+        except Exception as e:
+            error_msg = f"Error en la comunicación con el servidor de procesamiento: {e}"
+            print(f"❌ {error_msg}")
+            return {"status": "error", "message": error_msg}
+
+    async def close(self) -> None:
+        connections, self._connections = self._connections, []
+        for conn in connections:
+            await conn.close()
+
 
 async def send_task_to_processor(task: Dict[str, Any], host: str, port: int) -> Dict[str, Any]:
     """
-    Se conecta al servidor de procesamiento, envía una tarea y espera la respuesta.
+    Envío puntual con una conexión propia. Para uso continuo conviene un
+    ProcessorClient compartido, que reutiliza las conexiones.
     """
+    client = ProcessorClient(host, port, pool_size=1)
     try:
-        # Abre una conexión asíncrona con el servidor de procesamiento
-        reader, writer = await asyncio.open_connection(host, port)
-
-        # Prepara y envía el mensaje
-        message = json.dumps(task).encode('utf-8')
-        print(f"▶️  Enviando tarea '{task.get('task')}' al Servidor B...")
-        writer.write(message)
-        await writer.drain() # Espera a que el mensaje se envíe completamente
-
-        # Cierra el canal de escritura para indicar que no enviaremos más datos
-        writer.close_write()
-
-        # Lee la respuesta del servidor
-        response_data = await reader.read()
-        print(f"◀️  Respuesta recibida del Servidor B.")
-
-        # Cierra la conexión
-        writer.close()
-        await writer.wait_closed()
-
-        return json.loads(response_data.decode('utf-8'))
-
-    except ConnectionRefusedError:
-        error_msg = "Error: La conexión con el servidor de procesamiento fue rechazada."
-        print(f"❌ {error_msg}")
-        return {"status": "error", "message": error_msg}
-    except Exception as e:
-        error_msg = f"Error en la comunicación con el servidor de procesamiento: {e}"
-        print(f"❌ {error_msg}")
-        return {"status": "error", "message": error_msg}
\ No newline at end of file
+        return await client.send_task(task)
+    finally:
+        await client.close()
@@ -0,0 +1,227 @@
+# processor/browser.py
+
+import os
+import multiprocessing
+import multiprocessing.util
+import signal
+from contextlib import contextmanager
+import time
+from typing import Dict, Any, Iterator, Optional
+from playwright.sync_api import sync_playwright, Page, Error as PlaywrightError, TimeoutError as PlaywrightTimeoutError
+
+from common.metrics import Trace
+from common.procstats import process_tree_rss_mb
+
+# Valores por defecto del reciclado (se pueden sobreescribir desde init_worker)
+DEFAULT_MAX_TASKS = int(os.environ.get("BROWSER_MAX_TASKS", "50"))
+DEFAULT_MAX_RSS_MB = int(os.environ.get("BROWSER_MAX_RSS_MB", "1024"))
+
+# Tiempo máximo de navegación y de cada operación de Playwright (antes del plazo de la tarea)
+NAVIGATION_TIMEOUT_MS = 60000
+ACTION_TIMEOUT_MS = 30000
+# Cada cuánto se revisa, mientras carga la página, si hay que abortar
+ABORT_POLL_MS = 250
+# Cancelaciones pedidas: el slot token % CANCEL_SLOTS guarda el token cancelado
+CANCEL_SLOTS = 4096
+
+# Estado del navegador de ESTE proceso trabajador. Cada proceso del pool
+# tiene su propia copia, así que no hace falta sincronización.
+_state: Dict[str, Any] = {
+    "playwright": None,
+    "browser": None,
+    "tasks": 0,
+    "crashed": False,
+    "launches": 0,
+    "max_tasks": DEFAULT_MAX_TASKS,
+    "max_rss_mb": DEFAULT_MAX_RSS_MB,
+    "cancel_flags": None,
+    # Tarea en curso: token de cancelación y plazo (epoch en segundos)
+    "token": None,
+    "deadline": None,
+}
+
+
+class TaskAborted(Exception):
+    """La tarea se canceló o se venció su plazo: se deja de trabajar en ella."""
+
+
+def create_cancel_flags():
+    """Memoria compartida con los trabajadores para pedirles que aborten una tarea."""
+    return multiprocessing.RawArray('q', CANCEL_SLOTS)
+
+
+def request_cancel(cancel_flags, token: int) -> None:
+    cancel_flags[token % CANCEL_SLOTS] = token
+
+
+def init_worker(max_tasks: int = DEFAULT_MAX_TASKS, max_rss_mb: int = DEFAULT_MAX_RSS_MB,
+                cancel_flags=None) -> None:
+    """
+    Inicializador del ProcessPoolExecutor: lanza un Chromium que vive
+    mientras viva el proceso trabajador.
+    """
+    _state["max_tasks"] = max_tasks
+    _state["max_rss_mb"] = max_rss_mb
+    _state["cancel_flags"] = cancel_flags
+    # Ctrl-C llega a todo el grupo de procesos: lo atiende solo el proceso
+    # principal, que deja terminar las tareas en curso antes de cerrar el pool.
+    # Se ignora antes de lanzar el navegador para que el driver lo herede.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    _launch()
+    # Los trabajadores terminan con os._exit, por eso no sirve atexit.
+    multiprocessing.util.Finalize(None, _shutdown, exitpriority=10)
+    print(f"🌐 Navegador listo en el trabajador {os.getpid()}.")
+
+
+def _on_disconnected(_browser) -> None:
+    _state["crashed"] = True
+
+
+def _launch() -> None:
+    if _state["playwright"] is None:
+        _state["playwright"] = sync_playwright().start()
+    browser = _state["playwright"].chromium.launch(headless=True)
+    browser.on("disconnected", _on_disconnected)
+    _state["browser"] = browser
+    _state["launches"] += 1
+    _state["tasks"] = 0
+    _state["crashed"] = False
+
+
+def _close_browser() -> None:
+    browser = _state["browser"]
+    _state["browser"] = None
+    if browser is not None:
+        try:
+            browser.close()
+        except PlaywrightError:
+            # Si el navegador ya murió no hay nada que cerrar
+            pass
+
+
+def _shutdown() -> None:
+    _close_browser()
+    if _state["playwright"] is not None:
+        try:
+            _state["playwright"].stop()
+        except Exception:
+            pass
+        _state["playwright"] = None
+
+
+def _relaunch(reason: str) -> None:
+    print(f"♻️  Reiniciando navegador del trabajador {os.getpid()}: {reason}")
+    _close_browser()
+    _launch()
+
+
+def _ensure_browser() -> None:
+    if _state["browser"] is None:
+        # Sin initializer (ej. ejecutando los módulos sueltos): lanzamos bajo demanda
+        _launch()
+    elif _state["crashed"] or not _state["browser"].is_connected():
+        _relaunch("el navegador se cerró inesperadamente")
+
+
+def _maybe_recycle() -> None:
+    if _state["tasks"] >= _state["max_tasks"]:
+        _relaunch(f"alcanzó {_state['tasks']} tareas")
+        return
+    rss_mb = process_tree_rss_mb(os.getpid())
+    if rss_mb > _state["max_rss_mb"]:
+        _relaunch(f"usa {rss_mb:.0f} MB (límite {_state['max_rss_mb']} MB)")
+
+
+def run_task(fn, token: int, deadline: Optional[float], url: str, options: Dict[str, Any]) -> Any:
+    """
+    Corre fn(url, **options) en el trabajador, con su token de cancelación
+    y su plazo, que revisan new_page(), navigate() y las esperas.
+    Las opciones viajan en un dict aparte para que ninguna clave del
+    cliente choque con los argumentos de run_task o del planificador.
+    """
+    _state["token"], _state["deadline"] = token, deadline
+    try:
+        check_abort()
+        return fn(url, **options)
+    finally:
+        _state["token"] = _state["deadline"] = None
+
+
+def check_abort() -> None:
+    """Lanza TaskAborted si la tarea en curso fue cancelada o se venció su plazo."""
+    flags, token = _state["cancel_flags"], _state["token"]
+    if flags is not None and token is not None and flags[token % CANCEL_SLOTS] == token:
+        raise TaskAborted("Tarea cancelada: el Servidor A ya no espera el resultado")
+    if _state["deadline"] is not None and time.time() >= _state["deadline"]:
+        raise TaskAborted("Se venció el plazo de la tarea")
+
+
+def remaining_ms(limit_ms: int) -> int:
+    """El menor entre 'limit_ms' y lo que le queda de plazo a la tarea en curso."""
+    if _state["deadline"] is None:
+        return limit_ms
+    return max(1, min(limit_ms, int((_state["deadline"] - time.time()) * 1000)))
+
+
+def navigate(page: Page, url: str, timeout_ms: int = NAVIGATION_TIMEOUT_MS) -> None:
+    """
+    Como page.goto(url, wait_until='domcontentloaded'), pero abortable:
+    espera la respuesta del documento y después el DOMContentLoaded de a
+    ABORT_POLL_MS, revisando entre medio si la tarea se canceló o venció.
+    """
+    end = time.monotonic() + timeout_ms / 1000
+    try:
+        page.goto(url, timeout=remaining_ms(timeout_ms), wait_until='commit')
+    except PlaywrightTimeoutError:
+        check_abort()
+        raise
+    while True:
+        check_abort()
+        left_ms = int((end - time.monotonic()) * 1000)
+        if left_ms <= 0:
+            raise PlaywrightTimeoutError(f"Timeout {timeout_ms}ms exceeded navigating to {url}")
+        try:
+            page.wait_for_load_state('domcontentloaded', timeout=remaining_ms(min(ABORT_POLL_MS, left_ms)))
+            return
+        except PlaywrightTimeoutError:
+            continue
+
+
+@contextmanager
+def new_page(trace: Optional[Trace] = None, **context_options: Any) -> Iterator[Page]:
+    """
+    Entrega una página dentro de un contexto aislado y nuevo (cookies,
+    caché y storage propios) del navegador persistente del trabajador.
+    Si se pasa 'trace', registra cuánto costó tener la página lista
+    ('browser_launch' solo aparece si hubo que lanzar el navegador).
+    """
+    trace = trace or Trace()
+    check_abort()
+    launches_before = _state["launches"]
+    start = time.perf_counter()
+    _ensure_browser()
+    if _state["launches"] != launches_before:
+        trace.add("browser_launch", time.perf_counter() - start)
+    with trace.stage("context_setup"):
+        try:
+            context = _state["browser"].new_context(**context_options)
+        except PlaywrightError:
+            # Puede haberse caído entre la comprobación y el uso: reintentamos una vez
+            _relaunch("no se pudo crear el contexto")
+            context = _state["browser"].new_context(**context_options)
+        page = context.new_page()
+    # Ninguna operación de la página puede pasarse del plazo de la tarea
+    page.set_default_timeout(remaining_ms(ACTION_TIMEOUT_MS))
+
+    try:
+        yield page
+    finally:
+        try:
+            context.close()
+        except PlaywrightError:
+            _state["crashed"] = True
+        _state["tasks"] += 1
+        if _state["crashed"]:
+            _relaunch("el navegador se cerró durante la tarea")
+        else:
+            _maybe_recycle()
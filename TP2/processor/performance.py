@@ -1,57 +1,194 @@
 # processor/performance.py
 
 import time
-from typing import Dict, Any, Union
-from playwright.sync_api import sync_playwright, Page, Route, TimeoutError as PlaywrightTimeoutError
+from typing import Dict, Any, Optional, Set, Union
+from playwright.sync_api import Page, TimeoutError as PlaywrightTimeoutError
 
-def analyze_performance(url: str) -> Union[Dict[str, Any], None]:
+from processor.browser import new_page, navigate, check_abort, remaining_ms, TaskAborted
+from processor.profiles import apply_profile, get_profile, settle_cap, DEFAULT_PROFILE
+from common.metrics import Trace
+
+# La red se considera quieta tras DEFAULT_IDLE_MS sin pedidos en vuelo;
+# DEFAULT_SETTLE_MAX_MS es el tope de esa espera (páginas que nunca se callan)
+DEFAULT_IDLE_MS = 500
+DEFAULT_SETTLE_MAX_MS = 2000
+POLL_MS = 50
+
+# Guarda el último candidato a Largest Contentful Paint en window.__tp2Lcp
+_LCP_OBSERVER_SCRIPT = """
+(() => {
+    window.__tp2Lcp = null;
+    try {
+        new PerformanceObserver((list) => {
+            const entries = list.getEntries();
+            const last = entries[entries.length - 1];
+            window.__tp2Lcp = last.renderTime || last.loadTime || last.startTime;
+        }).observe({type: 'largest-contentful-paint', buffered: true});
+    } catch (e) {}
+})();
+"""
+
+# Tiempos de la navegación (ms desde el inicio de la navegación; null si aún no ocurrieron)
+_TIMINGS_SCRIPT = """
+() => {
+    const nav = performance.getEntriesByType('navigation')[0];
+    const orNull = (value) => (value ? value : null);
+    return {
+        ttfb: nav ? orNull(nav.responseStart) : null,
+        dom_content_loaded: nav ? orNull(nav.domContentLoadedEventEnd) : null,
+        load: nav ? orNull(nav.loadEventEnd) : null,
+        lcp: orNull(window.__tp2Lcp),
+    };
+}
+"""
+
+
+class NetworkRecorder:
+    """
+    Contabiliza la red de una página con los eventos del protocolo de
+    Chromium (CDP): bytes transferidos según 'encodedDataLength', tipo de
+    cada recurso y pedidos en vuelo. No lee ningún cuerpo de respuesta, así
+    que nada pasa por el canal de Playwright ni queda en memoria.
+    Hay que crearlo ANTES de navegar.
+    """
+
+    def __init__(self, page: Page):
+        self.num_requests = 0
+        self.failed = 0
+        self.total_bytes = 0
+        self.by_type: Dict[str, Dict[str, int]] = {}
+        self.in_flight: Set[str] = set()
+        self.last_activity = time.monotonic()
+        self._types: Dict[str, str] = {}
+
+        page.add_init_script(_LCP_OBSERVER_SCRIPT)
+        self.session = page.context.new_cdp_session(page)
+        self.session.on("Network.requestWillBeSent", self._on_request)
+        self.session.on("Network.responseReceived", self._on_response)
+        self.session.on("Network.loadingFinished", self._on_finished)
+        self.session.on("Network.loadingFailed", self._on_failed)
+        self.session.send("Network.enable")
+
+    def _touch(self) -> None:
+        self.last_activity = time.monotonic()
+
+    def _on_request(self, event: Dict[str, Any]) -> None:
+        # Las redirecciones reusan el mismo requestId: cada salto cuenta como un pedido
+        self.num_requests += 1
+        self.in_flight.add(event["requestId"])
+        self._types[event["requestId"]] = event.get("type", "Other")
+        self._touch()
+
+    def _on_response(self, event: Dict[str, Any]) -> None:
+        self._types[event["requestId"]] = event.get("type", self._types.get(event["requestId"], "Other"))
+        self._touch()
+
+    def _on_finished(self, event: Dict[str, Any]) -> None:
+        request_id = event["requestId"]
+        size = int(event.get("encodedDataLength", 0))
+        self.total_bytes += size
+        stats = self.by_type.setdefault(self._types.pop(request_id, "Other").lower(), {"count": 0, "bytes": 0})
+        stats["count"] += 1
+        stats["bytes"] += size
+        self.in_flight.discard(request_id)
+        self._touch()
+
+    def _on_failed(self, event: Dict[str, Any]) -> None:
+        self.failed += 1
+        self._types.pop(event["requestId"], None)
+        self.in_flight.discard(event["requestId"])
+        self._touch()
+
+    def wait_for_idle(self, page: Page, idle_ms: int = DEFAULT_IDLE_MS,
+                      max_ms: int = DEFAULT_SETTLE_MAX_MS) -> bool:
+        """
+        Espera a que no haya pedidos en vuelo durante 'idle_ms', con un tope
+        de 'max_ms'. Devuelve True si la red quedó quieta antes del tope.
+        Los eventos de CDP se procesan mientras Playwright espera. El tope
+        nunca pasa del plazo de la tarea, y se aborta si la cancelan.
+        """
+        deadline = time.monotonic() + remaining_ms(max_ms) / 1000
+        while True:
+            check_abort()
+            now = time.monotonic()
+            if not self.in_flight and now - self.last_activity >= idle_ms / 1000:
+                return True
+            if now >= deadline:
+                return False
+            page.wait_for_timeout(POLL_MS)
+
+
+def collect_timings(page: Page) -> Dict[str, Optional[float]]:
+    """TTFB, DOMContentLoaded, load y LCP según Navigation Timing y PerformanceObserver."""
+    try:
+        return page.evaluate(_TIMINGS_SCRIPT)
+    except Exception:
+        # Páginas que navegaron a otro documento o cerraron el contexto de ejecución
+        return {"ttfb": None, "dom_content_loaded": None, "load": None, "lcp": None}
+
+
+def _ms(value: Optional[float]) -> Optional[int]:
+    return None if value is None else int(value)
+
+
+def summarize_performance(recorder: NetworkRecorder, timings: Dict[str, Optional[float]],
+                          start_time: float, end_time: float, network_idle: bool) -> Dict[str, Any]:
+    """
+    Arma el informe de rendimiento. 'load_time_ms' es el tiempo hasta que
+    la red quedó quieta (o hasta el tope de espera, ver 'network_idle').
+    """
+    return {
+        "load_time_ms": int((end_time - start_time) * 1000),
+        "total_size_kb": round(recorder.total_bytes / 1024, 2),
+        "num_requests": recorder.num_requests,
+        "failed_requests": recorder.failed,
+        "ttfb_ms": _ms(timings.get("ttfb")),
+        "dom_content_loaded_ms": _ms(timings.get("dom_content_loaded")),
+        "load_event_ms": _ms(timings.get("load")),
+        "largest_contentful_paint_ms": _ms(timings.get("lcp")),
+        "network_idle": network_idle,
+        "by_type": {
+            resource_type: {"count": stats["count"], "size_kb": round(stats["bytes"] / 1024, 2)}
+            for resource_type, stats in sorted(recorder.by_type.items())
+        },
+    }
+
+
+def analyze_performance(url: str, idle_ms: int = DEFAULT_IDLE_MS,
+                        settle_max_ms: int = DEFAULT_SETTLE_MAX_MS,
+                        profile: str = DEFAULT_PROFILE) -> Union[Dict[str, Any], None]:
     """
     Analiza el rendimiento de carga de una URL usando Playwright.
+    Tras 'domcontentloaded' espera a que la red quede quieta ('idle_ms' sin
+    pedidos en vuelo), como mucho 'settle_max_ms'. 'profile' es el perfil de
+    render (ver processor.profiles); las métricas reflejan lo que se dejó cargar.
     """
+    get_profile(profile)
+    settle_max_ms = settle_cap(profile, settle_max_ms)
+    trace = Trace()
     try:
-        with sync_playwright() as p:
-            browser = p.chromium.launch(headless=True)
-            page = browser.new_page()
-
-            requests_info = []
-
-            def handle_response(response):
-                """Función que se ejecuta por cada respuesta recibida."""
-                try:
-                    # Guardamos el tamaño del cuerpo de la respuesta
-                    size = len(response.body())
-                    requests_info.append({"size": size})
-                except Exception:
-                    # A veces el cuerpo no es accesible (ej. redirecciones), lo ignoramos
-                    requests_info.append({"size": 0})
-
-            # --- MODIFICADO: Escuchamos el evento 'response' en lugar de 'route' ---
-            # Es más directo para lo que necesitamos.
-            page.on("response", handle_response)
+        with new_page(trace) as page:
+            profile_report = apply_profile(page, profile)
+            recorder = NetworkRecorder(page)
 
             start_time = time.time()
-            
-            # --- MODIFICADO: Cambiamos la condición de espera a 'domcontentloaded' ---
-            page.goto(url, timeout=60000, wait_until='domcontentloaded')
-            
-            # Damos un par de segundos extra para que se capturen más respuestas de red
-            page.wait_for_timeout(2000)
-            
-            end_time = time.time()
-            
-            browser.close()
+            with trace.stage("navigate"):
+                navigate(page, url)
+
+            with trace.stage("settle"):
+                network_idle = recorder.wait_for_idle(page, idle_ms, settle_max_ms)
 
-            load_time_ms = int((end_time - start_time) * 1000)
-            num_requests = len(requests_info)
-            total_size_bytes = sum(req['size'] for req in requests_info)
-            total_size_kb = round(total_size_bytes / 1024, 2)
+            end_time = time.time()
 
-            return {
-                "load_time_ms": load_time_ms,
-                "total_size_kb": total_size_kb,
-                "num_requests": num_requests
-            }
+            result = summarize_performance(recorder, collect_timings(page), start_time, end_time, network_idle)
+            result["render_profile"] = profile_report
+            # El Servidor B quita '_timings' del resultado y lo usa para sus métricas
+            result["_timings"] = trace.timings
+            return result
 
+    except TaskAborted:
+        # Cancelada o vencida: que el Servidor B lo informe como tal
+        raise
     except PlaywrightTimeoutError:
         print(f"Timeout al analizar el rendimiento de {url}.")
         return None
@@ -72,4 +209,4 @@ def main():
         print("❌ Falló el análisis de rendimiento.")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,80 @@
+# processor/profiles.py
+"""
+Perfiles de render: qué recursos se dejan cargar al navegar. Menos
+fidelidad a cambio de menos tiempo y ancho de banda por tarea.
+
+Este módulo no importa Playwright, así que el Servidor A puede usarlo
+para validar el perfil pedido.
+"""
+
+from typing import Dict, Any
+from urllib.parse import urlsplit
+
+DEFAULT_PROFILE = "full"
+
+RENDER_PROFILES: Dict[str, Dict[str, Any]] = {
+    # Comportamiento original: todo se carga
+    "full": {"blocked_types": frozenset(), "block_trackers": False, "settle_max_ms": None},
+    # Sin video/audio, fuentes ni rastreadores; la página se ve casi igual
+    "fast": {"blocked_types": frozenset({"media", "font"}), "block_trackers": True, "settle_max_ms": 1000},
+    # Solo HTML y scripts: sin imágenes, estilos, fuentes ni rastreadores
+    "text-only": {"blocked_types": frozenset({"image", "media", "font", "stylesheet"}),
+                  "block_trackers": True, "settle_max_ms": 500},
+}
+
+# Dominios de analítica y publicidad que se bloquean (incluye sus subdominios)
+TRACKER_DOMAINS = frozenset({
+    "google-analytics.com", "googletagmanager.com", "googlesyndication.com", "doubleclick.net",
+    "googleadservices.com", "adservice.google.com", "facebook.net", "connect.facebook.net",
+    "hotjar.com", "segment.io", "segment.com", "scorecardresearch.com", "amazon-adsystem.com",
+    "criteo.com", "criteo.net", "taboola.com", "outbrain.com", "adnxs.com", "nr-data.net",
+    "mixpanel.com", "clarity.ms", "quantserve.com", "chartbeat.com", "tiktok.com",
+})
+
+
+def get_profile(name: str) -> Dict[str, Any]:
+    profile = RENDER_PROFILES.get(name)
+    if profile is None:
+        raise ValueError(f"Perfil de render desconocido: {name!r} (opciones: {', '.join(RENDER_PROFILES)})")
+    return profile
+
+
+def is_tracker(url: str) -> bool:
+    host = (urlsplit(url).hostname or "").lower()
+    parts = host.split(".")
+    # 'a.b.google-analytics.com' -> prueba 'b.google-analytics.com', 'google-analytics.com', ...
+    return any(".".join(parts[i:]) in TRACKER_DOMAINS for i in range(len(parts) - 1))
+
+
+def settle_cap(name: str, default: int) -> int:
+    """Tope de espera de red del perfil, o 'default' si el perfil no define uno."""
+    cap = get_profile(name)["settle_max_ms"]
+    return default if cap is None else min(cap, default)
+
+
+def apply_profile(page, name: str = DEFAULT_PROFILE) -> Dict[str, Any]:
+    """
+    Instala en la página (antes de navegar) el bloqueo de recursos del
+    perfil. Devuelve el informe {"name", "blocked_requests"} que se va
+    completando mientras carga. "full" no instala nada: cero costo extra.
+    """
+    profile = get_profile(name)
+    report = {"name": name, "blocked_requests": 0}
+    blocked_types = profile["blocked_types"]
+    block_trackers = profile["block_trackers"]
+    if not blocked_types and not block_trackers:
+        return report
+
+    def handle_route(route) -> None:
+        request = route.request
+        # El documento principal nunca se bloquea, aunque sea de un dominio "rastreador"
+        main_document = request.is_navigation_request() and request.frame.parent_frame is None
+        if not main_document and (request.resource_type in blocked_types
+                                  or (block_trackers and is_tracker(request.url))):
+            report["blocked_requests"] += 1
+            route.abort("blockedbyclient")
+        else:
+            route.continue_()
+
+    page.route("**/*", handle_route)
+    return report
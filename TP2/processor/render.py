@@ -0,0 +1,91 @@
+# processor/render.py
+
+import time
+from typing import Dict, Any, Iterable, Union
+from playwright.sync_api import TimeoutError as PlaywrightTimeoutError
+
+from processor.browser import new_page, navigate, TaskAborted
+from common.metrics import Trace
+from processor.screenshot import capture_outputs, SCREENSHOT_SETTLE_MAX_MS
+from processor.performance import (NetworkRecorder, collect_timings, summarize_performance,
+                                   DEFAULT_IDLE_MS, DEFAULT_SETTLE_MAX_MS)
+from processor.profiles import apply_profile, get_profile, settle_cap, DEFAULT_PROFILE
+
+# Salidas que puede producir una sola navegación
+RENDER_OUTPUTS = ("screenshot", "performance")
+
+
+def render_page(url: str, outputs: Union[Iterable[str], None] = None,
+                screenshot_options: Union[Dict[str, Any], None] = None,
+                idle_ms: int = DEFAULT_IDLE_MS,
+                settle_max_ms: Union[int, None] = None,
+                profile: str = DEFAULT_PROFILE) -> Union[Dict[str, Any], None]:
+    """
+    Carga la página UNA sola vez y produce, de esa misma carga, las salidas
+    pedidas: métricas de red mientras carga y el screenshot al terminar.
+    'screenshot_options' se pasa a capture_outputs (formato, calidad, etc.).
+    Tras 'domcontentloaded' espera a que la red quede quieta, como mucho
+    'settle_max_ms' (por defecto, más corto si no se piden métricas).
+    'profile' elige qué recursos se bloquean (ver processor.profiles); el
+    resultado informa el perfil usado en "render_profile".
+    """
+    requested = set(outputs) if outputs else set(RENDER_OUTPUTS)
+    unknown = requested - set(RENDER_OUTPUTS)
+    if unknown:
+        raise ValueError(f"Salidas desconocidas para 'render': {sorted(unknown)}")
+    get_profile(profile)
+    if settle_max_ms is None:
+        settle_max_ms = DEFAULT_SETTLE_MAX_MS if "performance" in requested else SCREENSHOT_SETTLE_MAX_MS
+    settle_max_ms = settle_cap(profile, settle_max_ms)
+
+    trace = Trace()
+    try:
+        with new_page(trace) as page:
+            profile_report = apply_profile(page, profile)
+            # El registro de red sirve también para saber cuándo la página terminó de cargar
+            recorder = NetworkRecorder(page)
+
+            start_time = time.time()
+            with trace.stage("navigate"):
+                navigate(page, url)
+
+            with trace.stage("settle"):
+                network_idle = recorder.wait_for_idle(page, idle_ms, settle_max_ms)
+            end_time = time.time()
+
+            result: Dict[str, Any] = {"render_profile": profile_report}
+            if "performance" in requested:
+                result["performance"] = summarize_performance(
+                    recorder, collect_timings(page), start_time, end_time, network_idle)
+            if "screenshot" in requested:
+                result.update(capture_outputs(page, screenshot_options, trace))
+            # El Servidor B quita '_timings' del resultado y lo usa para sus métricas
+            result["_timings"] = trace.timings
+            return result
+
+    except TaskAborted:
+        # Cancelada o vencida: que el Servidor B lo informe como tal
+        raise
+    except PlaywrightTimeoutError:
+        print(f"Timeout al renderizar {url}.")
+        return None
+    except Exception as e:
+        print(f"Error al renderizar {url}: {e}")
+        return None
+
+
+# --- Bloque de prueba ---
+def main():
+    test_url = "https://www.github.com"
+    print(f"🖥️  Renderizando: {test_url}")
+    result = render_page(test_url)
+    if result:
+        import json
+        result["screenshot"] = f"{len(result['screenshot'])} bytes de {result['screenshot_format']}"
+        print("✅ Render completado:")
+        print(json.dumps(result, indent=2))
+    else:
+        print("❌ Falló el render.")
+
+if __name__ == "__main__":
+    main()
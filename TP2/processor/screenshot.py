@@ -1,27 +1,102 @@
 # processor/screenshot.py
 
-import os
-# 1. AÑADE ESTA IMPORTACIÓN
-from typing import Union
-from playwright.sync_api import sync_playwright, TimeoutError as PlaywrightTimeoutError
-import base64
+import io
+from typing import Dict, Any, Union
+from PIL import Image
+from playwright.sync_api import Page, TimeoutError as PlaywrightTimeoutError
 
-def take_screenshot(url: str) -> Union[str, None]:
+from processor.browser import new_page, navigate, TaskAborted
+from processor.performance import NetworkRecorder
+from processor.profiles import apply_profile, get_profile, settle_cap, DEFAULT_PROFILE
+from common.metrics import Trace
+
+SCREENSHOT_FORMATS = ("png", "jpeg", "webp")
+# Formatos que Chromium genera directamente; el resto se convierte con Pillow
+NATIVE_FORMATS = ("png", "jpeg")
+DEFAULT_QUALITY = 80
+# Tope de espera de red antes de capturar cuando no se miden métricas
+SCREENSHOT_SETTLE_MAX_MS = 1000
+
+
+def _encode_image(image: Image.Image, format: str, quality: Union[int, None]) -> bytes:
+    buffer = io.BytesIO()
+    if format == "png":
+        image.save(buffer, format="PNG", optimize=True)
+    else:
+        if format == "jpeg" and image.mode != "RGB":
+            image = image.convert("RGB")
+        image.save(buffer, format=format.upper(), quality=quality or DEFAULT_QUALITY)
+    return buffer.getvalue()
+
+
+def make_thumbnail(data: bytes, width: int, format: str = "png", quality: Union[int, None] = None) -> bytes:
+    """Versión reducida (ancho 'width', proporción original) de una imagen."""
+    with Image.open(io.BytesIO(data)) as image:
+        height = max(1, round(image.height * width / image.width))
+        thumbnail = image.resize((width, height), Image.LANCZOS)
+    return _encode_image(thumbnail, format, quality)
 
-    try:
-        with sync_playwright() as p:
-            browser = p.chromium.launch(headless=True)
-            page = browser.new_page()
-            
-            page.goto(url, timeout=60000, wait_until='domcontentloaded')
-            page.wait_for_timeout(1000)
 
-            screenshot_bytes = page.screenshot(type='png', full_page=True)
-            browser.close()
+def capture_screenshot(page: Page, format: str = "png", quality: Union[int, None] = None,
+                       full_page: bool = True) -> bytes:
+    """
+    Captura la página (ya cargada). full_page=False captura solo el viewport.
+    'quality' (1-100) aplica a jpeg y webp.
+    """
+    if format not in SCREENSHOT_FORMATS:
+        raise ValueError(f"Formato de screenshot desconocido: {format}")
+
+    if format in NATIVE_FORMATS:
+        kwargs: Dict[str, Any] = {"type": format, "full_page": full_page}
+        if format == "jpeg":
+            kwargs["quality"] = quality or DEFAULT_QUALITY
+        return page.screenshot(**kwargs)
+
+    png_bytes = page.screenshot(type="png", full_page=full_page)
+    with Image.open(io.BytesIO(png_bytes)) as image:
+        return _encode_image(image, format, quality)
+
+
+def capture_outputs(page: Page, options: Union[Dict[str, Any], None] = None,
+                    trace: Union[Trace, None] = None) -> Dict[str, Any]:
+    """
+    Screenshot según 'options' (format, quality, full_page, thumbnail=ancho).
+    Devuelve {"screenshot": bytes, "screenshot_format": str} y, si se pidió,
+    "thumbnail": bytes en el mismo formato.
+    """
+    options = options or {}
+    trace = trace or Trace()
+    format = options.get("format", "png")
+    quality = options.get("quality")
+    with trace.stage("screenshot_capture"):
+        image = capture_screenshot(page, format, quality, options.get("full_page", True))
+    result = {"screenshot": image, "screenshot_format": format}
+    if options.get("thumbnail"):
+        with trace.stage("thumbnail"):
+            result["thumbnail"] = make_thumbnail(image, int(options["thumbnail"]), format, quality)
+    return result
+
+
+def take_screenshot(url: str, format: str = "png", quality: Union[int, None] = None,
+                    full_page: bool = True, profile: str = DEFAULT_PROFILE) -> Union[bytes, None]:
+    """
+    Screenshot de la URL con el perfil de render 'profile'. Devuelve solo
+    la imagen; para saber qué bloqueó el perfil, usar la tarea 'render'.
+    """
+    get_profile(profile)
+    try:
+        # Reutilizamos el navegador del trabajador, con un contexto nuevo por tarea
+        with new_page() as page:
+            apply_profile(page, profile)
+            recorder = NetworkRecorder(page)
+            navigate(page, url)
+            recorder.wait_for_idle(page, max_ms=settle_cap(profile, SCREENSHOT_SETTLE_MAX_MS))
 
-            base64_image = base64.b64encode(screenshot_bytes).decode('utf-8')
-            return base64_image
+            return capture_screenshot(page, format, quality, full_page)
 
+    except TaskAborted:
+        # Cancelada o vencida: que el Servidor B lo informe como tal
+        raise
     except PlaywrightTimeoutError:
         print(f"Timeout al intentar tomar screenshot de {url}.")
         return None
@@ -34,15 +109,15 @@ def main():
     test_url = "https://www.github.com"
     print(f"📸 Tomando screenshot de: {test_url}")
 
-    base64_data = take_screenshot(test_url)
+    png_data = take_screenshot(test_url)
 
-    if base64_data:
+    if png_data:
         output_filename = "test_screenshot.png"
         with open(output_filename, "wb") as f:
-            f.write(base64.b64decode(base64_data))
+            f.write(png_data)
         print(f"✅ Screenshot guardado exitosamente como '{output_filename}'")
     else:
         print("❌ Falló la toma del screenshot.")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
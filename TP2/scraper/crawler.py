@@ -0,0 +1,332 @@
+# scraper/crawler.py
+"""
+Crawl de un sitio a partir de una URL semilla:
+
+- Frontera con una cola por host y deduplicación por URL normalizada
+  (filtro de Bloom: memoria fija aunque el crawl sea enorme).
+- Cortesía por host: pocos pedidos simultáneos y un intervalo mínimo
+  entre pedidos (o el Crawl-delay de robots.txt, si es mayor).
+- robots.txt opcional.
+- Los resultados se entregan a medida que termina cada página.
+
+El análisis de cada página lo hace quien usa el Crawler (función
+'fetch_page'), así que el mismo motor sirve con o sin navegador.
+"""
+
+import asyncio
+import itertools
+import time
+from collections import deque
+from typing import Dict, Any, AsyncIterator, Awaitable, Callable, Deque, List, Optional, Tuple
+from urllib.parse import urljoin, urlsplit
+from urllib.robotparser import RobotFileParser
+
+from common.bloom import BloomFilter
+from common.urls import normalize_url
+from scraper.http_client import HttpSession
+from scraper.document import HEADERS
+
+CRAWL_SCOPES = ("host", "domain", "any")
+DEFAULT_MAX_DEPTH = 2
+DEFAULT_MAX_PAGES = 100
+DEFAULT_CONCURRENCY = 4
+DEFAULT_PER_HOST_CONCURRENCY = 2
+DEFAULT_PER_HOST_DELAY = 1.0
+# Tope de URLs distintas recordadas (define el tamaño del filtro de Bloom)
+DEFAULT_MAX_SEEN = 1_000_000
+# Tope de URLs esperando en la frontera; las que sobran se descartan
+DEFAULT_MAX_QUEUED = 100_000
+ROBOTS_USER_AGENT = "TP2Bot"
+ROBOTS_TIMEOUT = 10
+
+# Enlaces que no vale la pena descargar como HTML
+SKIP_EXTENSIONS = frozenset({
+    ".jpg", ".jpeg", ".png", ".gif", ".webp", ".svg", ".ico", ".bmp", ".pdf", ".zip", ".gz", ".tar",
+    ".rar", ".7z", ".exe", ".dmg", ".iso", ".mp3", ".mp4", ".avi", ".mov", ".webm", ".woff", ".woff2",
+    ".ttf", ".css", ".js", ".json", ".xml", ".doc", ".docx", ".xls", ".xlsx", ".ppt", ".pptx",
+})
+
+# fetch_page(url, profundidad) -> (registro para el cliente, enlaces absolutos encontrados)
+FetchPage = Callable[[str, int], Awaitable[Tuple[Dict[str, Any], List[str]]]]
+
+
+def resolve_links(page_url: str, links: Dict[str, Any]) -> List[str]:
+    """Resultado del LinkExtractor -> URLs absolutas http(s), sin fragmento."""
+    base = urljoin(page_url, links.get("base") or "")
+    resolved = []
+    for href in links.get("links", []):
+        href = href.strip()
+        if not href or href.startswith(("#", "javascript:", "mailto:", "tel:", "data:")):
+            continue
+        url = urljoin(base, href)
+        if url.startswith(("http://", "https://")):
+            resolved.append(url.split("#", 1)[0])
+    return resolved
+
+
+def _registrable_host(host: str) -> str:
+    return host[4:] if host.startswith("www.") else host
+
+
+class Frontier:
+    """
+    URLs pendientes, agrupadas por host. pop() entrega la próxima URL de un
+    host que pueda recibir un pedido YA (sin superar su concurrencia ni su
+    intervalo mínimo), rotando entre hosts; si ninguno puede, espera.
+    Devuelve None cuando no queda nada pendiente ni en curso.
+    """
+
+    def __init__(self, per_host_concurrency: int, per_host_delay: float, max_queued: int = DEFAULT_MAX_QUEUED):
+        self.per_host_concurrency = max(1, per_host_concurrency)
+        self.per_host_delay = max(0.0, per_host_delay)
+        self.max_queued = max_queued
+        self.queued = 0
+        self.in_progress = 0
+        self.dropped = 0
+        self.closed = False
+        self._queues: Dict[str, Deque[Tuple[str, int]]] = {}
+        self._active: Dict[str, int] = {}
+        self._next_allowed: Dict[str, float] = {}
+        self._delays: Dict[str, float] = {}
+        self._changed = asyncio.Condition()
+
+    def set_delay(self, host: str, delay: float) -> None:
+        """Intervalo propio de un host (ej. Crawl-delay); nunca menor que el general."""
+        self._delays[host] = max(self.per_host_delay, delay)
+
+    async def push(self, url: str, depth: int) -> bool:
+        if self.closed or self.queued >= self.max_queued:
+            self.dropped += 1
+            return False
+        host = urlsplit(url).hostname or ""
+        async with self._changed:
+            self._queues.setdefault(host, deque()).append((url, depth))
+            self.queued += 1
+            self._changed.notify_all()
+        return True
+
+    def _take_ready(self, now: float) -> Tuple[Optional[Tuple[str, int, str]], Optional[float]]:
+        """La próxima URL lista y, si no hay, cuánto falta para la primera que lo estará."""
+        wait = None
+        for host in list(self._queues):
+            queue = self._queues[host]
+            if not queue:
+                if not self._active.get(host):
+                    del self._queues[host]
+                continue
+            if self._active.get(host, 0) >= self.per_host_concurrency:
+                continue
+            ready_at = self._next_allowed.get(host, 0.0)
+            if ready_at > now:
+                wait = ready_at - now if wait is None else min(wait, ready_at - now)
+                continue
+            url, depth = queue.popleft()
+            # Rotación: el host recién atendido pasa al final
+            self._queues[host] = self._queues.pop(host)
+            self._active[host] = self._active.get(host, 0) + 1
+            self._next_allowed[host] = now + self._delays.get(host, self.per_host_delay)
+            self.queued -= 1
+            self.in_progress += 1
+            return (url, depth, host), None
+        return None, wait
+
+    async def pop(self) -> Optional[Tuple[str, int, str]]:
+        async with self._changed:
+            while True:
+                if not self.queued and not self.in_progress:
+                    return None
+                item, wait = self._take_ready(time.monotonic())
+                if item is not None:
+                    return item
+                try:
+                    await asyncio.wait_for(self._changed.wait(), wait)
+                except asyncio.TimeoutError:
+                    pass
+
+    async def done(self, host: str) -> None:
+        async with self._changed:
+            self._active[host] -= 1
+            self.in_progress -= 1
+            self._changed.notify_all()
+
+    async def close(self) -> None:
+        """Descarta todo lo pendiente y no acepta más URLs (ej. se agotó el presupuesto)."""
+        async with self._changed:
+            self.closed = True
+            self.dropped += self.queued
+            self.queued = 0
+            self._queues.clear()
+            self._changed.notify_all()
+
+
+class RobotsCache:
+    """robots.txt de cada host, descargado una vez por crawl."""
+
+    def __init__(self, session: HttpSession, frontier: Frontier, user_agent: str = ROBOTS_USER_AGENT):
+        self.session = session
+        self.frontier = frontier
+        self.user_agent = user_agent
+        self._parsers: Dict[str, asyncio.Future] = {}
+
+    async def _fetch(self, root: str, host: str) -> Optional[RobotFileParser]:
+        parser = RobotFileParser(f"{root}/robots.txt")
+        try:
+            async with self.session.get(f"{root}/robots.txt", timeout=ROBOTS_TIMEOUT, headers=HEADERS) as response:
+                if 400 <= response.status < 500:
+                    # Sin robots.txt: todo permitido
+                    parser.allow_all = True
+                    return parser
+                if response.status >= 500:
+                    return None
+                text = await response.text(errors='replace')
+        except Exception:
+            # robots.txt inaccesible: ante la duda no se pide nada a ese host (RFC 9309)
+            return None
+        parser.parse(text.splitlines())
+        delay = parser.crawl_delay(self.user_agent)
+        if delay:
+            self.frontier.set_delay(host, float(delay))
+        return parser
+
+    async def allowed(self, url: str) -> bool:
+        parts = urlsplit(url)
+        root = f"{parts.scheme}://{parts.netloc}"
+        future = self._parsers.get(root)
+        if future is None:
+            # Una sola descarga por host, aunque varias páginas pregunten a la vez
+            future = self._parsers[root] = asyncio.ensure_future(self._fetch(root, parts.hostname or ""))
+        parser = await asyncio.shield(future)
+        return parser is not None and parser.can_fetch(self.user_agent, url)
+
+
+class Crawler:
+    """
+    Recorre un sitio desde 'seed' hasta 'max_depth' saltos y 'max_pages'
+    páginas, dentro del alcance 'scope':
+      "host"   -> solo el mismo host que la semilla,
+      "domain" -> el host y sus subdominios (sin contar un "www." inicial),
+      "any"    -> cualquier sitio.
+    run() es un generador asíncrono de registros, uno por página
+    (status "success", "partial_failure", "error" o "skipped").
+    """
+
+    def __init__(self, session: HttpSession, seed: str, fetch_page: FetchPage,
+                 max_depth: int = DEFAULT_MAX_DEPTH, max_pages: int = DEFAULT_MAX_PAGES,
+                 scope: str = "host", concurrency: int = DEFAULT_CONCURRENCY,
+                 per_host_concurrency: int = DEFAULT_PER_HOST_CONCURRENCY,
+                 per_host_delay: float = DEFAULT_PER_HOST_DELAY, robots: bool = True,
+                 max_seen: int = DEFAULT_MAX_SEEN, max_queued: int = DEFAULT_MAX_QUEUED):
+        if scope not in CRAWL_SCOPES:
+            raise ValueError(f"Alcance desconocido: {scope} (opciones: {', '.join(CRAWL_SCOPES)})")
+        if not seed.startswith(("http://", "https://")):
+            raise ValueError(f"URL semilla inválida: {seed!r}")
+        self.seed = normalize_url(seed)
+        self.seed_host = urlsplit(self.seed).hostname or ""
+        self.fetch_page = fetch_page
+        self.max_depth = max_depth
+        self.max_pages = max_pages
+        self.scope = scope
+        self.concurrency = max(1, concurrency)
+        self.frontier = Frontier(per_host_concurrency, per_host_delay, max_queued)
+        self.robots = RobotsCache(session, self.frontier) if robots else None
+        self.seen = BloomFilter(max_seen)
+        self.stats = {"pages": 0, "success": 0, "partial_failure": 0, "error": 0, "skipped": 0,
+                      "duplicates": 0, "filtered": 0}
+        self.started_at = time.time()
+        self._results: "asyncio.Queue[Optional[Dict[str, Any]]]" = asyncio.Queue()
+        self._sequence = itertools.count()
+
+    def in_scope(self, url: str) -> bool:
+        if self.scope == "any":
+            return True
+        host = urlsplit(url).hostname or ""
+        if self.scope == "host":
+            return host == self.seed_host
+        domain = _registrable_host(self.seed_host)
+        return host == domain or host.endswith("." + domain)
+
+    async def _enqueue(self, url: str, depth: int) -> None:
+        url = normalize_url(url)
+        path = urlsplit(url).path.lower()
+        if not self.in_scope(url) or any(path.endswith(ext) for ext in SKIP_EXTENSIONS):
+            self.stats["filtered"] += 1
+            return
+        if not self.seen.add(url):
+            self.stats["duplicates"] += 1
+            return
+        await self.frontier.push(url, depth)
+
+    def _emit(self, record: Dict[str, Any]) -> None:
+        status = record.get("status", "error")
+        self.stats[status] = self.stats.get(status, 0) + 1
+        record["sequence"] = next(self._sequence)
+        self._results.put_nowait(record)
+
+    async def _crawl_one(self, url: str, depth: int) -> None:
+        if self.stats["pages"] >= self.max_pages:
+            await self.frontier.close()
+            return
+        if self.robots is not None and not await self.robots.allowed(url):
+            self._emit({"url": url, "depth": depth, "status": "skipped", "reason": "robots.txt"})
+            return
+
+        self.stats["pages"] += 1
+        try:
+            record, links = await self.fetch_page(url, depth)
+        except Exception as e:
+            self._emit({"url": url, "depth": depth, "status": "error", "message": str(e)})
+            return
+        if depth < self.max_depth:
+            for link in links:
+                await self._enqueue(link, depth + 1)
+        self._emit(dict(record, depth=depth))
+
+    async def _worker(self) -> None:
+        while True:
+            item = await self.frontier.pop()
+            if item is None:
+                return
+            url, depth, host = item
+            try:
+                await self._crawl_one(url, depth)
+            finally:
+                await self.frontier.done(host)
+
+    async def run(self) -> AsyncIterator[Dict[str, Any]]:
+        self.seen.add(self.seed)
+        await self.frontier.push(self.seed, 0)
+        workers = [asyncio.ensure_future(self._worker()) for _ in range(self.concurrency)]
+
+        async def finish() -> None:
+            try:
+                await asyncio.gather(*workers)
+            finally:
+                self._results.put_nowait(None)
+
+        supervisor = asyncio.ensure_future(finish())
+        try:
+            while True:
+                record = await self._results.get()
+                if record is None:
+                    break
+                yield record
+            # Si un trabajador falló por un error inesperado, que se vea
+            await supervisor
+        finally:
+            for task in workers + [supervisor]:
+                task.cancel()
+            await asyncio.gather(*workers, supervisor, return_exceptions=True)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return dict(
+            self.stats,
+            seed=self.seed,
+            scope=self.scope,
+            max_depth=self.max_depth,
+            max_pages=self.max_pages,
+            queued=self.frontier.queued,
+            in_progress=self.frontier.in_progress,
+            dropped=self.frontier.dropped,
+            seen=len(self.seen),
+            elapsed_s=round(time.time() - self.started_at, 1),
+        )
@@ -0,0 +1,77 @@
+# scraper/document.py
+
+import aiohttp
+from bs4 import BeautifulSoup
+from typing import Dict, Any, Iterable, List
+
+from scraper.http_client import HttpSession
+
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+}
+
+
+class Extractor:
+    """
+    Base de los extractores. Cada extractor declara en 'tags' qué etiquetas
+    le interesan (None = todas) y recibe cada una en handle() durante el
+    ÚNICO recorrido del árbol. Al final, result() devuelve su parte del informe.
+    Se crea una instancia nueva por documento.
+    'head_only' indica que todo lo que busca está en el <head>: el motor
+    en streaming puede dejar de leer al llegar al <body>.
+    """
+    name = ""
+    tags = None
+    head_only = False
+
+    def handle(self, tag) -> None:
+        raise NotImplementedError
+
+    def result(self) -> Dict[str, Any]:
+        raise NotImplementedError
+
+
+async def fetch_html(session: HttpSession, url: str) -> str:
+    """Descarga la página una sola vez. Los errores se propagan al llamador."""
+    async with session.get(url, timeout=30, headers=HEADERS) as response:
+        response.raise_for_status()
+        return await response.text()
+
+
+def parse_html(html: str) -> BeautifulSoup:
+    return BeautifulSoup(html, 'lxml')
+
+
+class TagDispatcher:
+    """Reparte cada etiqueta a los extractores interesados en ella."""
+
+    def __init__(self, extractors: Iterable[Extractor]):
+        self.extractors = list(extractors)
+        self.by_tag: Dict[str, List[Extractor]] = {}
+        self.catch_all: List[Extractor] = []
+        for extractor in self.extractors:
+            if extractor.tags is None:
+                self.catch_all.append(extractor)
+            else:
+                for tag_name in extractor.tags:
+                    self.by_tag.setdefault(tag_name, []).append(extractor)
+
+    def dispatch(self, tag) -> None:
+        for extractor in self.by_tag.get(tag.name, ()):
+            extractor.handle(tag)
+        for extractor in self.catch_all:
+            extractor.handle(tag)
+
+    def results(self) -> Dict[str, Dict[str, Any]]:
+        return {extractor.name: extractor.result() for extractor in self.extractors}
+
+
+def run_extractors(soup: BeautifulSoup, extractors: Iterable[Extractor]) -> Dict[str, Dict[str, Any]]:
+    """
+    Recorre el árbol una sola vez y reparte cada etiqueta a los extractores
+    interesados en ella.
+    """
+    dispatcher = TagDispatcher(extractors)
+    for tag in soup.find_all(True):
+        dispatcher.dispatch(tag)
+    return dispatcher.results()
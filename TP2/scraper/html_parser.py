@@ -1,34 +1,72 @@
 
 import asyncio
 import aiohttp
-from bs4 import BeautifulSoup
 
+from scraper.http_client import HttpSession
+from scraper.document import Extractor, fetch_html, parse_html, run_extractors
 
-HEADERS = {
-    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-}
 
-async def scrape_page_content(session: aiohttp.ClientSession, url: str) -> dict:
+class ContentExtractor(Extractor):
+    """Título, enlaces, conteo de encabezados e imágenes."""
+    name = "content"
+    tags = {"title", "a", "img", "h1", "h2", "h3", "h4", "h5", "h6"}
+
+    def __init__(self):
+        self.title = None
+        self.links = []
+        self.headers = {f'h{i}': 0 for i in range(1, 7)}
+        self.images_count = 0
+
+    def handle(self, tag) -> None:
+        if tag.name == "a":
+            href = tag.get('href')
+            if href is not None:
+                self.links.append(href)
+        elif tag.name == "img":
+            self.images_count += 1
+        elif tag.name == "title":
+            # Como soup.title: nos quedamos con el primero
+            if self.title is None:
+                self.title = tag.string.strip() if tag.string else ""
+        else:
+            self.headers[tag.name] += 1
+
+    def result(self) -> dict:
+        return {
+            "title": self.title if self.title else "No Title Found",
+            "links_count": len(self.links),
+            "links": self.links[:20],
+            "structure": self.headers,
+            "images_count": self.images_count,
+        }
+
+
+class TitleExtractor(Extractor):
+    """
+    Solo el título. Para los pedidos que no necesitan el resto del contenido:
+    como todo está en el <head>, el motor en streaming deja de leer ahí.
+    """
+    name = "title"
+    tags = {"title"}
+    head_only = True
+
+    def __init__(self):
+        self.title = None
+
+    def handle(self, tag) -> None:
+        if self.title is None:
+            self.title = tag.string.strip() if tag.string else ""
+
+    def result(self) -> dict:
+        return {"title": self.title if self.title else "No Title Found"}
+
+
+async def scrape_page_content(session: HttpSession, url: str) -> dict:
 
     try:
-        async with session.get(url, timeout=30, headers=HEADERS) as response:
-            response.raise_for_status()
-            
-            html = await response.text()
-            soup = BeautifulSoup(html, 'lxml')
-
-            title = soup.title.string.strip() if soup.title else "No Title Found"
-            links = [a.get('href') for a in soup.find_all('a', href=True)]
-            headers = {f'h{i}': len(soup.find_all(f'h{i}')) for i in range(1, 7)}
-            images_count = len(soup.find_all('img'))
-            
-            return {
-                "title": title,
-                "links_count": len(links),
-                "links": links[:20],
-                "structure": headers,
-                "images_count": images_count,
-            }
+        html = await fetch_html(session, url)
+        soup = parse_html(html)
+        return run_extractors(soup, [ContentExtractor()])[ContentExtractor.name]
 
     except aiohttp.ClientError as e:
         print(f"Error de red al intentar acceder a {url}: {e}")
@@ -52,4 +90,4 @@ async def main():
         print(json.dumps(data, indent=2, ensure_ascii=False))
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    asyncio.run(main())
@@ -0,0 +1,381 @@
+# scraper/http_cache.py
+"""
+Caché HTTP en disco para las páginas que descarga el scraper.
+
+- Si la copia guardada sigue fresca según Cache-Control (max-age) o
+  Expires, se usa sin tocar la red.
+- Si venció pero tiene validadores (ETag / Last-Modified), se pide con
+  If-None-Match / If-Modified-Since; ante un 304 se reutiliza el cuerpo
+  guardado.
+- Solo se guardan respuestas 200 leídas completas: si el parser en
+  streaming corta antes (tope de bytes o solo <head>), no se guarda nada.
+  Tampoco las que no traen ni frescura ni validadores: no habría cómo
+  reutilizarlas.
+
+Cada entrada son dos archivos: "<hash>.meta" (JSON con los validadores y
+el nombre del cuerpo) y el cuerpo tal cual llegó, "<hash>.<id>.http".
+Cada descarga nueva escribe un cuerpo con otro nombre y después reemplaza
+los metadatos, así un lector nunca mezcla validadores de una versión con
+el cuerpo de otra; una revalidación (304) solo reescribe los metadatos.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import re
+import tempfile
+import time
+import uuid
+from contextlib import asynccontextmanager
+from email.utils import parsedate_to_datetime
+from typing import Dict, Any, AsyncIterator, Callable, List, Optional, Tuple
+
+from common.metrics import REGISTRY
+from common.urls import normalize_url
+
+DEFAULT_MAX_ENTRIES = 10000
+# Cuerpos más grandes que esto no se guardan
+DEFAULT_MAX_BODY_BYTES = 10 * 1024 * 1024
+# Un cuerpo sin metadatos más viejo que esto es un resto (escrituras simultáneas, formato anterior)
+ORPHAN_GRACE_SECONDS = 60
+
+HTTP_CACHE_REQUESTS = REGISTRY.counter(
+    "scraper_http_cache_requests_total",
+    "Descargas según la caché HTTP: fresh (sin red), revalidated (304), miss, uncacheable", ["result"])
+
+_MAX_AGE_RE = re.compile(r"(?:^|,)\s*max-age\s*=\s*\"?(\d+)", re.IGNORECASE)
+
+
+def _directives(headers) -> List[str]:
+    return [part.strip().lower() for part in headers.get("Cache-Control", "").split(",") if part.strip()]
+
+
+def _http_date(value: Optional[str]) -> Optional[float]:
+    if not value:
+        return None
+    try:
+        return parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError):
+        return None
+
+
+def freshness_lifetime(headers) -> Optional[float]:
+    """
+    Segundos que la respuesta puede reutilizarse sin preguntar, según
+    Cache-Control / Expires (descontando Age). 0 = hay que revalidar cada
+    vez; None = no se puede guardar (no-store, Vary: *).
+    """
+    directives = _directives(headers)
+    if "no-store" in directives or headers.get("Vary", "").strip() == "*":
+        return None
+    if "no-cache" in directives:
+        return 0.0
+
+    age = headers.get("Age", "0")
+    age = float(age) if age.isdigit() else 0.0
+    match = _MAX_AGE_RE.search(headers.get("Cache-Control", ""))
+    if match:
+        return max(0.0, int(match.group(1)) - age)
+
+    expires = _http_date(headers.get("Expires"))
+    if expires is not None:
+        date = _http_date(headers.get("Date")) or time.time()
+        return max(0.0, expires - date - age)
+    # Sin indicación explícita no adivinamos: se revalida siempre
+    return 0.0
+
+
+class _StoredContent:
+    """Imitación de ClientResponse.content sobre un cuerpo ya en memoria."""
+
+    def __init__(self, body: bytes):
+        self._body = body
+
+    async def read(self) -> bytes:
+        return self._body
+
+    async def iter_chunked(self, size: int) -> AsyncIterator[bytes]:
+        for offset in range(0, len(self._body), size):
+            yield self._body[offset:offset + size]
+
+
+class StoredResponse:
+    """
+    Respuesta servida desde la caché, con la parte de la interfaz de
+    aiohttp.ClientResponse que usa el paquete scraper.
+    """
+
+    def __init__(self, url: str, meta: Dict[str, Any], body: bytes):
+        self.url = url
+        self.status = 200
+        self.reason = "OK"
+        self.headers = meta.get("headers", {})
+        self.charset = meta.get("charset")
+        self.from_cache = True
+        self.content = _StoredContent(body)
+        self._body = body
+
+    def raise_for_status(self) -> None:
+        pass
+
+    def get_encoding(self) -> str:
+        return self.charset or "utf-8"
+
+    async def read(self) -> bytes:
+        return self._body
+
+    async def text(self, encoding: Optional[str] = None, errors: str = "strict") -> str:
+        return self._body.decode(encoding or self.get_encoding(), errors)
+
+
+class _RecordingContent:
+    def __init__(self, recorder: "_RecordingResponse"):
+        self._recorder = recorder
+
+    async def read(self) -> bytes:
+        return await self._recorder.read()
+
+    async def iter_chunked(self, size: int) -> AsyncIterator[bytes]:
+        async for chunk in self._recorder.response.content.iter_chunked(size):
+            self._recorder.record(chunk)
+            yield chunk
+        self._recorder.complete = True
+
+
+class _RecordingResponse:
+    """Envuelve una respuesta real y va copiando el cuerpo que se lee, para guardarlo."""
+
+    def __init__(self, response, max_bytes: int):
+        self.response = response
+        self.max_bytes = max_bytes
+        self.from_cache = False
+        self.complete = False
+        self.content = _RecordingContent(self)
+        self._chunks: List[bytes] = []
+        self._size = 0
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.response, name)
+
+    def record(self, chunk: bytes) -> None:
+        self._size += len(chunk)
+        if self._size <= self.max_bytes:
+            self._chunks.append(chunk)
+
+    @property
+    def body(self) -> Optional[bytes]:
+        if not self.complete or self._size > self.max_bytes:
+            return None
+        return b"".join(self._chunks)
+
+    async def read(self) -> bytes:
+        body = await self.response.read()
+        self._chunks, self._size = [body], len(body)
+        self.complete = True
+        return body
+
+    async def text(self, encoding: Optional[str] = None, errors: str = "strict") -> str:
+        body = await self.read()
+        return body.decode(encoding or self.response.get_encoding(), errors)
+
+
+class HttpCache:
+    """Almacén en disco de cuerpos y validadores, por URL normalizada."""
+
+    def __init__(self, root: str, max_entries: int = DEFAULT_MAX_ENTRIES,
+                 max_body_bytes: int = DEFAULT_MAX_BODY_BYTES):
+        self.root = root
+        self.max_entries = max_entries
+        self.max_body_bytes = max_body_bytes
+        self.stats = {"fresh": 0, "revalidated": 0, "miss": 0, "uncacheable": 0, "stored": 0}
+        self._writes = 0
+        os.makedirs(root, exist_ok=True)
+
+    # --- Disco (se usa desde un hilo para no bloquear el event loop) ---
+
+    def _meta_path(self, url: str) -> str:
+        digest = hashlib.sha256(normalize_url(url).encode('utf-8')).hexdigest()
+        return os.path.join(self.root, digest[:2], f"{digest}.meta")
+
+    @staticmethod
+    def _read_meta(meta_path: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(meta_path, "rb") as f:
+                return json.loads(f.read())
+        except (OSError, ValueError):
+            return None
+
+    @staticmethod
+    def _write_atomic(path: str, data: bytes) -> None:
+        # Temporal con nombre único: varias descargas de la misma URL pueden guardar a la vez
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            # Reemplazo atómico: un lector nunca ve un archivo a medio escribir
+            os.replace(tmp_path, path)
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+
+    def _load(self, url: str) -> Optional[Tuple[Dict[str, Any], bytes]]:
+        meta_path = self._meta_path(url)
+        meta = self._read_meta(meta_path)
+        if not isinstance(meta, dict) or meta.get("url") != normalize_url(url) or not meta.get("body"):
+            return None
+        try:
+            with open(os.path.join(os.path.dirname(meta_path), meta["body"]), "rb") as f:
+                body = f.read()
+        except OSError:
+            # Otro guardado lo reemplazó entre las dos lecturas: se trata como ausente
+            return None
+        return meta, body
+
+    def _save(self, url: str, meta: Dict[str, Any], body: Optional[bytes]) -> bool:
+        """
+        Guarda los metadatos y, si se pasa 'body', un cuerpo nuevo (que
+        reemplaza al anterior). Devuelve si se pudo guardar.
+        """
+        meta_path = self._meta_path(url)
+        directory = os.path.dirname(meta_path)
+        try:
+            os.makedirs(directory, exist_ok=True)
+            previous = None
+            if body is not None:
+                previous = self._read_meta(meta_path)
+                name = f"{os.path.basename(meta_path)[:-len('.meta')]}.{uuid.uuid4().hex[:12]}.http"
+                self._write_atomic(os.path.join(directory, name), body)
+                meta = dict(meta, body=name)
+            self._write_atomic(meta_path, json.dumps(meta).encode('utf-8'))
+        except OSError as e:
+            print(f"⚠️ No se pudo guardar en la caché HTTP: {e}")
+            return False
+        if isinstance(previous, dict) and previous.get("body") and previous["body"] != meta["body"]:
+            try:
+                os.remove(os.path.join(directory, os.path.basename(previous["body"])))
+            except OSError:
+                pass
+        return True
+
+    def _prune(self) -> None:
+        """
+        Borra las entradas usadas hace más tiempo si se supera el máximo, y
+        los cuerpos que quedaron sin metadatos.
+        """
+        metas = []
+        bodies: Dict[str, List[os.DirEntry]] = {}
+        for directory in os.scandir(self.root):
+            if not directory.is_dir():
+                continue
+            for entry in os.scandir(directory.path):
+                if entry.name.endswith(".meta"):
+                    metas.append(entry)
+                elif entry.name.endswith(".http"):
+                    bodies.setdefault(entry.name.split(".")[0], []).append(entry)
+
+        live = {entry.name[:-len(".meta")] for entry in metas}
+        cutoff = time.time() - ORPHAN_GRACE_SECONDS
+        doomed = [entry.path for digest, entries in bodies.items() if digest not in live
+                  for entry in entries if entry.stat().st_mtime < cutoff]
+        excess = len(metas) - self.max_entries
+        if excess > 0:
+            metas.sort(key=lambda entry: entry.stat().st_mtime)
+            for entry in metas[:excess]:
+                doomed.append(entry.path)
+                doomed.extend(body.path for body in bodies.get(entry.name[:-len(".meta")], []))
+        for path in doomed:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    # --- Metadatos ---
+
+    def _meta(self, url: str, response, lifetime: float) -> Dict[str, Any]:
+        headers = response.headers
+        return {
+            "url": normalize_url(url),
+            "stored_at": time.time(),
+            "expires_at": time.time() + lifetime,
+            "etag": headers.get("ETag"),
+            "last_modified": headers.get("Last-Modified"),
+            "charset": response.charset,
+            "headers": {name: headers[name] for name in ("Content-Type", "ETag", "Last-Modified") if name in headers},
+        }
+
+    def _count(self, result: str) -> None:
+        self.stats[result] += 1
+        HTTP_CACHE_REQUESTS.inc(result=result)
+
+    async def _store(self, url: str, meta: Dict[str, Any], body: Optional[bytes] = None) -> None:
+        """Guarda en un hilo; sin 'body' solo se actualizan los metadatos."""
+        loop = asyncio.get_running_loop()
+        saved = await loop.run_in_executor(None, self._save, url, meta, body)
+        if not saved or body is None:
+            return
+        self.stats["stored"] += 1
+        self._writes += 1
+        if self._writes % 100 == 0:
+            await loop.run_in_executor(None, self._prune)
+
+    # --- API ---
+
+    @asynccontextmanager
+    async def get(self, fetch: Callable[..., Any], url: str, **kwargs: Any) -> AsyncIterator[Any]:
+        """
+        Como session.get(url, **kwargs), pasando por la caché. 'fetch' hace
+        el pedido real (misma firma que session.get). La respuesta puede ser
+        la real o una StoredResponse; 'from_cache' indica cuál.
+        """
+        loop = asyncio.get_running_loop()
+        entry = await loop.run_in_executor(None, self._load, url)
+        if entry is not None and entry[0]["expires_at"] > time.time():
+            self._count("fresh")
+            yield StoredResponse(url, *entry)
+            return
+
+        headers = dict(kwargs.pop("headers", None) or {})
+        if entry is not None:
+            if entry[0].get("etag"):
+                headers["If-None-Match"] = entry[0]["etag"]
+            if entry[0].get("last_modified"):
+                headers["If-Modified-Since"] = entry[0]["last_modified"]
+
+        async with fetch(url, headers=headers, **kwargs) as response:
+            if response.status == 304 and entry is not None:
+                meta, body = entry
+                lifetime = freshness_lifetime(response.headers)
+                meta = dict(meta, expires_at=time.time() + (lifetime or 0.0))
+                # Un 304 puede traer validadores nuevos
+                for key, header in (("etag", "ETag"), ("last_modified", "Last-Modified")):
+                    if response.headers.get(header):
+                        meta[key] = response.headers[header]
+                self._count("revalidated")
+                # El cuerpo no cambió: solo se reescriben los metadatos
+                await self._store(url, meta)
+                yield StoredResponse(url, meta, body)
+                return
+
+            lifetime = freshness_lifetime(response.headers)
+            validators = response.headers.get("ETag") or response.headers.get("Last-Modified")
+            # Sin frescura ni validadores la copia nunca podría reutilizarse: no se escribe
+            if response.status != 200 or lifetime is None or (lifetime == 0 and not validators):
+                self._count("uncacheable")
+                yield response
+                return
+
+            self._count("miss")
+            recorder = _RecordingResponse(response, self.max_body_bytes)
+            yield recorder
+            body = recorder.body
+            if body is not None:
+                await self._store(url, self._meta(url, response, lifetime), body)
+
+    def snapshot(self) -> Dict[str, Any]:
+        lookups = self.stats["fresh"] + self.stats["revalidated"] + self.stats["miss"] + self.stats["uncacheable"]
+        reused = self.stats["fresh"] + self.stats["revalidated"]
+        return dict(self.stats, reuse_ratio=round(reused / lookups, 4) if lookups else 0.0)
@@ -0,0 +1,98 @@
+# scraper/http_client.py
+
+import asyncio
+import aiohttp
+from contextlib import asynccontextmanager
+from typing import Dict, Any, AsyncIterator, Optional, Union
+from urllib.parse import urlsplit
+
+from scraper.http_cache import HttpCache, DEFAULT_MAX_ENTRIES as DEFAULT_HTTP_CACHE_ENTRIES
+
+# Valores por defecto del pool HTTP compartido
+DEFAULT_HTTP_CONFIG = {
+    "limit": 100,             # conexiones abiertas en total
+    "limit_per_host": 10,     # conexiones abiertas por host
+    "dns_ttl": 300,           # segundos que se cachea cada resolución DNS
+    "keepalive_timeout": 30,  # segundos que una conexión ociosa sigue abierta
+    "max_concurrency": 100,   # pedidos en vuelo en total
+    "max_per_host": 8,        # pedidos en vuelo por host
+    "cache_dir": None,        # caché HTTP en disco (desactivada si es None)
+    "cache_max_entries": DEFAULT_HTTP_CACHE_ENTRIES,
+}
+
+
+class _HostSlot:
+    def __init__(self, size: int):
+        self.semaphore = asyncio.Semaphore(size)
+        self.users = 0
+
+
+class PooledHttpClient:
+    """
+    Cliente HTTP único de la aplicación: una ClientSession con su pool de
+    conexiones, caché DNS y keep-alive, más topes de concurrencia global y
+    por host. Expone get() con la misma forma que ClientSession.get(), así
+    que las funciones del paquete scraper lo reciben como si fuera la sesión.
+    Con 'cache', las descargas pasan por la HttpCache: las copias frescas
+    no ocupan cupo ni conexión, y las vencidas se revalidan.
+    """
+
+    def __init__(self, session: aiohttp.ClientSession, max_concurrency: int, max_per_host: int,
+                 cache: Optional[HttpCache] = None):
+        self.session = session
+        self.cache = cache
+        self.max_per_host = max_per_host
+        self._global = asyncio.Semaphore(max_concurrency)
+        self._hosts: Dict[str, _HostSlot] = {}
+
+    @asynccontextmanager
+    async def _host_slot(self, url: str) -> AsyncIterator[None]:
+        host = urlsplit(url).netloc.lower()
+        slot = self._hosts.get(host)
+        if slot is None:
+            slot = self._hosts[host] = _HostSlot(self.max_per_host)
+        slot.users += 1
+        try:
+            async with slot.semaphore:
+                yield
+        finally:
+            slot.users -= 1
+            # No guardamos un semáforo por cada host visitado alguna vez
+            if slot.users == 0:
+                self._hosts.pop(host, None)
+
+    @asynccontextmanager
+    async def _fetch(self, url: str, **kwargs: Any) -> AsyncIterator[aiohttp.ClientResponse]:
+        # Primero el lugar del host: los pedidos que esperan a un host ocupado
+        # no retienen lugares globales que podrían usar otros hosts
+        async with self._host_slot(url), self._global:
+            async with self.session.get(url, **kwargs) as response:
+                yield response
+
+    def get(self, url: str, **kwargs: Any):
+        if self.cache is None:
+            return self._fetch(url, **kwargs)
+        return self.cache.get(self._fetch, url, **kwargs)
+
+    async def close(self) -> None:
+        await self.session.close()
+
+
+def create_http_client(**config: Any) -> PooledHttpClient:
+    """Crea el cliente compartido. Hay que llamarla dentro del event loop."""
+    settings = dict(DEFAULT_HTTP_CONFIG, **config)
+    connector = aiohttp.TCPConnector(
+        limit=settings["limit"],
+        limit_per_host=settings["limit_per_host"],
+        ttl_dns_cache=settings["dns_ttl"],
+        keepalive_timeout=settings["keepalive_timeout"],
+    )
+    session = aiohttp.ClientSession(connector=connector)
+    cache = None
+    if settings["cache_dir"]:
+        cache = HttpCache(settings["cache_dir"], max_entries=settings["cache_max_entries"])
+    return PooledHttpClient(session, settings["max_concurrency"], settings["max_per_host"], cache=cache)
+
+
+# Lo que aceptan las funciones del paquete scraper como "sesión"
+HttpSession = Union[aiohttp.ClientSession, PooledHttpClient]
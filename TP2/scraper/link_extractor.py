@@ -0,0 +1,30 @@
+# scraper/link_extractor.py
+
+from scraper.document import Extractor
+
+
+class LinkExtractor(Extractor):
+    """
+    TODOS los enlaces de la página (el extractor de contenido informa solo
+    los primeros 20) y el <base href>, para resolver los relativos.
+    """
+    name = "links"
+    tags = {"a", "base"}
+
+    def __init__(self):
+        self.base = None
+        self.links = []
+
+    def handle(self, tag) -> None:
+        href = tag.get('href')
+        if href is None:
+            return
+        if tag.name == "base":
+            # Como el navegador: vale el primer <base> con href
+            if self.base is None:
+                self.base = href
+        else:
+            self.links.append(href)
+
+    def result(self) -> dict:
+        return {"base": self.base, "links": self.links}
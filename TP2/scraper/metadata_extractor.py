@@ -1,36 +1,55 @@
 
 import asyncio
 import aiohttp
-from bs4 import BeautifulSoup
 
-HEADERS = {
-    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-}
+from scraper.http_client import HttpSession
+from scraper.document import Extractor, fetch_html, parse_html, run_extractors
 
-async def extract_metadata(session: aiohttp.ClientSession, url: str) -> dict:
-    try:
-        async with session.get(url, timeout=30, headers=HEADERS) as response:
-            response.raise_for_status()
-            html = await response.text()
-            soup = BeautifulSoup(html, 'lxml')
 
-            meta_tags = {}
+class MetadataExtractor(Extractor):
+    """
+    Meta description, keywords y etiquetas Open Graph.
+    Es 'head_only': si todos los extractores pedidos lo son, el motor en
+    streaming corta al llegar al <body> y no ve las <meta> que algunas
+    páginas ponen ahí (BeautifulSoup recorre el documento entero y sí).
+    """
+    name = "metadata"
+    tags = {"meta"}
+    head_only = True
+
+    def __init__(self):
+        self.description = None
+        self.keywords = None
+        self.og_tags = {}
 
-            description = soup.find('meta', attrs={'name': 'description'})
-            if description:
-                meta_tags['description'] = description.get('content', '')
+    def handle(self, tag) -> None:
+        name = tag.get('name')
+        prop = tag.get('property')
+        # Como soup.find(): nos quedamos con la primera description/keywords
+        if name == 'description' and self.description is None:
+            self.description = tag.get('content', '')
+        elif name == 'keywords' and self.keywords is None:
+            self.keywords = tag.get('content', '')
+        if prop and prop.startswith('og:'):
+            # La clave será lo que está en 'property' (ej: "og:title")
+            # El valor será lo que está en 'content'
+            self.og_tags[prop] = tag.get('content', '')
 
-            keywords = soup.find('meta', attrs={'name': 'keywords'})
-            if keywords:
-                meta_tags['keywords'] = keywords.get('content', '')
+    def result(self) -> dict:
+        meta_tags = {}
+        if self.description is not None:
+            meta_tags['description'] = self.description
+        if self.keywords is not None:
+            meta_tags['keywords'] = self.keywords
+        meta_tags.update(self.og_tags)
+        return meta_tags
 
-            og_tags = soup.find_all('meta', property=lambda value: value and value.startswith('og:'))
-            for tag in og_tags:
-                # La clave será lo que está en 'property' (ej: "og:title")
-                # El valor será lo que está en 'content'
-                meta_tags[tag.get('property')] = tag.get('content', '')
 
-            return meta_tags
+async def extract_metadata(session: HttpSession, url: str) -> dict:
+    try:
+        html = await fetch_html(session, url)
+        soup = parse_html(html)
+        return run_extractors(soup, [MetadataExtractor()])[MetadataExtractor.name]
 
     except aiohttp.ClientError as e:
         print(f"Error de red al intentar acceder a {url}: {e}")
@@ -53,4 +72,4 @@ async def main():
         print(json.dumps(data, indent=2, ensure_ascii=False))
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    asyncio.run(main())
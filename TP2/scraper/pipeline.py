@@ -0,0 +1,89 @@
+# scraper/pipeline.py
+
+import asyncio
+import aiohttp
+from typing import Dict, Any, Iterable, Optional, Union
+
+from scraper.http_client import HttpSession
+from scraper.document import fetch_html, parse_html, run_extractors
+from scraper.html_parser import ContentExtractor, TitleExtractor
+from scraper.metadata_extractor import MetadataExtractor
+from scraper.link_extractor import LinkExtractor
+from scraper.stream_parser import stream_extract, DEFAULT_MAX_BYTES
+from common.metrics import REGISTRY, Trace, timed
+
+# Extractores disponibles. Para agregar uno nuevo: heredar de Extractor y registrarlo acá.
+EXTRACTOR_REGISTRY = {
+    ContentExtractor.name: ContentExtractor,
+    TitleExtractor.name: TitleExtractor,
+    MetadataExtractor.name: MetadataExtractor,
+    LinkExtractor.name: LinkExtractor,
+}
+
+# "bs4": árbol completo con BeautifulSoup; "stream": parser incremental de lxml
+PARSER_ENGINES = ("bs4", "stream")
+
+FETCH_ERRORS = REGISTRY.counter(
+    "scraper_errors_total", "Páginas que no se pudieron descargar o procesar", ["engine"])
+
+
+async def scrape_document(session: HttpSession, url: str,
+                          extractors: Union[Iterable[str], None] = None,
+                          engine: str = "bs4",
+                          max_bytes: int = DEFAULT_MAX_BYTES,
+                          trace: Optional[Trace] = None) -> Dict[str, Dict[str, Any]]:
+    """
+    Descarga la página una vez, la parsea una vez y corre todos los
+    extractores pedidos sobre ese mismo árbol.
+    Con engine="stream" se usa el parser incremental: lee la respuesta de a
+    pedazos, no pasa de 'max_bytes' y corta apenas tiene todo lo necesario.
+    Los tiempos de cada etapa van al histograma de etapas y, si se pasa, a 'trace'.
+    Devuelve {nombre_extractor: resultado}; si la descarga falla, cada
+    extractor recibe el mismo {"error": ...}.
+    """
+    names = list(extractors) if extractors else list(EXTRACTOR_REGISTRY)
+    unknown = [name for name in names if name not in EXTRACTOR_REGISTRY]
+    if unknown:
+        raise ValueError(f"Extractores desconocidos: {unknown}")
+    if engine not in PARSER_ENGINES:
+        raise ValueError(f"Motor de parseo desconocido: {engine}")
+
+    try:
+        instances = [EXTRACTOR_REGISTRY[name]() for name in names]
+        if engine == "stream":
+            with timed("scraper", "stream_extract", trace):
+                return await stream_extract(session, url, instances, max_bytes)
+
+        with timed("scraper", "fetch", trace):
+            html = await fetch_html(session, url)
+        with timed("scraper", "parse", trace):
+            soup = parse_html(html)
+        with timed("scraper", "extract", trace):
+            return run_extractors(soup, instances)
+
+    except aiohttp.ClientError as e:
+        print(f"Error de red al intentar acceder a {url}: {e}")
+        error = {"error": f"Network error: {e}"}
+    except asyncio.TimeoutError:
+        print(f"Timeout al intentar acceder a {url}")
+        error = {"error": "Request timed out after 30 seconds"}
+    except Exception as e:
+        print(f"Ocurrió un error inesperado al procesar {url}: {e}")
+        error = {"error": f"An unexpected error occurred: {e}"}
+
+    FETCH_ERRORS.inc(engine=engine)
+    return {name: dict(error) for name in names}
+
+
+async def main():
+    test_url = "https://es.wikipedia.org/wiki/Python"
+    print(f"🧪 Probando el pipeline de documento con la URL: {test_url}")
+
+    async with aiohttp.ClientSession() as session:
+        data = await scrape_document(session, test_url)
+
+        import json
+        print(json.dumps(data, indent=2, ensure_ascii=False))
+
+if __name__ == "__main__":
+    asyncio.run(main())
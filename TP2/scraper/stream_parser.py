@@ -0,0 +1,109 @@
+# scraper/stream_parser.py
+
+from typing import Dict, Any, Iterable, Union
+from lxml import etree
+
+from scraper.http_client import HttpSession
+from scraper.document import HEADERS, Extractor, TagDispatcher
+
+CHUNK_SIZE = 64 * 1024
+# Tope de bytes leídos por página; más allá se corta y se informa lo visto hasta ahí
+DEFAULT_MAX_BYTES = 5 * 1024 * 1024
+
+
+class StreamTag:
+    """
+    Vista mínima de una etiqueta con la misma interfaz que usan los
+    extractores sobre BeautifulSoup (name, get(), string), para que los
+    mismos extractores sirvan con los dos motores.
+    """
+    __slots__ = ("name", "attrs", "string")
+
+    def __init__(self, name: str, attrs: Dict[str, str], string: Union[str, None]):
+        self.name = name
+        self.attrs = attrs
+        self.string = string
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return self.attrs.get(key, default)
+
+
+class StreamingExtraction:
+    """
+    Parser incremental: recibe el HTML de a pedazos con feed() y va
+    entregando cada etiqueta a los extractores apenas se cierra. Los
+    elementos ya procesados se descartan, así que la memoria no crece con
+    el tamaño de la página. 'finished' pasa a True cuando ya no hace falta
+    leer más (se encontró todo lo pedido).
+    """
+
+    def __init__(self, extractors: Iterable[Extractor], encoding: Union[str, None] = None):
+        self.dispatcher = TagDispatcher(extractors)
+        self.wanted = set()
+        for extractor in self.dispatcher.extractors:
+            self.wanted.update(extractor.tags or ())
+        self.catch_all = bool(self.dispatcher.catch_all)
+        self.head_only = all(extractor.head_only for extractor in self.dispatcher.extractors)
+        self.parser = etree.HTMLPullParser(events=("start", "end"), encoding=encoding)
+        self.finished = False
+
+    def feed(self, data: bytes) -> None:
+        self.parser.feed(data)
+        self._drain()
+
+    def close(self) -> Dict[str, Dict[str, Any]]:
+        if not self.finished:
+            try:
+                self.parser.close()
+            except etree.XMLSyntaxError:
+                # Documento truncado o vacío: nos quedamos con lo que se alcanzó a leer
+                pass
+            self._drain()
+        return self.dispatcher.results()
+
+    def _drain(self) -> None:
+        for event, element in self.parser.read_events():
+            if self.finished:
+                continue
+            name = element.tag
+            if not isinstance(name, str):
+                # Comentarios e instrucciones de procesamiento
+                continue
+            if event == "start":
+                if name == "body" and self.head_only:
+                    self.finished = True
+                continue
+
+            if name in self.wanted or self.catch_all:
+                self.dispatcher.dispatch(StreamTag(name, dict(element.attrib), element.text))
+
+            # Liberamos lo ya procesado (el truco clásico de iterparse)
+            element.clear(keep_tail=True)
+            parent = element.getparent()
+            if parent is not None:
+                while element.getprevious() is not None:
+                    del parent[0]
+
+
+async def stream_extract(session: HttpSession, url: str, extractors: Iterable[Extractor],
+                         max_bytes: int = DEFAULT_MAX_BYTES) -> Dict[str, Dict[str, Any]]:
+    """
+    Descarga y extrae en una sola pasada, sin tener nunca el documento
+    entero en memoria. Corta al superar 'max_bytes' o cuando los extractores
+    ya tienen todo lo que necesitan. Los errores se propagan al llamador.
+    """
+    async with session.get(url, timeout=30, headers=HEADERS) as response:
+        response.raise_for_status()
+        extraction = StreamingExtraction(extractors, encoding=response.charset)
+        received = 0
+        async for chunk in response.content.iter_chunked(CHUNK_SIZE):
+            remaining = max_bytes - received
+            extraction.feed(chunk[:remaining])
+            received += min(len(chunk), remaining)
+            if extraction.finished:
+                break
+            if received >= max_bytes:
+                print(f"✂️  {url} supera {max_bytes} bytes; se analiza solo el comienzo.")
+                break
+
+    return extraction.close()
@@ -1,115 +1,640 @@
 # server_processing.py
 
-import socketserver
+import asyncio
 import argparse
-import json
+import http.server
+import heapq
+import itertools
+import signal
+import threading
+import time
 import concurrent.futures
-from typing import Union  # Para compatibilidad con Python 3.8
+from typing import Dict, Any, Callable, List, Optional, Set, Tuple, Union  # Para compatibilidad con Python 3.8
 
+from common.protocol import read_frame, encode_response, ProtocolError
+from common.metrics import REGISTRY, STAGE_SECONDS, PROMETHEUS_CONTENT_TYPE
+from processor.browser import (init_worker, run_task, create_cancel_flags, request_cancel, TaskAborted,
+                               DEFAULT_MAX_TASKS, DEFAULT_MAX_RSS_MB)
 from processor.screenshot import take_screenshot
 from processor.performance import analyze_performance
+from processor.render import render_page
 
+# Cada tarea recibe la URL y, como argumentos con nombre, las 'options' del mensaje
 TASK_REGISTRY = {
     'screenshot': take_screenshot,
-    'performance': analyze_performance
+    'performance': analyze_performance,
+    'render': render_page
 }
 
+# Tareas en espera (sin contar las que ya corren) antes de rechazar con "busy"
+DEFAULT_MAX_QUEUE = 100
+# Puerto HTTP auxiliar donde se expone /metrics (0 lo desactiva)
+DEFAULT_METRICS_PORT = 9081
+# Conexiones pendientes de aceptar que admite el sistema operativo
+DEFAULT_BACKLOG = 1024
+# Segundos que se espera a las tareas en vuelo al cerrar (SIGTERM / Ctrl-C)
+DEFAULT_DRAIN_TIMEOUT = 60.0
+# 'retry_after' de las tareas rechazadas mientras se cierra
+DRAINING_RETRY_AFTER = 1.0
 
-class TaskHandler(socketserver.BaseRequestHandler):
+# --- Métricas ---
+TASKS_TOTAL = REGISTRY.counter(
+    "processing_tasks_total", "Tareas recibidas por tipo y resultado", ["task", "status"])
+QUEUE_WAIT_SECONDS = REGISTRY.histogram(
+    "processing_queue_wait_seconds", "Tiempo en la cola del planificador", ["task"])
+EXECUTE_SECONDS = REGISTRY.histogram(
+    "processing_execute_seconds", "Tiempo de ejecución en el pool de procesos", ["task"])
 
 
-    def handle(self):
-        print(f"▶️ Conexión recibida de: {self.client_address[0]}")
-        
+def task_label(task_name: Any) -> str:
+    """Etiqueta de métricas para una tarea: solo las registradas, así el cliente no crea etiquetas."""
+    return task_name if isinstance(task_name, str) and task_name in TASK_REGISTRY else "unknown"
+
+
+class DeadlineExpired(Exception):
+    """La tarea venció antes de empezar: ya nadie espera su resultado."""
+
+
+class SchedulerBusy(Exception):
+    """La cola está llena: el cliente debe reintentar después de 'retry_after' segundos."""
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"Servidor ocupado, reintentar en {retry_after} s")
+        self.retry_after = retry_after
+
+
+class TaskScheduler:
+    """
+    Planificador delante del ProcessPoolExecutor:
+
+    - Cola acotada: si hay 'max_queue' tareas esperando, submit() rechaza
+      enseguida con SchedulerBusy en vez de dejar crecer la latencia.
+    - Límite de concurrencia por tipo de tarea (ej. pocos screenshots a la
+      vez aunque haya trabajadores libres) y global (= trabajadores del pool,
+      así el pool nunca acumula cola propia fuera de nuestro control).
+    - Prioridades: mayor 'priority' sale antes; a igual prioridad, FIFO.
+    - Plazos: una tarea cuyo 'deadline' (epoch) pasó mientras esperaba en la
+      cola falla con DeadlineExpired sin ocupar un trabajador.
+    - Las tareas canceladas o vencidas salen de la cola enseguida: no cuentan
+      para 'max_queue' ni para la carga que se informa.
+
+    Es seguro entre hilos y no bloquea: submit() devuelve un Future.
+    """
+
+    def __init__(self, pool: concurrent.futures.Executor, max_workers: int,
+                 max_queue: int = DEFAULT_MAX_QUEUE, type_limits: Union[Dict[str, int], None] = None):
+        self.pool = pool
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.type_limits = type_limits or {}
+        self._lock = threading.Lock()
+        self._queue: List[Tuple[int, int, Dict[str, Any]]] = []
+        self._seq = itertools.count()
+        self._running: Dict[str, int] = {}
+        self._total_running = 0
+        # Duración media (EWMA) de una tarea, para estimar el retry-after
+        self._avg_duration = 5.0
+        self.rejected = 0
+
+    def submit(self, task_name: str, fn: Callable, *args: Any, priority: int = 0,
+               deadline: Optional[float] = None, **kwargs: Any) -> concurrent.futures.Future:
+        future: concurrent.futures.Future = concurrent.futures.Future()
+        entry = {"task": task_name, "fn": fn, "args": args, "kwargs": kwargs, "future": future,
+                 "queued_at": time.monotonic(), "deadline": deadline}
+        expired = []
+        with self._lock:
+            if len(self._queue) >= self.max_queue:
+                # Antes de rechazar, sacamos las que vencieron esperando
+                expired = self._pop_expired()
+            busy = len(self._queue) >= self.max_queue
+            if busy:
+                self.rejected += 1
+                retry_after = self._retry_after()
+            else:
+                heapq.heappush(self._queue, (-priority, next(self._seq), entry))
+        self._expire(expired)
+        if busy:
+            raise SchedulerBusy(retry_after)
+        future.add_done_callback(self._remove_cancelled)
+        self._dispatch()
+        return future
+
+    def _remove_cancelled(self, future: concurrent.futures.Future) -> None:
+        """Saca de la cola la entrada de una tarea cancelada antes de empezar."""
+        if not future.cancelled():
+            return
+        with self._lock:
+            self._queue = [item for item in self._queue if item[2]["future"] is not future]
+            heapq.heapify(self._queue)
+
+    def _pop_expired(self) -> List[Dict[str, Any]]:
+        """Saca de la cola las tareas vencidas y las devuelve (con el lock tomado)."""
+        now = time.time()
+        expired = [item[2] for item in self._queue
+                   if item[2]["deadline"] is not None and now >= item[2]["deadline"]]
+        if expired:
+            self._queue = [item for item in self._queue
+                           if item[2]["deadline"] is None or now < item[2]["deadline"]]
+            heapq.heapify(self._queue)
+        return expired
+
+    @staticmethod
+    def _expire(entries: List[Dict[str, Any]]) -> None:
+        for entry in entries:
+            if entry["future"].set_running_or_notify_cancel():
+                entry["future"].set_exception(DeadlineExpired("La tarea venció esperando en la cola"))
+
+    def _retry_after(self) -> float:
+        # Tiempo aproximado hasta que se vacíe la cola actual
+        backlog = len(self._queue) + self._total_running
+        return max(1.0, round(self._avg_duration * backlog / max(1, self.max_workers), 1))
+
+    def _has_capacity(self, task_name: str) -> bool:
+        limit = self.type_limits.get(task_name)
+        return limit is None or self._running.get(task_name, 0) < limit
+
+    def _dispatch(self) -> None:
+        """Lanza al pool todas las tareas que entren en los límites actuales."""
+        to_start = []
+        expired = []
+        now = time.time()
+        with self._lock:
+            skipped = []
+            while self._queue and self._total_running < self.max_workers:
+                item = heapq.heappop(self._queue)
+                entry = item[2]
+                if entry["future"].cancelled():
+                    continue
+                if entry["deadline"] is not None and now >= entry["deadline"]:
+                    expired.append(entry)
+                    continue
+                if not self._has_capacity(entry["task"]):
+                    # Su tipo está al tope: la dejamos y probamos con la siguiente
+                    skipped.append(item)
+                    continue
+                self._running[entry["task"]] = self._running.get(entry["task"], 0) + 1
+                self._total_running += 1
+                to_start.append(entry)
+            for item in skipped:
+                heapq.heappush(self._queue, item)
+
+        self._expire(expired)
+        for entry in to_start:
+            self._start(entry)
+
+    def _start(self, entry: Dict[str, Any]) -> None:
+        future = entry["future"]
+        if not future.set_running_or_notify_cancel():
+            self._finish(entry["task"], None)
+            return
+        started_at = time.monotonic()
+        # Tiempos que el TaskHandler informa y registra en sus métricas
+        future.queue_wait = started_at - entry["queued_at"]
+        QUEUE_WAIT_SECONDS.observe(future.queue_wait, task=entry["task"])
+        try:
+            pool_future = self.pool.submit(entry["fn"], *entry["args"], **entry["kwargs"])
+        except Exception as e:
+            future.set_exception(e)
+            self._finish(entry["task"], None)
+            return
+
+        def on_done(done: concurrent.futures.Future) -> None:
+            future.execute_time = time.monotonic() - started_at
+            EXECUTE_SECONDS.observe(future.execute_time, task=entry["task"])
+            self._finish(entry["task"], future.execute_time)
+            try:
+                future.set_result(done.result())
+            except Exception as e:
+                future.set_exception(e)
+
+        pool_future.add_done_callback(on_done)
+
+    def _finish(self, task_name: str, duration: Union[float, None]) -> None:
+        with self._lock:
+            self._running[task_name] -= 1
+            self._total_running -= 1
+            if duration is not None:
+                self._avg_duration = 0.8 * self._avg_duration + 0.2 * duration
+        self._dispatch()
+
+    def load(self) -> Dict[str, int]:
+        """Carga resumida que viaja en cada respuesta para el balanceo del Servidor A."""
+        with self._lock:
+            expired = self._pop_expired()
+            load = {"backlog": len(self._queue) + self._total_running, "capacity": self.max_workers}
+        self._expire(expired)
+        return load
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            expired = self._pop_expired()
+            stats = {
+                "queued": len(self._queue),
+                "running": self._total_running,
+                "running_by_task": {name: count for name, count in self._running.items() if count},
+                "max_workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "rejected": self.rejected,
+            }
+        self._expire(expired)
+        return stats
+
+
+class _Client:
+    """Una conexión del Servidor A: su escritor y las tareas que tiene en vuelo."""
+
+    def __init__(self, writer: asyncio.StreamWriter):
+        self.writer = writer
+        self.write_lock = asyncio.Lock()
+        # id del pedido -> (future del planificador, token de cancelación)
+        self.tasks: Dict[Any, Tuple[concurrent.futures.Future, int]] = {}
+
+
+class ProcessingServer:
+    """
+    Frente asyncio del Servidor B: un solo event loop atiende todas las
+    conexiones persistentes, así que su cantidad ya no depende de un hilo
+    (y su pila) por conexión. Cada conexión lee frames hasta que el cliente
+    cierra y lanza cada tarea al planificador sin esperarla; la respuesta se
+    envía al terminar, con el mismo 'id' del pedido.
+
+    Cada tarea lleva un token de cancelación y el 'deadline' del mensaje: las
+    vencidas se rechazan al llegar, y un {"control": "cancel"} (o el cierre de
+    la conexión) la saca de la cola o le pide al trabajador que la aborte.
+
+    shutdown() deja de aceptar conexiones, responde "busy" a las tareas
+    nuevas (el balanceador del Servidor A las manda a otro nodo) y espera a
+    que las que están en vuelo terminen y se envíen.
+    """
+
+    def __init__(self, scheduler: TaskScheduler, host: str, port: int, backlog: int = DEFAULT_BACKLOG,
+                 cancel_flags=None):
+        self.scheduler = scheduler
+        self.cancel_flags = cancel_flags
+        self._tokens = itertools.count(1)
+        self.host = host
+        self.port = port
+        self.backlog = backlog
+        self.draining = False
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._clients: Set[_Client] = set()
+        self._handlers: Set[asyncio.Task] = set()
+        self._tasks: Set[asyncio.Task] = set()
+
+    @property
+    def connections(self) -> int:
+        return len(self._clients)
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._tasks)
+
+    async def start(self) -> None:
+        self._server = await asyncio.start_server(self.handle_connection, self.host, self.port,
+                                                  backlog=self.backlog, reuse_address=True)
+
+    def _spawn(self, coro) -> None:
+        task = asyncio.ensure_future(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def send_response(self, client: _Client, request_id: Any, response: Dict[str, Any]) -> None:
+        response["load"] = self.scheduler.load()
+        frame = encode_response(request_id, response)
+        if client.writer.is_closing():
+            print(f"⚠️ No se pudo enviar la respuesta {request_id}: la conexión ya está cerrada")
+            return
+        try:
+            async with client.write_lock:
+                client.writer.write(frame)
+                await client.writer.drain()
+        except (ConnectionError, OSError) as e:
+            print(f"⚠️ No se pudo enviar la respuesta {request_id}: {e}")
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        peer = writer.get_extra_info("peername")
+        address = peer[0] if peer else "?"
+        print(f"▶️ Conexión recibida de: {address}")
+        client = _Client(writer)
+        self._clients.add(client)
+        handler = asyncio.current_task()
+        self._handlers.add(handler)
         try:
-            # 1. Recibir los datos del socket
-            data = b""
             while True:
-                chunk = self.request.recv(4096)
-                if not chunk:
-                    break
-                data += chunk
-                if len(chunk) < 4096:
-                    break
-            
-            if not data:
-                print("⚠️ Conexión cerrada sin recibir datos.")
-                return
-
-            # 2. Deserializar el mensaje JSON
-            message = json.loads(data.decode('utf-8'))
+                # 1. Recibir el siguiente frame de la conexión
+                try:
+                    message, _body = await read_frame(reader)
+                except asyncio.IncompleteReadError as e:
+                    if e.partial:
+                        print("❌ Conexión descartada: cerrada a mitad de un frame")
+                    else:
+                        print(f"⏹️ Conexión cerrada por: {address}")
+                    return
+                except (ProtocolError, ConnectionError, OSError) as e:
+                    print(f"❌ Conexión descartada: {e}")
+                    return
+                self.dispatch(message, client)
+        finally:
+            self._clients.discard(client)
+            # Nadie va a leer estas respuestas: liberamos cola y trabajadores
+            for request_id in list(client.tasks):
+                self.cancel(client, request_id)
+            writer.close()
+            self._handlers.discard(handler)
+
+    def cancel(self, client: _Client, request_id: Any) -> None:
+        """Saca la tarea de la cola o, si ya corre, le pide al trabajador que la aborte."""
+        entry = client.tasks.pop(request_id, None)
+        if entry is None:
+            return
+        future, token = entry
+        if future.cancel():
+            print(f"🚫 Tarea {request_id} cancelada antes de empezar.")
+        elif not future.done() and self.cancel_flags is not None:
+            request_cancel(self.cancel_flags, token)
+            print(f"🚫 Se pidió abortar la tarea {request_id} en curso.")
+
+    def dispatch(self, message: Dict[str, Any], client: _Client) -> None:
+        request_id = message.get("id")
+        # Identificador de traza del Servidor A, para seguir el pedido en los logs de ambos
+        trace_id = message.get("trace_id", "-")
+
+        def reply(response: Dict[str, Any]) -> None:
+            self._spawn(self.send_response(client, request_id, response))
+
+        # Mensaje de control: el Servidor A dejó de esperar una tarea (sin respuesta)
+        if message.get("control") == "cancel":
+            self.cancel(client, message.get("target"))
+            return
+
+        # Mensaje de control: chequeo de salud con el estado del planificador
+        if message.get("control") == "ping":
+            if self.draining:
+                reply({"status": "draining", "message": "El servidor se está cerrando"})
+            else:
+                reply({"status": "success", "data": self.scheduler.stats()})
+            return
+
+        try:
+            # 2. Validar el mensaje
             task_name = message.get("task")
             url = message.get("url")
+            options = message.get("options") or {}
 
             if not task_name or not url:
                 raise ValueError("Mensaje inválido, faltan 'task' o 'url'")
+            if not isinstance(options, dict):
+                raise ValueError("Mensaje inválido, 'options' debe ser un objeto")
 
-            print(f"⚙️ Tarea recibida: '{task_name}' para la URL: {url}")
+            print(f"⚙️ [{trace_id}] Tarea recibida: '{task_name}' para la URL: {url}")
 
             # 3. Obtener la función correcta del registro
             task_function = TASK_REGISTRY.get(task_name)
             if not task_function:
                 raise ValueError(f"Tarea desconocida: {task_name}")
 
-            # 4. Enviar la tarea al pool de procesos
-            future = self.server.process_pool.submit(task_function, url)
-            
-            result = future.result(timeout=90) 
-            
-            response = {"status": "success", "data": result}
-            print(f"✅ Tarea '{task_name}' completada.")
+            priority = message.get("priority", 0)
+            if not isinstance(priority, int):
+                raise ValueError("Mensaje inválido, 'priority' debe ser un entero")
 
+            deadline = message.get("deadline")
+            if deadline is not None and not isinstance(deadline, (int, float)):
+                raise ValueError("Mensaje inválido, 'deadline' debe ser un número (epoch en segundos)")
+            if deadline is not None and time.time() >= deadline:
+                raise DeadlineExpired("La tarea llegó con el plazo vencido")
+
+            if self.draining:
+                raise SchedulerBusy(DRAINING_RETRY_AFTER)
+
+            # 4. Encolar la tarea en el planificador (que la pasará al pool de procesos)
+            token = next(self._tokens)
+            future = self.scheduler.submit(task_name, run_task, task_function, token, deadline, url, options,
+                                           priority=priority, deadline=deadline)
+            client.tasks[request_id] = (future, token)
+
+        except DeadlineExpired as e:
+            print(f"⌛ [{trace_id}] {e}; se rechaza.")
+            TASKS_TOTAL.inc(task=task_label(message.get("task")), status="expired")
+            reply({"status": "error", "message": str(e)})
+            return
+        except SchedulerBusy as e:
+            print(f"⏳ [{trace_id}] Sin lugar para la tarea, se rechaza (reintentar en {e.retry_after} s).")
+            TASKS_TOTAL.inc(task=task_label(message.get("task")), status="busy")
+            reply({"status": "busy", "message": str(e), "retry_after": e.retry_after})
+            return
         except Exception as e:
-            print(f"❌ Error procesando la solicitud: {e}")
+            print(f"❌ [{trace_id}] Error procesando la solicitud: {e}")
+            TASKS_TOTAL.inc(task=task_label(message.get("task")), status="error")
+            reply({"status": "error", "message": str(e)})
+            return
+
+        # 5. Al terminar, serializar la respuesta y enviarla de vuelta
+        self._spawn(self._complete(future, task_name, trace_id, client, request_id))
+
+    async def _complete(self, future: concurrent.futures.Future, task_name: str, trace_id: str,
+                        client: _Client, request_id: Any) -> None:
+        status = None
+        try:
+            result = await asyncio.wrap_future(future)
+            response = {"status": "success"}
+            print(f"✅ [{trace_id}] Tarea '{task_name}' completada.")
+        except (asyncio.CancelledError, concurrent.futures.CancelledError):
+            # Cancelada antes de empezar: nadie espera la respuesta
+            TASKS_TOTAL.inc(task=task_name, status="cancelled")
+            return
+        except Exception as e:
+            print(f"❌ [{trace_id}] Error procesando la solicitud: {e}")
+            result = None
             response = {"status": "error", "message": str(e)}
-        
-        # 6. Serializar la respuesta y enviarla de vuelta
-        self.request.sendall(json.dumps(response).encode('utf-8'))
+            if isinstance(e, DeadlineExpired):
+                status = "expired"
+            elif isinstance(e, TaskAborted):
+                status = "aborted"
+        finally:
+            if client.tasks.get(request_id, (None,))[0] is future:
+                del client.tasks[request_id]
+        TASKS_TOTAL.inc(task=task_name, status=status or response["status"])
 
+        # Tiempos por etapa: cola y ejecución (medidos acá) + los del trabajador
+        timings = {"queue_wait": getattr(future, "queue_wait", 0.0),
+                   "execute": getattr(future, "execute_time", 0.0)}
+        if isinstance(result, dict) and "_timings" in result:
+            result = dict(result)
+            for stage, seconds in result.pop("_timings").items():
+                STAGE_SECONDS.observe(seconds, component="processor", stage=stage)
+                timings[stage] = seconds
+        if response["status"] == "success":
+            response["data"] = result
+        response["timings"] = timings
+        response["trace_id"] = trace_id
+        await self.send_response(client, request_id, response)
 
+    async def shutdown(self, drain_timeout: float = DEFAULT_DRAIN_TIMEOUT) -> None:
+        """Cierre ordenado: no acepta más, drena lo que está en vuelo y cierra las conexiones."""
+        self.draining = True
+        self._server.close()
 
-class ThreadedTCPServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+        pending = set(self._tasks)
+        if pending:
+            print(f"⏳ Esperando {len(pending)} tareas en vuelo (hasta {drain_timeout} s)...")
+            _done, pending = await asyncio.wait(pending, timeout=drain_timeout)
+        if pending:
+            print(f"⚠️ {len(pending)} tareas no terminaron a tiempo; se abortan.")
+            for client in list(self._clients):
+                for request_id in list(client.tasks):
+                    self.cancel(client, request_id)
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
 
-    daemon_threads = True
-    allow_reuse_address = True
+        for client in list(self._clients):
+            client.writer.close()
+        # Cada manejador ve el cierre de su conexión y termina
+        if self._handlers:
+            await asyncio.wait(set(self._handlers), timeout=5)
+        await self._server.wait_closed()
 
-    def __init__(self, server_address, RequestHandlerClass, process_pool):
-        super().__init__(server_address, RequestHandlerClass)
-        self.process_pool = process_pool
 
+class MetricsHandler(http.server.BaseHTTPRequestHandler):
+    """Puerto HTTP auxiliar: GET /metrics en formato Prometheus."""
 
-def main():
-    HOST, PORT = "localhost", 8081 
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = REGISTRY.render().encode('utf-8')
+        self.send_response(200)
+        self.send_header("Content-Type", PROMETHEUS_CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
 
+    def log_message(self, format, *args):
+        # Prometheus consulta seguido: no llenamos la consola
+        pass
+
+
+def start_metrics_server(host: str, port: int, scheduler: "TaskScheduler") -> http.server.ThreadingHTTPServer:
+    REGISTRY.gauge("processing_queued_tasks", "Tareas esperando en la cola",
+                   lambda: scheduler.stats()["queued"])
+    REGISTRY.gauge("processing_running_tasks", "Tareas ejecutándose en el pool",
+                   lambda: scheduler.stats()["running"])
+    server = http.server.ThreadingHTTPServer((host, port), MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def create_process_pool(max_workers: Union[int, None] = None,
+                        browser_max_tasks: int = DEFAULT_MAX_TASKS,
+                        browser_max_rss_mb: int = DEFAULT_MAX_RSS_MB,
+                        cancel_flags=None) -> concurrent.futures.ProcessPoolExecutor:
+    """
+    Crea el pool de procesos. Cada trabajador arranca con un Chromium
+    persistente que se recicla tras N tareas o al superar el límite de memoria.
+    'cancel_flags' (ver create_cancel_flags) le permite abortar tareas en curso.
+    """
+    return concurrent.futures.ProcessPoolExecutor(
+        max_workers=max_workers,
+        initializer=init_worker,
+        initargs=(browser_max_tasks, browser_max_rss_mb, cancel_flags),
+    )
+
+
+def parse_type_limits(values: List[str]) -> Dict[str, int]:
+    """Convierte ["screenshot=2", ...] en {"screenshot": 2, ...}."""
+    limits = {}
+    for value in values:
+        name, _, count = value.partition("=")
+        if name not in TASK_REGISTRY or not count.isdigit() or int(count) < 1:
+            raise ValueError(f"Límite inválido: {value!r} (usar TAREA=N)")
+        limits[name] = int(count)
+    return limits
+
+
+def raise_open_files_limit() -> None:
+    """
+    Cada conexión es un descriptor de archivo: subimos el límite blando al
+    máximo permitido para que miles de conexiones no choquen con el 1024 habitual.
+    """
+    try:
+        import resource
+        soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+        if hard == resource.RLIM_INFINITY or soft < hard:
+            resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+    except (ImportError, ValueError, OSError):
+        # Windows no tiene 'resource'; si no se puede, seguimos con el límite actual
+        pass
+
+
+async def serve(scheduler: TaskScheduler, args: argparse.Namespace, cancel_flags=None) -> None:
+    server = ProcessingServer(scheduler, args.ip, args.port, backlog=args.backlog, cancel_flags=cancel_flags)
+    await server.start()
+    REGISTRY.gauge("processing_open_connections", "Conexiones abiertas desde el Servidor A",
+                   lambda: server.connections)
+
+    # SIGTERM (ej. docker stop) y Ctrl-C disparan el cierre ordenado
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except NotImplementedError:
+            # Windows: Ctrl-C corta sin drenar
+            pass
+
+    print(f"👂 Escuchando en {args.ip}:{args.port}")
+    await stop.wait()
+    print("🛑 Cerrando: no se aceptan más conexiones ni tareas nuevas.")
+    await server.shutdown(args.drain_timeout)
 
-    with concurrent.futures.ProcessPoolExecutor() as pool:
-        print("🚀 Servidor de Procesamiento iniciado.")
-        print(f"🏊 Pool de {pool._max_workers} procesos trabajadores creado.")
-        
-        with ThreadedTCPServer((HOST, PORT), TaskHandler, process_pool=pool) as server:
-            print(f"👂 Escuchando en {HOST}:{PORT}")
-            # Mantener el servidor corriendo hasta que se interrumpa (Ctrl+C)
-            server.serve_forever()
 
-if __name__ == "__main__":
-    main()
-    
 def main():
     parser = argparse.ArgumentParser(description="Servidor de Procesamiento Distribuido")
     parser.add_argument("-i", "--ip", default="localhost", help="Dirección de escucha")
     parser.add_argument("-p", "--port", type=int, default=8081, help="Puerto de escucha")
+    parser.add_argument("-w", "--workers", type=int, default=None,
+                        help="Procesos trabajadores del pool (por defecto, uno por CPU)")
+    parser.add_argument("--backlog", type=int, default=DEFAULT_BACKLOG,
+                        help="Conexiones pendientes de aceptar que admite el sistema operativo")
+    parser.add_argument("--drain-timeout", type=float, default=DEFAULT_DRAIN_TIMEOUT,
+                        help="Segundos que se espera a las tareas en vuelo al cerrar")
+    parser.add_argument("--browser-max-tasks", type=int, default=DEFAULT_MAX_TASKS,
+                        help="Tareas por navegador antes de reciclarlo")
+    parser.add_argument("--browser-max-rss-mb", type=int, default=DEFAULT_MAX_RSS_MB,
+                        help="Memoria (MB) del trabajador y su navegador antes de reciclarlo")
+    parser.add_argument("--max-queue", type=int, default=DEFAULT_MAX_QUEUE,
+                        help="Tareas en espera antes de responder 'busy'")
+    parser.add_argument("--limit", action="append", default=[], metavar="TAREA=N",
+                        help="Máximo de tareas de un tipo en simultáneo (ej. --limit screenshot=2)")
+    parser.add_argument("--metrics-port", type=int, default=DEFAULT_METRICS_PORT,
+                        help="Puerto HTTP para /metrics (0 para desactivarlo)")
 
     args = parser.parse_args()
+    try:
+        type_limits = parse_type_limits(args.limit)
+    except ValueError as e:
+        parser.error(str(e))
+    if args.workers is not None and args.workers < 1:
+        parser.error("--workers debe ser al menos 1")
+    raise_open_files_limit()
 
-    # 3. Usar los argumentos para iniciar el servidor
-    with concurrent.futures.ProcessPoolExecutor() as pool:
+    # Al salir del 'with' el pool espera a las tareas que ya estaban corriendo
+    cancel_flags = create_cancel_flags()
+    with create_process_pool(max_workers=args.workers,
+                             browser_max_tasks=args.browser_max_tasks,
+                             browser_max_rss_mb=args.browser_max_rss_mb,
+                             cancel_flags=cancel_flags) as pool:
         print("🚀 Servidor de Procesamiento iniciado.")
         print(f"🏊 Pool de {pool._max_workers} procesos trabajadores creado.")
-        
-        # Usa args.ip y args.port en lugar de valores fijos
-        with ThreadedTCPServer((args.ip, args.port), TaskHandler, process_pool=pool) as server:
-            print(f"👂 Escuchando en {args.ip}:{args.port}")
-            server.serve_forever()
+
+        scheduler = TaskScheduler(pool, pool._max_workers, max_queue=args.max_queue, type_limits=type_limits)
+        print(f"🚦 Cola de hasta {args.max_queue} tareas; límites por tipo: {type_limits or 'ninguno'}")
+        if args.metrics_port:
+            start_metrics_server(args.ip, args.metrics_port, scheduler)
+            print(f"📊 Métricas en http://{args.ip}:{args.metrics_port}/metrics")
+        asyncio.run(serve(scheduler, args, cancel_flags))
+    print("👋 Servidor de Procesamiento detenido.")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
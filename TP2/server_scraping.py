@@ -2,119 +2,841 @@
 
 import asyncio
 import argparse
-import aiohttp
 import json
+import time
+import uuid
+from typing import Optional
 from aiohttp import web
 from datetime import datetime, timezone
 
 # Importamos las funciones que hemos creado
-from scraper.html_parser import scrape_page_content
-from scraper.metadata_extractor import extract_metadata
+from scraper.pipeline import scrape_document, PARSER_ENGINES
+from scraper.stream_parser import DEFAULT_MAX_BYTES
+from scraper.http_client import create_http_client, DEFAULT_HTTP_CONFIG
+from common.balancer import ProcessorCluster, parse_node, DEFAULT_HEALTH_INTERVAL
+from common.protocol import DEFAULT_TASK_TIMEOUT
+from common.blobstore import BlobStore, CONTENT_TYPES
+from common.cache import ResultCache, make_cache_key, DEFAULT_MAX_ENTRIES, DEFAULT_TTL
+from common.metrics import REGISTRY, PROMETHEUS_CONTENT_TYPE, Trace, timed
+from common.encoding import dumps_json, negotiate_encoding, compress, MIN_COMPRESS_BYTES
+from processor.profiles import RENDER_PROFILES, DEFAULT_PROFILE
+from scraper.crawler import (Crawler, resolve_links, CRAWL_SCOPES, DEFAULT_MAX_DEPTH, DEFAULT_MAX_PAGES,
+                             DEFAULT_CONCURRENCY, DEFAULT_PER_HOST_CONCURRENCY, DEFAULT_PER_HOST_DELAY)
 
 # --- Lógica de comunicación con el Servidor B ---
 
-# Dirección del servidor de procesamiento
+# Nodos de procesamiento por defecto (se cambian con --processor HOST:PUERTO)
 PROCESSING_SERVER_HOST = 'localhost'
 PROCESSING_SERVER_PORT = 8081
 
-async def send_task_to_processor(task_name: str, url: str) -> dict:
+async def send_task_to_processor(app: web.Application, task_name: str, url: str, options: dict = None,
+                                 trace: Trace = None, deadline: float = None) -> dict:
     """
     Función asíncrona para enviar una tarea al servidor de procesamiento.
+    'options' se pasa a la tarea como argumentos con nombre.
+    El ProcessorCluster de la aplicación elige el nodo y reintenta en otro si falla.
+    Con 'trace', el id viaja en el mensaje y los tiempos que informa el
+    Servidor B se suman a la traza como "processor.<etapa>".
+    'deadline' (epoch en segundos) es el momento a partir del cual el
+    resultado ya no sirve: el Servidor B no empieza la tarea si ya pasó y
+    corta la navegación al alcanzarlo. Por defecto, DEFAULT_TASK_TIMEOUT desde ahora.
     """
-    try:
-        # 1. Abrimos una conexión asíncrona
-        reader, writer = await asyncio.open_connection(
-            PROCESSING_SERVER_HOST, PROCESSING_SERVER_PORT)
-
-        # 2. Creamos y serializamos el mensaje de la tarea
-        message = json.dumps({"task": task_name, "url": url})
-        
-        # 3. Enviamos el mensaje
-        writer.write(message.encode('utf-8'))
-        await writer.drain() # Espera hasta que el mensaje se envíe
-
-        # 4. Leemos la respuesta del servidor
-        response_data = await reader.read()
-        
-        # 5. Cerramos la conexión
-        writer.close()
-        await writer.wait_closed()
-
-        # 6. Deserializamos y devolvemos la respuesta
-        return json.loads(response_data.decode('utf-8'))
-
-    except ConnectionRefusedError:
-        print(f"❌ Error de conexión: No se pudo conectar a {PROCESSING_SERVER_HOST}:{PROCESSING_SERVER_PORT}. ¿Está corriendo el servidor de procesamiento?")
-        return {"status": "error", "message": "Processing server is unavailable."}
-    except Exception as e:
-        print(f"❌ Error en la comunicación con el procesador: {e}")
-        return {"status": "error", "message": str(e)}
+    if deadline is None:
+        deadline = time.time() + DEFAULT_TASK_TIMEOUT
+    task = {"task": task_name, "url": url, "deadline": deadline}
+    if options:
+        task["options"] = options
+    if trace is not None and trace.trace_id:
+        task["trace_id"] = trace.trace_id
+    with timed("server_scraping", "processor_roundtrip", trace):
+        response = await app["processor"].send_task(task)
+    if trace is not None:
+        trace.merge(response.get("timings"), prefix="processor.")
+    return response
+
+
+async def start_processor_client(app: web.Application):
+    nodes = app.get("processor_nodes") or [(PROCESSING_SERVER_HOST, PROCESSING_SERVER_PORT)]
+    app["processor"] = ProcessorCluster(nodes, health_interval=app.get("health_interval", DEFAULT_HEALTH_INTERVAL))
+    app["processor"].start()
+
+
+async def close_processor_client(app: web.Application):
+    await app["processor"].close()
+
+
+async def start_http_client(app: web.Application):
+    # Una sola sesión para toda la aplicación: reutiliza conexiones, DNS y TLS
+    app["http"] = create_http_client(**app.get("http_config", {}))
+
+
+async def close_http_client(app: web.Application):
+    await app["http"].close()
+
+# --- Métricas ---
+ANALYSES_TOTAL = REGISTRY.counter(
+    "scrape_analyses_total", "Análisis servidos por resultado y origen (caché o nuevo)", ["status", "cache"])
+ANALYSIS_SECONDS = REGISTRY.histogram(
+    "scrape_analysis_seconds", "Latencia de un análisis completo por origen", ["cache"])
 
 # --- Lógica del servidor web (AIOHTTP) ---
 
+# 'use': devuelve lo cacheado si está vigente; 'refresh': fuerza un análisis nuevo
+CACHE_MODES = ("use", "refresh")
+
+# Partes del informe que se pueden pedir con ?sections=a,b (por defecto, todas).
+# Las de PROCESSOR_SECTIONS requieren el navegador del Servidor B.
+SCRAPE_SECTIONS = ("content", "links", "metadata", "performance", "screenshot")
+PROCESSOR_SECTIONS = ("screenshot", "performance")
+
+# Respuestas más grandes que esto se comprimen en un hilo para no frenar el event loop
+COMPRESS_IN_THREAD_BYTES = 64 * 1024
+
+# Tope de ?timeout=SEGUNDOS, el plazo de cada análisis (por defecto DEFAULT_TASK_TIMEOUT)
+MAX_SCRAPE_TIMEOUT = 300
+
+# Concurrencia de /scrape/batch (se puede pedir otra con ?concurrency=N)
+DEFAULT_BATCH_CONCURRENCY = 8
+MAX_BATCH_CONCURRENCY = 64
+
+# Screenshots: dónde se guardan y límites de la miniatura
+DEFAULT_SCREENSHOT_DIR = "screenshots"
+MIN_THUMBNAIL_WIDTH = 16
+MAX_THUMBNAIL_WIDTH = 2000
+
+async def run_analysis(app: web.Application, url: str, options: dict, trace: Trace = None,
+                       deadline: float = None) -> dict:
+    """
+    Corre el análisis completo de una URL y devuelve el informe consolidado.
+    'options' describe qué se pidió; forma parte de la clave de la caché.
+    'trace' acumula los tiempos por etapa de este análisis.
+    'deadline' es el plazo de la tarea del Servidor B (ver send_task_to_processor).
+    Solo se corre lo que piden las secciones de options["sections"]: sin
+    "screenshot" ni "performance" no se usa el Servidor B, y sin secciones
+    de scraping no se descarga el HTML.
+    """
+    sections = options.get("sections", SCRAPE_SECTIONS)
+    extractors = scraping_extractors(sections, options.get("full_links", False))
+    outputs = [name for name in PROCESSOR_SECTIONS if name in sections]
+
+    # --- Ejecutamos todas las tareas de forma concurrente ---
+    # Armamos las tareas a ejecutar. asyncio.gather las correrá "a la vez"
+    tasks_to_run = {}
+    if extractors:
+        # Tarea de scraping (local): una descarga y un parseo para todos los extractores
+        tasks_to_run["document"] = scrape_document(app["http"], url, extractors,
+                                                   engine=app.get("html_parser", "bs4"),
+                                                   max_bytes=app.get("html_max_bytes", DEFAULT_MAX_BYTES),
+                                                   trace=trace)
+    if outputs:
+        # Tarea de procesamiento (remota): una sola navegación para screenshot y rendimiento
+        tasks_to_run["render"] = send_task_to_processor(app, 'render', url, {
+            "outputs": outputs,
+            "screenshot_options": options.get("screenshot", {}),
+            "profile": options.get("profile", DEFAULT_PROFILE),
+        }, trace=trace, deadline=deadline)
+
+    # Esperamos a que todas las tareas terminen
+    results = dict(zip(tasks_to_run, await asyncio.gather(*tasks_to_run.values(), return_exceptions=True)))
+
+    # --- Consolidamos la respuesta final en el formato requerido ---
+    final_response = {"url": url, "timestamp": datetime.now(timezone.utc).isoformat()}
+    if extractors:
+        final_response["scraping_data"] = build_scraping_data(results["document"], sections)
+    if outputs:
+        final_response["processing_data"] = await build_processing_data(app, results["render"], trace, outputs)
+
+    # Si alguna tarea principal falló, cambiamos el status general:
+    # "partial_failure" si falló una parte, "error" si fallaron todas
+    failures = []
+    if extractors:
+        failures.append(document_error(results["document"]) is not None)
+    if outputs:
+        failures.append(render_error(results["render"], outputs) is not None or
+                        final_response["processing_data"].get("screenshot") == "Error")
+    if failures and all(failures):
+        final_response["status"] = "error"
+    elif any(failures):
+        final_response["status"] = "partial_failure"
+    else:
+        final_response["status"] = "success"
+
+    return final_response
+
+
+def scraping_extractors(sections, full_links: bool = False) -> list:
+    """
+    Extractores necesarios para las secciones pedidas. "metadata" lleva el
+    título: si no se corre el extractor de contenido, sale del de "title".
+    Así un pedido solo de metadatos usa extractores del <head> y el motor
+    en streaming deja de leer al llegar al <body>.
+    Con 'full_links' los enlaces salen del extractor "links" (todos, no los
+    primeros 20).
+    """
+    names = []
+    if "content" in sections or ("links" in sections and not full_links):
+        names.append("content")
+    elif "metadata" in sections:
+        names.append("title")
+    if "links" in sections and full_links:
+        names.append("links")
+    if "metadata" in sections:
+        names.append("metadata")
+    return names
+
+
+def document_error(document_result) -> Optional[str]:
+    """
+    Mensaje de error si la descarga o el parseo fallaron, o None.
+    scrape_document no lanza: ante un fallo cada extractor recibe el mismo
+    {"error": ...} en lugar de su resultado.
+    """
+    if isinstance(document_result, Exception):
+        return str(document_result) or type(document_result).__name__
+    results = list(document_result.values())
+    if results and all(isinstance(r, dict) and list(r) == ["error"] for r in results):
+        return results[0]["error"]
+    return None
+
+
+def build_scraping_data(document_result, sections) -> dict:
+    """
+    Parte del informe que sale del HTML, solo con las secciones pedidas.
+    Si la descarga falló, las secciones quedan vacías y el motivo va en "error".
+    """
+    error = document_error(document_result)
+    failed = error is not None
+    content = {} if failed else document_result.get("content", {})
+    data = {}
+    if "content" in sections or "metadata" in sections:
+        if failed:
+            data["title"] = "Error"
+        else:
+            data["title"] = (content or document_result.get("title", {})).get("title", "N/A")
+    if "links" in sections:
+        if failed:
+            data["links"] = []
+        elif "links" in document_result:
+            data["links"] = document_result["links"].get("links", [])
+        else:
+            data["links"] = content.get("links", [])
+    if "metadata" in sections:
+        data["meta_tags"] = {} if failed else document_result["metadata"]
+    if "content" in sections:
+        data["structure"] = {} if failed else content.get("structure", {})
+        data["images_count"] = 0 if failed else content.get("images_count", 0)
+    if failed:
+        data["error"] = error
+    return data
+
+
+def render_error(render_result, outputs=PROCESSOR_SECTIONS) -> Optional[str]:
+    """
+    Mensaje de error si la tarea 'render' falló, o None.
+    Las tareas del Servidor B devuelven None cuando Playwright falla, y eso
+    llega como "success" sin datos: también cuenta como fallo, igual que
+    si falta alguna de las salidas pedidas.
+    """
+    if isinstance(render_result, Exception):
+        return str(render_result) or type(render_result).__name__
+    if not isinstance(render_result, dict):
+        return str(render_result)
+    if render_result.get("status") != "success":
+        return render_result.get("message", "Error desconocido")
+    render_data = render_result.get("data")
+    if not isinstance(render_data, dict):
+        return "El Servidor B no pudo renderizar la página"
+    missing = [name for name in outputs if render_data.get(name) is None]
+    if missing:
+        return f"El Servidor B no devolvió: {', '.join(missing)}"
+    return None
+
+
+async def build_processing_data(app: web.Application, render_result, trace: Trace = None,
+                                outputs=PROCESSOR_SECTIONS) -> dict:
+    """Parte del informe que sale de la tarea 'render' (o del error que devolvió), con las salidas pedidas."""
+    data = {}
+    error = render_error(render_result, outputs)
+    if error is None:
+        render_data = render_result["data"]
+        if "screenshot" in outputs:
+            # La imagen se guarda aparte; el informe solo lleva su referencia
+            data["screenshot"] = await store_screenshot(app, render_data, trace)
+        if "performance" in outputs:
+            data["performance"] = render_data.get("performance")
+        data["render_profile"] = render_data.get("render_profile")
+        return data
+    if "screenshot" in outputs:
+        data["screenshot"] = "Error"
+    if "performance" in outputs:
+        data["performance"] = {"error": error}
+    else:
+        data["error"] = error
+    return data
+
+
+async def store_screenshot(app: web.Application, render_data: dict, trace: Trace = None):
+    """
+    Guarda el screenshot (y su miniatura) en el almacén de blobs y devuelve
+    la referencia que va en el informe, None si no hubo imagen o "Error" si
+    no se pudo guardar.
+    """
+    image = render_data.get("screenshot")
+    if not image:
+        return None
+    format = render_data.get("screenshot_format", "png")
+    blobs = app["blobs"]
+    loop = asyncio.get_running_loop()
+
+    try:
+        with timed("server_scraping", "store_screenshot", trace):
+            name = await loop.run_in_executor(None, blobs.put, image, format)
+    except OSError as e:
+        print(f"⚠️ No se pudo guardar el screenshot: {e}")
+        return "Error"
+    reference = {
+        "hash": name.split(".")[0],
+        "url": f"/screenshots/{name}",
+        "format": format,
+        "size_bytes": len(image),
+    }
+    thumbnail = render_data.get("thumbnail")
+    if thumbnail:
+        try:
+            with timed("server_scraping", "store_screenshot", trace):
+                thumbnail_name = await loop.run_in_executor(None, blobs.put, thumbnail, format)
+        except OSError as e:
+            # La imagen principal ya está guardada: el informe sale sin miniatura
+            print(f"⚠️ No se pudo guardar la miniatura: {e}")
+            return reference
+        reference["thumbnail"] = {
+            "hash": thumbnail_name.split(".")[0],
+            "url": f"/screenshots/{thumbnail_name}",
+            "size_bytes": len(thumbnail),
+        }
+    return reference
+
+
+def parse_screenshot_options(query) -> dict:
+    """
+    Opciones de screenshot desde la query string:
+    screenshot_format (png|jpeg|webp), screenshot_quality (1-100),
+    full_page (true|false) y thumbnail (ancho en píxeles).
+    Lanza ValueError si alguna es inválida.
+    """
+    options = {}
+    format = query.get('screenshot_format', 'png').lower()
+    if format not in CONTENT_TYPES:
+        raise ValueError(f"'screenshot_format' debe ser uno de: {', '.join(CONTENT_TYPES)}")
+    options["format"] = format
+
+    if 'screenshot_quality' in query:
+        quality = int(query['screenshot_quality'])
+        if not 1 <= quality <= 100:
+            raise ValueError("'screenshot_quality' debe estar entre 1 y 100")
+        if format != "png":
+            options["quality"] = quality
+
+    full_page = query.get('full_page', 'true').lower()
+    if full_page not in ("true", "false", "1", "0"):
+        raise ValueError("'full_page' debe ser true o false")
+    options["full_page"] = full_page in ("true", "1")
+
+    if 'thumbnail' in query:
+        width = int(query['thumbnail'])
+        if not MIN_THUMBNAIL_WIDTH <= width <= MAX_THUMBNAIL_WIDTH:
+            raise ValueError(f"'thumbnail' debe estar entre {MIN_THUMBNAIL_WIDTH} y {MAX_THUMBNAIL_WIDTH}")
+        options["thumbnail"] = width
+
+    return options
+
+
 async def handle_scrape(request):
     """
     Manejador principal que recibe las peticiones del cliente.
+    Con ?cache=refresh se ignora la caché y se fuerza un análisis nuevo.
+    ?profile=full|fast|text-only elige qué recursos carga el navegador.
+    ?timeout=SEGUNDOS fija el plazo del análisis. Si el cliente se desconecta
+    antes, el análisis se cancela (salvo que otro pedido lo esté esperando).
+    ?sections=metadata,links limita el informe (y el trabajo) a esas partes;
+    ?full_links=true trae todos los enlaces en vez de los primeros 20.
+    La respuesta se comprime con gzip o zstd si el cliente lo acepta.
     """
     url = request.query.get('url')
     if not url:
         return web.Response(text="Por favor, proporciona una URL. Ejemplo: /scrape?url=https://example.com", status=400)
 
-    print(f"\n🚀 Recibida solicitud de scraping para: {url}")
+    cache_mode = request.query.get('cache', 'use')
+    if cache_mode not in CACHE_MODES:
+        return web.Response(text=f"Valor de 'cache' inválido. Opciones: {', '.join(CACHE_MODES)}", status=400)
 
-    # --- Ejecutamos todas las tareas de forma concurrente ---
-    async with aiohttp.ClientSession() as session:
-        # Creamos una lista de tareas a ejecutar. asyncio.gather las correrá "a la vez"
-        tasks_to_run = [
-            # Tareas de scraping (locales)
-            scrape_page_content(session, url),
-            extract_metadata(session, url),
-            # Tareas de procesamiento (remotas)
-            send_task_to_processor('screenshot', url),
-            send_task_to_processor('performance', url)
-        ]
-        
-        # Esperamos a que todas las tareas terminen
-        results = await asyncio.gather(*tasks_to_run, return_exceptions=True)
-
-    # Procesamos los resultados
-    scraping_result, metadata_result, screenshot_result, performance_result = results
+    try:
+        options = parse_report_options(request.query)
+        timeout = _query_number(request.query, 'timeout', DEFAULT_TASK_TIMEOUT, 1, MAX_SCRAPE_TIMEOUT, kind=float)
+    except ValueError as e:
+        return web.Response(text=str(e), status=400)
 
-    # --- Consolidamos la respuesta final en el formato requerido ---
-    final_response = {
+    trace = new_trace()
+    print(f"\n🚀 [{trace.trace_id}] Recibida solicitud de scraping para: {url}")
+
+    final_response, source = await analyze_cached(request.app, url, options,
+                                                  refresh=(cache_mode == "refresh"), trace=trace,
+                                                  deadline=time.time() + timeout)
+    if request.query.get('debug') == 'timings':
+        final_response = with_debug_timings(final_response, trace, source)
+    return await encoded_json_response(request, final_response,
+                                       headers={"X-Cache": source.upper(), "X-Trace-Id": trace.trace_id})
+
+
+def parse_report_options(query) -> dict:
+    """
+    Opciones del informe desde la query string (profile, sections,
+    full_links y las de screenshot); lanza ValueError si alguna es inválida.
+    Las que tienen su valor por defecto no se incluyen, así la clave de la
+    caché de un pedido sin opciones sigue siendo la misma.
+    """
+    profile = query.get('profile', DEFAULT_PROFILE)
+    if profile not in RENDER_PROFILES:
+        raise ValueError(f"Valor de 'profile' inválido. Opciones: {', '.join(RENDER_PROFILES)}")
+    try:
+        options = {"screenshot": parse_screenshot_options(query), "profile": profile}
+    except ValueError as e:
+        raise ValueError(f"Opciones de screenshot inválidas: {e}")
+
+    sections = {name.strip() for name in query.get('sections', ",".join(SCRAPE_SECTIONS)).split(",") if name.strip()}
+    unknown = sections - set(SCRAPE_SECTIONS)
+    if unknown or not sections:
+        raise ValueError(f"Valor de 'sections' inválido. Opciones: {', '.join(SCRAPE_SECTIONS)}")
+    if sections != set(SCRAPE_SECTIONS):
+        options["sections"] = sorted(sections)
+    if _query_bool(query, 'full_links', False):
+        options["full_links"] = True
+    return options
+
+
+async def encoded_json_response(request: web.Request, payload, status: int = 200, headers: dict = None) -> web.Response:
+    """
+    Respuesta JSON serializada con dumps_json y comprimida según el
+    Accept-Encoding del pedido (ver common.encoding).
+    """
+    body = dumps_json(payload)
+    headers = dict(headers or {}, Vary="Accept-Encoding")
+    encoding = negotiate_encoding(request.headers.get("Accept-Encoding", ""))
+    if encoding and len(body) >= MIN_COMPRESS_BYTES:
+        if len(body) >= COMPRESS_IN_THREAD_BYTES:
+            body = await asyncio.get_running_loop().run_in_executor(None, compress, body, encoding)
+        else:
+            body = compress(body, encoding)
+        headers["Content-Encoding"] = encoding
+    return web.Response(body=body, status=status, content_type="application/json", charset="utf-8",
+                        headers=headers)
+
+
+def new_trace() -> Trace:
+    return Trace(uuid.uuid4().hex[:16])
+
+
+def with_debug_timings(report: dict, trace: Trace, source: str) -> dict:
+    """
+    Copia del informe con el desglose de tiempos (?debug=timings).
+    Si el informe salió de la caché o de otro pedido en curso, solo se ven
+    las etapas de este pedido (no las del análisis original).
+    """
+    report = dict(report)
+    report["debug"] = {"trace_id": trace.trace_id, "cache": source, "timings_ms": trace.as_ms()}
+    return report
+
+
+async def analyze_cached(app: web.Application, url: str, options: dict, refresh: bool = False,
+                         trace: Trace = None, deadline: float = None):
+    """
+    run_analysis() pasando por la caché de resultados.
+    Devuelve (informe, origen) con origen en "hit", "disk", "coalesced" o "miss".
+    Un análisis compartido conserva el 'deadline' del pedido que lo inició.
+    """
+    trace = trace or new_trace()
+    start = time.perf_counter()
+    final_response, source = await app["cache"].get_or_compute(
+        make_cache_key(url, options),
+        lambda: run_analysis(app, url, options, trace, deadline),
+        refresh=refresh,
+        # Los fallos no se guardan: el próximo pedido vuelve a intentar
+        cacheable=lambda report: report.get("status") == "success",
+    )
+    elapsed = time.perf_counter() - start
+    trace.add("total", elapsed)
+    ANALYSIS_SECONDS.observe(elapsed, cache=source)
+    ANALYSES_TOTAL.inc(status=final_response.get("status", "unknown"), cache=source)
+    if source != "miss":
+        print(f"💾 [{trace.trace_id}] Resultado servido desde la caché ({source}) para: {url}")
+    return final_response, source
+
+
+async def iter_batch_urls(request: web.Request):
+    """
+    Entrega (índice, url) de un lote a medida que se lee el cuerpo.
+    - application/json: {"urls": [...]} o directamente una lista.
+    - Cualquier otro tipo (text/plain, application/x-ndjson): una URL por línea,
+      como texto plano o como JSON ("..." o {"url": "..."}). Se leen de a una,
+      así que el lote puede ser arbitrariamente grande.
+    Las líneas vacías y las que empiezan con '#' se ignoran.
+    """
+    if request.content_type == "application/json":
+        payload = await request.json()
+        urls = payload.get("urls") if isinstance(payload, dict) else payload
+        if not isinstance(urls, list):
+            raise ValueError("Se esperaba una lista de URLs o un objeto {\"urls\": [...]}")
+        for index, url in enumerate(urls):
+            yield index, url
+        return
+
+    index = 0
+    while True:
+        line = await request.content.readline()
+        if not line:
+            return
+        text = line.decode('utf-8', errors='replace').strip()
+        if not text or text.startswith('#'):
+            continue
+        if text[0] in '"{':
+            try:
+                item = json.loads(text)
+            except json.JSONDecodeError:
+                item = text
+            text = item.get("url") if isinstance(item, dict) else item
+        yield index, text
+        index += 1
+
+
+async def handle_scrape_batch(request):
+    """
+    POST /scrape/batch: analiza muchas URLs con concurrencia acotada y va
+    devolviendo cada resultado como una línea NDJSON apenas termina (en el
+    orden en que terminan; 'index' indica la posición en el lote).
+    Los fallos de una URL son una línea más y no cortan el lote.
+    Al final se envía una línea {"summary": {...}}.
+    """
+    try:
+        concurrency = int(request.query.get('concurrency', DEFAULT_BATCH_CONCURRENCY))
+    except ValueError:
+        return web.Response(text="'concurrency' debe ser un entero", status=400)
+    concurrency = max(1, min(concurrency, MAX_BATCH_CONCURRENCY))
+
+    cache_mode = request.query.get('cache', 'use')
+    if cache_mode not in CACHE_MODES:
+        return web.Response(text=f"Valor de 'cache' inválido. Opciones: {', '.join(CACHE_MODES)}", status=400)
+    refresh = cache_mode == "refresh"
+    debug = request.query.get('debug') == 'timings'
+
+    try:
+        options = parse_report_options(request.query)
+        timeout = _query_number(request.query, 'timeout', DEFAULT_TASK_TIMEOUT, 1, MAX_SCRAPE_TIMEOUT, kind=float)
+    except ValueError as e:
+        return web.Response(text=str(e), status=400)
+
+    response = web.StreamResponse(headers={"Content-Type": "application/x-ndjson"})
+    await response.prepare(request)
+    print(f"\n📦 Recibido lote de scraping (concurrencia {concurrency})")
+
+    semaphore = asyncio.Semaphore(concurrency)
+    write_lock = asyncio.Lock()
+    pending = set()
+    summary = {"total": 0, "success": 0, "partial_failure": 0, "error": 0}
+
+    async def emit(record: dict) -> str:
+        """Escribe una línea y devuelve el status que quedó escrito."""
+        try:
+            line = dumps_json(record)
+        except (TypeError, ValueError) as e:
+            # Un resultado que no se puede serializar no debe cortar el lote
+            record = {"index": record.get("index"), "url": str(record.get("url")), "status": "error",
+                      "message": f"Resultado no serializable: {e}"}
+            line = dumps_json(record)
+        async with write_lock:
+            await response.write(line + b"\n")
+        return record.get("status")
+
+    async def process(index: int, url) -> None:
+        # El lugar se libera recién cuando el resultado se escribió: con un
+        # cliente lento tampoco se acumulan más de 'concurrency' resultados
+        try:
+            try:
+                if not isinstance(url, str) or not url.startswith(("http://", "https://")):
+                    raise ValueError(f"URL inválida: {url!r}")
+                trace = new_trace()
+                # El plazo corre desde que la URL consigue lugar, no desde que llegó el lote
+                report, source = await analyze_cached(request.app, url, options, refresh=refresh, trace=trace,
+                                                      deadline=time.time() + timeout)
+                if debug:
+                    report = with_debug_timings(report, trace, source)
+                record = dict(report, index=index, cache=source)
+            except Exception as e:
+                record = {"index": index, "url": url if isinstance(url, str) else str(url),
+                          "status": "error", "message": str(e)}
+            status = await emit(record)
+            summary[status] = summary.get(status, 0) + 1
+        finally:
+            semaphore.release()
+
+    try:
+        try:
+            async for index, url in iter_batch_urls(request):
+                # Esperamos un lugar libre ANTES de leer la próxima URL: memoria constante
+                await semaphore.acquire()
+                summary["total"] += 1
+                task = asyncio.ensure_future(process(index, url))
+                pending.add(task)
+                task.add_done_callback(pending.discard)
+        except (ValueError, UnicodeDecodeError) as e:
+            await emit({"status": "error", "message": f"Lote inválido: {e}"})
+
+        if pending:
+            await asyncio.gather(*pending)
+        await emit({"summary": summary})
+        await response.write_eof()
+    except BaseException as e:
+        # El cliente se fue (o el lote falló): no tiene sentido seguir analizando
+        if isinstance(e, (ConnectionResetError, asyncio.CancelledError)):
+            print("⚠️ El cliente del lote se desconectó; cancelando lo pendiente.")
+        else:
+            print(f"❌ El lote falló ({e}); cancelando lo pendiente.")
+        for task in list(pending):
+            task.cancel()
+        raise
+
+    print(f"📦 Lote terminado: {summary}")
+    return response
+
+
+# Topes de los parámetros de /crawl
+MAX_CRAWL_DEPTH = 10
+MAX_CRAWL_PAGES = 10000
+MAX_CRAWL_PER_HOST = 16
+MAX_CRAWL_DELAY = 60.0
+
+
+def _query_bool(query, name: str, default: bool) -> bool:
+    value = query.get(name, str(default)).lower()
+    if value not in ("true", "false", "1", "0"):
+        raise ValueError(f"'{name}' debe ser true o false")
+    return value in ("true", "1")
+
+
+def _query_number(query, name: str, default, low, high, kind=int):
+    try:
+        value = kind(query.get(name, default))
+    except ValueError:
+        raise ValueError(f"'{name}' debe ser un número")
+    if not low <= value <= high:
+        raise ValueError(f"'{name}' debe estar entre {low} y {high}")
+    return value
+
+
+def parse_crawl_options(query) -> dict:
+    """Parámetros de /crawl validados; lanza ValueError si alguno es inválido."""
+    scope = query.get('scope', 'host')
+    if scope not in CRAWL_SCOPES:
+        raise ValueError(f"'scope' debe ser uno de: {', '.join(CRAWL_SCOPES)}")
+    profile = query.get('profile', DEFAULT_PROFILE)
+    if profile not in RENDER_PROFILES:
+        raise ValueError(f"'profile' debe ser uno de: {', '.join(RENDER_PROFILES)}")
+    return {
+        "max_depth": _query_number(query, 'max_depth', DEFAULT_MAX_DEPTH, 0, MAX_CRAWL_DEPTH),
+        "max_pages": _query_number(query, 'max_pages', DEFAULT_MAX_PAGES, 1, MAX_CRAWL_PAGES),
+        "scope": scope,
+        "concurrency": _query_number(query, 'concurrency', DEFAULT_CONCURRENCY, 1, MAX_BATCH_CONCURRENCY),
+        "per_host_concurrency": _query_number(query, 'per_host', DEFAULT_PER_HOST_CONCURRENCY, 1, MAX_CRAWL_PER_HOST),
+        "per_host_delay": _query_number(query, 'delay', DEFAULT_PER_HOST_DELAY, 0.0, MAX_CRAWL_DELAY, float),
+        "robots": _query_bool(query, 'robots', True),
+        # El navegador es opcional: sin él, un crawl grande solo descarga y parsea HTML
+        "render": _query_bool(query, 'render', False),
+        "profile": profile,
+        "screenshot": parse_screenshot_options(query),
+    }
+
+
+async def crawl_page(app: web.Application, url: str, options: dict) -> tuple:
+    """
+    Analiza una página del crawl. Devuelve (registro, enlaces absolutos).
+    Sin 'render' solo se descarga y parsea el HTML; con 'render' se suma
+    la tarea del Servidor B, igual que en /scrape.
+    """
+    trace = new_trace()
+    tasks_to_run = [
+        scrape_document(app["http"], url, ["content", "metadata", "links"],
+                        engine=app.get("html_parser", "bs4"),
+                        max_bytes=app.get("html_max_bytes", DEFAULT_MAX_BYTES),
+                        trace=trace),
+    ]
+    if options["render"]:
+        tasks_to_run.append(send_task_to_processor(app, 'render', url, {
+            "outputs": ["screenshot", "performance"],
+            "screenshot_options": options["screenshot"],
+            "profile": options["profile"],
+        }, trace=trace))
+    results = await asyncio.gather(*tasks_to_run, return_exceptions=True)
+
+    document_result = results[0]
+    if isinstance(document_result, Exception):
+        raise document_result
+    content = document_result["content"]
+    if "error" in content:
+        return {"url": url, "status": "error", "message": content["error"]}, []
+
+    record = {
         "url": url,
         "timestamp": datetime.now(timezone.utc).isoformat(),
         "scraping_data": {
-            "title": scraping_result.get("title", "N/A") if not isinstance(scraping_result, Exception) else "Error",
-            "links": scraping_result.get("links", []) if not isinstance(scraping_result, Exception) else [],
-            "meta_tags": metadata_result if not isinstance(metadata_result, Exception) else {"error": str(metadata_result)},
-            "structure": scraping_result.get("structure", {}) if not isinstance(scraping_result, Exception) else {},
-            "images_count": scraping_result.get("images_count", 0) if not isinstance(scraping_result, Exception) else 0
-        },
-        "processing_data": {
-            "screenshot": screenshot_result.get("data") if isinstance(screenshot_result, dict) else "Error",
-            "performance": performance_result.get("data") if isinstance(performance_result, dict) else {"error": str(performance_result)}
+            "title": content.get("title", "N/A"),
+            "links_count": content.get("links_count", 0),
+            "meta_tags": document_result["metadata"],
+            "structure": content.get("structure", {}),
+            "images_count": content.get("images_count", 0),
         },
-        "status": "success"
+        "status": "success",
     }
+    if options["render"]:
+        render_result = results[1]
+        record["processing_data"] = await build_processing_data(app, render_result, trace)
+        if render_error(render_result) is not None or record["processing_data"].get("screenshot") == "Error":
+            record["status"] = "partial_failure"
+    return record, resolve_links(url, document_result["links"])
+
+
+async def handle_crawl(request):
+    """
+    POST /crawl?url=...: recorre el sitio desde la URL semilla y devuelve
+    cada página como una línea NDJSON apenas termina. Al final se envía
+    {"summary": {...}}. Parámetros (todos opcionales salvo 'url'):
+    max_depth, max_pages, scope (host|domain|any), concurrency, per_host,
+    delay (segundos entre pedidos a un mismo host), robots, render,
+    profile y las opciones de screenshot de /scrape (si render=true).
+    Si el cliente se desconecta, el crawl se cancela.
+    """
+    url = request.query.get('url')
+    if not url or not url.startswith(("http://", "https://")):
+        return web.Response(text="Falta una URL semilla válida. Ejemplo: /crawl?url=https://example.com", status=400)
+    try:
+        options = parse_crawl_options(request.query)
+    except ValueError as e:
+        return web.Response(text=f"Opciones de crawl inválidas: {e}", status=400)
+
+    app = request.app
+    crawler = Crawler(
+        app["http"], url, lambda page_url, depth: crawl_page(app, page_url, options),
+        max_depth=options["max_depth"], max_pages=options["max_pages"], scope=options["scope"],
+        concurrency=options["concurrency"], per_host_concurrency=options["per_host_concurrency"],
+        per_host_delay=options["per_host_delay"], robots=options["robots"],
+    )
+    crawl_id = uuid.uuid4().hex[:12]
+    app["crawls"][crawl_id] = crawler
+
+    response = web.StreamResponse(headers={"Content-Type": "application/x-ndjson", "X-Crawl-Id": crawl_id})
+    await response.prepare(request)
+    print(f"\n🕸️  [{crawl_id}] Crawl de {crawler.seed} (profundidad {options['max_depth']}, "
+          f"hasta {options['max_pages']} páginas, alcance '{options['scope']}')")
+
+    try:
+        async for record in crawler.run():
+            await response.write(dumps_json(record) + b"\n")
+        summary = dict(crawler.snapshot(), crawl_id=crawl_id)
+        await response.write(dumps_json({"summary": summary}) + b"\n")
+        await response.write_eof()
+    except (ConnectionResetError, asyncio.CancelledError):
+        print(f"⚠️ [{crawl_id}] El cliente se desconectó; crawl cancelado.")
+        raise
+    finally:
+        del app["crawls"][crawl_id]
+
+    print(f"🕸️  [{crawl_id}] Crawl terminado: {crawler.stats}")
+    return response
+
+
+async def handle_crawls(request):
+    """Crawls en curso con su progreso."""
+    return web.json_response({crawl_id: crawler.snapshot() for crawl_id, crawler in request.app["crawls"].items()})
+
+
+async def handle_screenshot(request):
+    """
+    GET /screenshots/{name}: sirve la imagen directamente desde el disco
+    (FileResponse usa sendfile, sin copiarla a memoria).
+    """
+    name = request.match_info['name']
+    path = request.app["blobs"].path_for(name)
+    if path is None:
+        raise web.HTTPNotFound(text="Screenshot no encontrado")
+    extension = name.rsplit(".", 1)[1]
+    return web.FileResponse(path, headers={
+        "Content-Type": CONTENT_TYPES.get(extension, "application/octet-stream"),
+        # El nombre es el hash del contenido: nunca cambia
+        "Cache-Control": "public, max-age=31536000, immutable",
+    })
+
+
+async def handle_metrics(request):
+    """Métricas del Servidor A en formato Prometheus."""
+    return web.Response(body=REGISTRY.render().encode('utf-8'),
+                        headers={"Content-Type": PROMETHEUS_CONTENT_TYPE})
 
-    # Si alguna tarea principal falló, cambiamos el status general
-    if any(isinstance(r, Exception) for r in results) or any(r.get("status") == "error" for r in [screenshot_result, performance_result] if isinstance(r, dict)):
-        final_response["status"] = "partial_failure"
 
-    return web.json_response(final_response)
+async def handle_processors(request):
+    """Estado de cada nodo de procesamiento (salud y carga)."""
+    return web.json_response(request.app["processor"].snapshot())
+
+
+async def handle_cache_stats(request):
+    """Contadores de aciertos/fallos de la caché de resultados (y de la caché HTTP, si está activa)."""
+    stats = request.app["cache"].snapshot()
+    http_cache = request.app["http"].cache
+    if http_cache is not None:
+        stats["http"] = http_cache.snapshot()
+    return web.json_response(stats)
+
+
+async def start_blob_store(app: web.Application):
+    app["blobs"] = BlobStore(app.get("screenshot_dir", DEFAULT_SCREENSHOT_DIR))
+
+
+async def start_cache(app: web.Application):
+    app["cache"] = ResultCache(**app.get("cache_config", {}))
+
+
+async def start_crawl_registry(app: web.Application):
+    # Crawls en curso, por id (ver GET /crawls)
+    app["crawls"] = {}
+
+
+async def register_gauges(app: web.Application):
+    REGISTRY.gauge("scrape_cache_entries", "Informes en la caché de memoria",
+                   lambda: app["cache"].snapshot()["entries"])
+    REGISTRY.gauge("scrape_cache_in_flight", "Análisis en curso compartidos por la caché",
+                   lambda: app["cache"].snapshot()["in_flight"])
+    REGISTRY.gauge("processor_in_flight_tasks", "Tareas enviadas a los nodos esperando respuesta",
+                   lambda: app["processor"].in_flight)
+    REGISTRY.gauge("processor_healthy_nodes", "Nodos de procesamiento en servicio",
+                   lambda: app["processor"].healthy_nodes)
 
 
 # --- Configuración y arranque del servidor ---
 app = web.Application()
 app.router.add_get('/scrape', handle_scrape)
+app.router.add_post('/scrape/batch', handle_scrape_batch)
+app.router.add_get('/screenshots/{name}', handle_screenshot)
+app.router.add_get('/cache/stats', handle_cache_stats)
+app.router.add_get('/processors', handle_processors)
+app.router.add_get('/metrics', handle_metrics)
+app.router.add_post('/crawl', handle_crawl)
+app.router.add_get('/crawls', handle_crawls)
+app.on_startup.append(start_processor_client)
+app.on_cleanup.append(close_processor_client)
+app.on_startup.append(start_http_client)
+app.on_cleanup.append(close_http_client)
+app.on_startup.append(start_cache)
+app.on_startup.append(start_blob_store)
+app.on_startup.append(start_crawl_registry)
+app.on_startup.append(register_gauges)
 
-if __name__ == "__main__":
-    print("🚀 Servidor de Extracción Asíncrono iniciado.")
-    print("👂 Escuchando en http://localhost:8080")
-    print("👉 Para probar, usa: http://localhost:8080/scrape?url=https://www.python.org")
-    web.run_app(app, host='localhost', port=8080)
-    
 if __name__ == "__main__":
     # 1. Crear el parser de argumentos
     parser = argparse.ArgumentParser(description="Servidor de Scraping Web Asíncrono")
@@ -123,11 +845,77 @@ if __name__ == "__main__":
     # El enunciado también pedía --workers, pero con aiohttp no se usa de la misma forma,
     # así que con IP y puerto cumples perfectamente.
 
+    # Nodos de procesamiento (Servidor B)
+    parser.add_argument("--processor", action="append", default=[], metavar="HOST:PUERTO",
+                        help="Nodo de procesamiento; repetir para varios (por defecto localhost:8081)")
+    parser.add_argument("--health-interval", type=float, default=DEFAULT_HEALTH_INTERVAL,
+                        help="Segundos entre chequeos de salud de los nodos")
+
+    # Pool HTTP compartido hacia los sitios analizados
+    parser.add_argument("--http-limit", type=int, default=DEFAULT_HTTP_CONFIG["limit"],
+                        help="Conexiones HTTP abiertas en total")
+    parser.add_argument("--http-limit-per-host", type=int, default=DEFAULT_HTTP_CONFIG["limit_per_host"],
+                        help="Conexiones HTTP abiertas por host")
+    parser.add_argument("--dns-ttl", type=int, default=DEFAULT_HTTP_CONFIG["dns_ttl"],
+                        help="Segundos que se cachea cada resolución DNS")
+    parser.add_argument("--keepalive", type=float, default=DEFAULT_HTTP_CONFIG["keepalive_timeout"],
+                        help="Segundos que se mantiene abierta una conexión ociosa")
+    parser.add_argument("--max-concurrency", type=int, default=DEFAULT_HTTP_CONFIG["max_concurrency"],
+                        help="Descargas simultáneas en total")
+    parser.add_argument("--max-per-host", type=int, default=DEFAULT_HTTP_CONFIG["max_per_host"],
+                        help="Descargas simultáneas por host")
+    parser.add_argument("--http-cache-dir", default=None,
+                        help="Directorio de la caché HTTP (ETag/Last-Modified, max-age); desactivada si se omite")
+    parser.add_argument("--http-cache-size", type=int, default=DEFAULT_HTTP_CONFIG["cache_max_entries"],
+                        help="Respuestas HTTP guardadas como máximo en la caché en disco")
+
+    # Motor de extracción HTML
+    parser.add_argument("--html-parser", choices=PARSER_ENGINES, default="bs4",
+                        help="'bs4' (árbol completo) o 'stream' (incremental, con tope de bytes)")
+    parser.add_argument("--html-max-bytes", type=int, default=DEFAULT_MAX_BYTES,
+                        help="Bytes máximos que lee el parser 'stream' por página")
+
+    # Caché de resultados
+    parser.add_argument("--cache-size", type=int, default=DEFAULT_MAX_ENTRIES,
+                        help="Informes guardados en memoria (LRU)")
+    parser.add_argument("--cache-ttl", type=float, default=DEFAULT_TTL,
+                        help="Segundos de vigencia de un informe cacheado")
+    parser.add_argument("--cache-dir", default=None,
+                        help="Directorio para la caché en disco (desactivada si se omite)")
+    parser.add_argument("--screenshot-dir", default=DEFAULT_SCREENSHOT_DIR,
+                        help="Directorio donde se guardan los screenshots")
+
     # 2. Parsear los argumentos de la línea de comandos
     args = parser.parse_args()
+    try:
+        app["processor_nodes"] = [parse_node(value) for value in args.processor]
+    except ValueError as e:
+        parser.error(str(e))
+    app["health_interval"] = args.health_interval
+    app["http_config"] = {
+        "limit": args.http_limit,
+        "limit_per_host": args.http_limit_per_host,
+        "dns_ttl": args.dns_ttl,
+        "keepalive_timeout": args.keepalive,
+        "max_concurrency": args.max_concurrency,
+        "max_per_host": args.max_per_host,
+        "cache_dir": args.http_cache_dir,
+        "cache_max_entries": args.http_cache_size,
+    }
+    app["cache_config"] = {
+        "max_entries": args.cache_size,
+        "ttl": args.cache_ttl,
+        "disk_dir": args.cache_dir,
+    }
+    app["screenshot_dir"] = args.screenshot_dir
+    app["html_parser"] = args.html_parser
+    app["html_max_bytes"] = args.html_max_bytes
 
     # 3. Usar los argumentos para iniciar el servidor
     print("🚀 Servidor de Extracción Asíncrono iniciado.")
     print(f"👂 Escuchando en http://{args.ip}:{args.port}")
+    print(f"👉 Para probar, usa: http://{args.ip}:{args.port}/scrape?url=https://www.python.org")
     
-    web.run_app(app, host=args.ip, port=args.port)
\ No newline at end of file
+    # handler_cancellation: si el cliente se desconecta, se cancela su manejador
+    # (y, en cadena, las tareas que ya nadie espera en el Servidor B)
+    web.run_app(app, host=args.ip, port=args.port, handler_cancellation=True)